@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+
+"""
+Benchmarks the bulk commands against a simulated fleet of functions.
+
+Each command runs in-process against a fresh fake AWS account (see fake_aws.py) with
+the given number of functions, and reports the wall time, the AWS API calls made
+per function and the peak memory allocated by Python while it ran.
+
+Usage:
+
+    $ python benchmarks/bulk_commands.py
+    $ python benchmarks/bulk_commands.py --functions 1000 --latency 0.05 \\
+        --command "layers install" --output json
+
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# The fake answers every call, keep the local AWS configuration out of the way
+os.environ.update(
+    {
+        "AWS_ACCESS_KEY_ID": "benchmark",
+        "AWS_SECRET_ACCESS_KEY": "benchmark",
+        "AWS_DEFAULT_REGION": "us-east-1",
+        "AWS_CONFIG_FILE": os.devnull,
+        "AWS_SHARED_CREDENTIALS_FILE": os.devnull,
+    }
+)
+os.environ.pop("AWS_PROFILE", None)
+
+from click.testing import CliRunner  # noqa: E402
+from tabulate import tabulate  # noqa: E402
+
+from fake_aws import FakeAWS, NR_ACCOUNT_ID  # noqa: E402
+from newrelic_lambda_cli import integrations, layers, utils  # noqa: E402
+from newrelic_lambda_cli.cli import cli, register_groups  # noqa: E402
+from newrelic_lambda_cli.sessions import clear_client_pools  # noqa: E402
+
+FUNCTION_COUNTS = (10, 100, 1000, 10000)
+
+# The arguments of each command, and whether the fleet has New Relic installed
+COMMANDS = {
+    "functions list": (["functions", "list", "--output", "text"], False),
+    "layers install": (
+        [
+            "layers",
+            "install",
+            "--nr-account-id",
+            NR_ACCOUNT_ID,
+            "--nr-ingest-key",
+            "benchmark-license-key",
+            "--function",
+            "all",
+        ],
+        False,
+    ),
+    "layers uninstall": (["layers", "uninstall", "--function", "all"], True),
+    "subscriptions install": (["subscriptions", "install", "--function", "all"], False),
+    "subscriptions install --account-policy": (
+        ["subscriptions", "install", "--account-policy", "--force"],
+        False,
+    ),
+    "subscriptions migrate": (["subscriptions", "migrate", "--function", "all"], False),
+    # How migrating to otel log subscriptions was done before subscriptions migrate
+    "subscriptions uninstall, install --otel": (
+        (
+            ["subscriptions", "uninstall", "--function", "all"],
+            ["subscriptions", "install", "--otel", "--function", "all"],
+        ),
+        False,
+    ),
+}
+
+# Commands run against a fleet subscribed to the classic log ingestion function, that
+# move it to the otel log ingestion function
+SUBSCRIBED_COMMANDS = (
+    "subscriptions migrate",
+    "subscriptions uninstall, install --otel",
+)
+
+
+def _reset():
+    """Drops the caches a previous run left behind so that each run starts cold"""
+    clear_client_pools()
+    layers.clear_index_cache()
+    vars(integrations)["__cached_license_key_outputs"].clear()
+
+
+def run(command, functions, latency=0.0, memory=True, extra_args=(), invoked=1.0):
+    """Runs a command against a fake fleet, returns its measurements"""
+    args, installed = COMMANDS[command]
+    fake = FakeAWS(latency=latency)
+    fake.add_functions(functions, installed=installed, invoked=invoked)
+    if command in SUBSCRIBED_COMMANDS:
+        fake.add_otel_log_ingestion()
+        fake.subscribe("NewRelicLogStreaming", fake.log_ingestion_arn)
+    _reset()
+    invocations = args if isinstance(args, tuple) else (args,)
+
+    with tempfile.TemporaryDirectory() as journal_dir, fake, patch.object(
+        layers, "_fetch_layers", fake.layer_index
+    ), patch.object(utils, "JOURNAL_DIR", journal_dir):
+        if memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        for args in invocations:
+            result = CliRunner().invoke(
+                cli, list(args) + ["--aws-region", fake.region] + list(extra_args)
+            )
+            if result.exit_code != 0:
+                break
+        wall_time = time.perf_counter() - start
+        peak_memory = tracemalloc.get_traced_memory()[1] if memory else None
+        tracemalloc.stop()
+
+    # Subscribing a function that was never invoked fails, as it has no log group
+    if result.exit_code != 0 and invoked == 1.0:
+        raise RuntimeError(
+            "%s failed with %d functions:\n%s"
+            % (command, functions, (result.output or "")[-2000:] or result.exception)
+        )
+
+    api_calls = sum(fake.calls.values())
+    return {
+        "command": command,
+        "functions": functions,
+        "latency": latency,
+        "wall_time": wall_time,
+        "functions_per_second": functions / wall_time,
+        "api_calls": api_calls,
+        "api_calls_per_function": api_calls / functions,
+        "api_calls_by_operation": dict(fake.calls),
+        "peak_memory": peak_memory,
+    }
+
+
+def format_results(results):
+    table = []
+    for result in results:
+        table.append(
+            [
+                result["command"],
+                result["functions"],
+                "%.2fs" % result["wall_time"],
+                "%.1f" % result["functions_per_second"],
+                "%.2f" % result["api_calls_per_function"],
+                (
+                    "%.1f MiB" % (result["peak_memory"] / 1024.0 / 1024.0)
+                    if result["peak_memory"] is not None
+                    else "-"
+                ),
+            ]
+        )
+    return tabulate(
+        table,
+        headers=[
+            "Command",
+            "Functions",
+            "Wall Time",
+            "Functions/s",
+            "API Calls/Function",
+            "Peak Memory",
+        ],
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--functions",
+        action="append",
+        type=int,
+        help="Number of functions in the fleet, can be repeated (default: %s)"
+        % ", ".join(str(count) for count in FUNCTION_COUNTS),
+    )
+    parser.add_argument(
+        "--command",
+        action="append",
+        choices=sorted(COMMANDS),
+        help="Command to run, can be repeated (default: all)",
+    )
+    parser.add_argument(
+        "--latency",
+        default=0.0,
+        type=float,
+        help="Seconds each simulated API call takes",
+    )
+    parser.add_argument(
+        "--max-workers", type=int, help="Passed to the commands that accept it"
+    )
+    parser.add_argument(
+        "--invoked",
+        default=1.0,
+        type=float,
+        help="Fraction of the functions that were ever invoked and have a log group",
+    )
+    parser.add_argument(
+        "--no-memory",
+        action="store_true",
+        help="Don't trace memory allocations, which slows the commands down",
+    )
+    parser.add_argument("--output", choices=["table", "json"], default="table")
+    args = parser.parse_args()
+
+    register_groups(cli)
+
+    results = []
+    for command in args.command or sorted(COMMANDS):
+        extra_args = []
+        if args.max_workers and command != "functions list":
+            extra_args = ["--max-workers", str(args.max_workers)]
+        for functions in args.functions or FUNCTION_COUNTS:
+            results.append(
+                run(
+                    command,
+                    functions,
+                    args.latency,
+                    not args.no_memory,
+                    extra_args,
+                    args.invoked,
+                )
+            )
+            print(
+                "%s: %d functions in %.2fs"
+                % (command, functions, results[-1]["wall_time"]),
+                file=sys.stderr,
+            )
+
+    if args.output == "json":
+        print(json.dumps(results, indent=2))
+    else:
+        print(format_results(results))
+
+
+if __name__ == "__main__":
+    main()
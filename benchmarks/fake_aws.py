@@ -0,0 +1,382 @@
+# -*- coding: utf-8 -*-
+
+"""
+An in-process fake of the Lambda, CloudWatch Logs, CloudFormation, IAM and STS APIs
+called by the CLI, for benchmarks.
+
+The fake answers botocore's before-call event, the same hook botocore's Stubber
+uses, so every client created while it is installed goes through the CLI's own
+event handlers (call counting, concurrency limiting, stats) but never signs or
+sends a request. Rate limits applied on before-send are bypassed as a result.
+"""
+
+import collections
+import threading
+import time
+import uuid
+
+import botocore.awsrequest
+import botocore.handlers
+
+ACCOUNT_ID = "123456789012"
+ROLE_ARN = "arn:aws:iam::%s:role/lambda-execution-role" % ACCOUNT_ID
+LICENSE_KEY_STACK_NAME = "NewRelicLicenseKeySecret"
+LICENSE_KEY_POLICY_ARN = "arn:aws:iam::%s:policy/NewRelic-ViewLicenseKey" % ACCOUNT_ID
+INGEST_STACK_NAME = "NewRelicLogIngestion"
+OTEL_INGEST_STACK_NAME = "NewRelicOtelLogIngestion"
+NR_ACCOUNT_ID = "12345"
+NR_LAYER_ACCOUNT_ID = "451483290750"
+
+
+class FakeError(Exception):
+    def __init__(self, status_code, code, message=""):
+        self.status_code = status_code
+        self.code = code
+        self.message = message
+
+
+def _metadata(status_code):
+    return {"HTTPStatusCode": status_code, "RetryAttempts": 0}
+
+
+class FakeAWS(object):
+    """
+    A fake AWS account in a single region
+
+    :param region: The region of the fake resources
+    :param latency: Seconds each API call takes
+    :param page_size: Functions per ListFunctions page
+    """
+
+    def __init__(self, region="us-east-1", latency=0.0, page_size=50):
+        self.region = region
+        self.latency = latency
+        self.page_size = page_size
+        self.functions = collections.OrderedDict()
+        self.log_groups = {}
+        self.account_policies = {}
+        self.stacks = {}
+        self.calls = collections.Counter()
+        self._lock = threading.Lock()
+        self._handlers = [
+            ("before-parameter-build", self.on_before_parameter_build),
+            ("before-call", self.on_before_call, botocore.handlers.REGISTER_LAST),
+        ]
+
+        self.add_stack(
+            LICENSE_KEY_STACK_NAME,
+            {
+                "LicenseKeySecretARN": "arn:aws:secretsmanager:%s:%s:secret:"
+                "NEW_RELIC_LICENSE_KEY" % (region, ACCOUNT_ID),
+                "NrAccountId": NR_ACCOUNT_ID,
+                "ViewPolicyARN": LICENSE_KEY_POLICY_ARN,
+            },
+        )
+        stack_id = self.add_stack(INGEST_STACK_NAME)
+        name = "newrelic-log-ingestion-%s" % stack_id.split("/")[2].split("-")[4]
+        self.add_function(name)
+        self.log_ingestion_arn = self.functions[name]["FunctionArn"]
+        self.otel_log_ingestion_arn = None
+
+    def add_otel_log_ingestion(self):
+        """
+        Adds the otel log ingestion function and its stack. Only bulk commands that
+        subscribe to it need it, the layers commands would try to uninstrument it.
+        """
+        stack_id = self.add_stack(OTEL_INGEST_STACK_NAME)
+        name = "newrelic-aws-otel-log-ingestion-%s" % (
+            stack_id.split("/")[2].split("-")[4]
+        )
+        self.add_function(name)
+        self.otel_log_ingestion_arn = self.functions[name]["FunctionArn"]
+
+    def layer_arn(self, runtime, version=1):
+        return "arn:aws:lambda:%s:%s:layer:NewRelic%s:%d" % (
+            self.region,
+            NR_LAYER_ACCOUNT_ID,
+            runtime.replace("python", "Python").replace(".", ""),
+            version,
+        )
+
+    def add_function(
+        self,
+        name,
+        runtime="python3.12",
+        installed=False,
+        log_group=None,
+        invoked=True,
+    ):
+        log_group = log_group or "/aws/lambda/%s" % name
+        layers = []
+        handler = "app.handler"
+        if installed:
+            layers.append({"Arn": self.layer_arn(runtime), "CodeSize": 0})
+            handler = "newrelic_lambda_wrapper.handler"
+        self.functions[name] = {
+            "FunctionName": name,
+            "FunctionArn": "arn:aws:lambda:%s:%s:function:%s"
+            % (self.region, ACCOUNT_ID, name),
+            "Runtime": runtime,
+            "Role": ROLE_ARN,
+            "Handler": handler,
+            "Architectures": ["x86_64"],
+            "Layers": layers,
+            "Environment": {"Variables": {}},
+            "LoggingConfig": {"LogFormat": "Text", "LogGroup": log_group},
+            "State": "Active",
+            "LastUpdateStatus": "Successful",
+            "RevisionId": str(uuid.uuid4()),
+        }
+        if invoked:
+            self.log_groups.setdefault(log_group, {})
+
+    def add_functions(self, count, runtime="python3.12", installed=False, invoked=1.0):
+        """Adds count functions, of which the invoked fraction have a log group"""
+        for i in range(count):
+            self.add_function(
+                "function-%d" % i,
+                runtime,
+                installed,
+                invoked=i < count * invoked,
+            )
+
+    def subscribe(self, filter_name, destination_arn, filter_pattern=""):
+        """Adds a subscription filter to every log group"""
+        for log_group_name, filters in self.log_groups.items():
+            filters[filter_name] = {
+                "logGroupName": log_group_name,
+                "filterName": filter_name,
+                "filterPattern": filter_pattern,
+                "destinationArn": destination_arn,
+            }
+
+    def add_stack(self, name, outputs=None):
+        stack_id = "arn:aws:cloudformation:%s:%s:stack/%s/%s" % (
+            self.region,
+            ACCOUNT_ID,
+            name,
+            uuid.uuid4(),
+        )
+        self.stacks[name] = {
+            "StackId": stack_id,
+            "StackName": name,
+            "StackStatus": "CREATE_COMPLETE",
+            "CreationTime": "2024-01-01T00:00:00Z",
+            "Outputs": [
+                {"OutputKey": key, "OutputValue": value}
+                for key, value in (outputs or {}).items()
+            ],
+        }
+        return stack_id
+
+    def layer_index(self, region, runtime):
+        """Returns the layer catalog the layer service would return"""
+        time.sleep(self.latency)
+        return [
+            {
+                "LayerName": "NewRelic%s" % runtime,
+                "LatestMatchingVersion": {
+                    "LayerVersionArn": self.layer_arn(runtime),
+                    "CompatibleArchitectures": ["x86_64", "arm64"],
+                },
+            }
+        ]
+
+    def install(self):
+        """Answers the API calls of every botocore session created from now on"""
+        botocore.handlers.BUILTIN_HANDLERS.extend(self._handlers)
+
+    def uninstall(self):
+        for handler in self._handlers:
+            botocore.handlers.BUILTIN_HANDLERS.remove(handler)
+
+    def __enter__(self):
+        self.install()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.uninstall()
+
+    def on_before_parameter_build(self, params, context, **kwargs):
+        # before-call only gets the serialized request, keep the call's parameters
+        context["fake_aws_params"] = params
+
+    def on_before_call(self, event_name, context, **kwargs):
+        _, service_id, operation_name = event_name.split(".", 2)
+        time.sleep(self.latency)
+        try:
+            method = getattr(
+                self, "_%s_%s" % (service_id.replace("-", "_"), operation_name)
+            )
+        except AttributeError:
+            error = FakeError(501, "NotImplemented", operation_name)
+        else:
+            error = None
+        with self._lock:
+            self.calls["%s:%s" % (service_id, operation_name)] += 1
+            try:
+                if error:
+                    raise error
+                parsed = method(**context.get("fake_aws_params", {}))
+            except FakeError as e:
+                return (
+                    botocore.awsrequest.AWSResponse(None, e.status_code, {}, None),
+                    {
+                        "Error": {"Code": e.code, "Message": e.message},
+                        "ResponseMetadata": _metadata(e.status_code),
+                    },
+                )
+        parsed["ResponseMetadata"] = _metadata(200)
+        return botocore.awsrequest.AWSResponse(None, 200, {}, None), parsed
+
+    def _function(self, FunctionName):
+        name = FunctionName.split(":")[6] if ":" in FunctionName else FunctionName
+        if name not in self.functions:
+            raise FakeError(
+                404, "ResourceNotFoundException", "Function not found: %s" % name
+            )
+        return self.functions[name]
+
+    def _log_group(self, logGroupName):
+        if logGroupName not in self.log_groups:
+            raise FakeError(
+                404,
+                "ResourceNotFoundException",
+                "Log group not found: %s" % logGroupName,
+            )
+        return self.log_groups[logGroupName]
+
+    def _lambda_ListFunctions(self, Marker=None, MaxItems=None, **kwargs):
+        start = int(Marker or 0)
+        end = start + min(MaxItems or self.page_size, self.page_size)
+        functions = list(self.functions.values())
+        res = {"Functions": [dict(function) for function in functions[start:end]]}
+        if end < len(functions):
+            res["NextMarker"] = str(end)
+        return res
+
+    def _lambda_GetFunction(self, FunctionName, **kwargs):
+        return {
+            "Configuration": dict(self._function(FunctionName)),
+            "Code": {"RepositoryType": "S3"},
+        }
+
+    def _lambda_GetFunctionConfiguration(self, FunctionName, **kwargs):
+        return dict(self._function(FunctionName))
+
+    def _lambda_UpdateFunctionConfiguration(self, FunctionName, **kwargs):
+        function = self._function(FunctionName)
+        if kwargs.get("RevisionId", function["RevisionId"]) != function["RevisionId"]:
+            raise FakeError(412, "PreconditionFailedException", "Revision mismatch")
+        if "Layers" in kwargs:
+            function["Layers"] = [
+                {"Arn": arn, "CodeSize": 0} for arn in kwargs["Layers"]
+            ]
+        for key in ("Handler", "Environment"):
+            if key in kwargs:
+                function[key] = kwargs[key]
+        function["RevisionId"] = str(uuid.uuid4())
+        return dict(function)
+
+    def _lambda_TagResource(self, **kwargs):
+        return {}
+
+    def _cloudwatch_logs_DescribeLogGroups(
+        self, logGroupNamePrefix="", nextToken=None, limit=50, **kwargs
+    ):
+        names = sorted(
+            name for name in self.log_groups if name.startswith(logGroupNamePrefix)
+        )
+        start = int(nextToken or 0)
+        end = start + limit
+        res = {"logGroups": [{"logGroupName": name} for name in names[start:end]]}
+        if end < len(names):
+            res["nextToken"] = str(end)
+        return res
+
+    def _cloudwatch_logs_DescribeSubscriptionFilters(self, logGroupName, **kwargs):
+        return {"subscriptionFilters": list(self._log_group(logGroupName).values())}
+
+    def _cloudwatch_logs_PutSubscriptionFilter(
+        self, logGroupName, filterName, filterPattern, destinationArn, **kwargs
+    ):
+        self._log_group(logGroupName)[filterName] = {
+            "logGroupName": logGroupName,
+            "filterName": filterName,
+            "filterPattern": filterPattern,
+            "destinationArn": destinationArn,
+        }
+        return {}
+
+    def _cloudwatch_logs_DeleteSubscriptionFilter(
+        self, logGroupName, filterName, **kwargs
+    ):
+        filters = self._log_group(logGroupName)
+        if filterName not in filters:
+            raise FakeError(404, "ResourceNotFoundException", filterName)
+        del filters[filterName]
+        return {}
+
+    def _cloudwatch_logs_PutAccountPolicy(
+        self, policyName, policyDocument, policyType, **kwargs
+    ):
+        self.account_policies[(policyType, policyName)] = {
+            "policyName": policyName,
+            "policyDocument": policyDocument,
+            "policyType": policyType,
+            "scope": kwargs.get("scope", "ALL"),
+            "selectionCriteria": kwargs.get("selectionCriteria"),
+            "accountId": ACCOUNT_ID,
+        }
+        return {"accountPolicy": self.account_policies[(policyType, policyName)]}
+
+    def _cloudwatch_logs_DeleteAccountPolicy(self, policyName, policyType, **kwargs):
+        if (policyType, policyName) not in self.account_policies:
+            raise FakeError(404, "ResourceNotFoundException", policyName)
+        del self.account_policies[(policyType, policyName)]
+        return {}
+
+    def _cloudwatch_logs_DescribeAccountPolicies(self, policyType, **kwargs):
+        return {
+            "accountPolicies": [
+                policy
+                for (type_, _), policy in self.account_policies.items()
+                if type_ == policyType
+            ]
+        }
+
+    def _cloudformation_DescribeStacks(self, StackName=None, **kwargs):
+        if StackName not in self.stacks:
+            raise FakeError(
+                400, "ValidationError", "Stack with id %s does not exist" % StackName
+            )
+        return {"Stacks": [self.stacks[StackName]]}
+
+    def _iam_GetRole(self, RoleName, **kwargs):
+        return {
+            "Role": {
+                "RoleName": RoleName,
+                "Arn": "arn:aws:iam::%s:role/%s" % (ACCOUNT_ID, RoleName),
+            }
+        }
+
+    def _iam_AttachRolePolicy(self, **kwargs):
+        return {}
+
+    def _iam_DetachRolePolicy(self, **kwargs):
+        return {}
+
+    def _iam_SimulatePrincipalPolicy(self, ActionNames, **kwargs):
+        return {
+            "EvaluationResults": [
+                {"EvalActionName": action, "EvalDecision": "allowed"}
+                for action in ActionNames
+            ]
+        }
+
+    def _sts_GetCallerIdentity(self, **kwargs):
+        return {
+            "UserId": "AIDAEXAMPLE",
+            "Account": ACCOUNT_ID,
+            "Arn": "arn:aws:iam::%s:user/benchmark" % ACCOUNT_ID,
+        }
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+
+"""
+Benchmarks `functions.list_functions` against a synthetic account.
+
+Usage:
+
+    $ python benchmarks/list_functions.py --functions 10000 --layers 3
+
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from newrelic_lambda_cli.functions import list_functions  # noqa: E402
+
+PAGE_SIZE = 50
+
+
+class FakePaginator(object):
+    def __init__(self, functions):
+        self.functions = functions
+
+    def paginate(self):
+        for i in range(0, len(self.functions), PAGE_SIZE):
+            yield {"Functions": self.functions[i : i + PAGE_SIZE]}
+
+
+class FakeLambdaClient(object):
+    def __init__(self, functions):
+        self.functions = functions
+
+    def get_paginator(self, operation_name):
+        assert operation_name == "list_functions"
+        return FakePaginator(self.functions)
+
+
+class FakeSession(object):
+    def __init__(self, region_name, functions):
+        self.region_name = region_name
+        self.client_ = FakeLambdaClient(functions)
+
+    def client(self, service_name):
+        assert service_name == "lambda"
+        return self.client_
+
+
+def synthetic_functions(region, count, layers):
+    """Returns listing entries where every other function has New Relic installed"""
+    functions = []
+    for i in range(count):
+        function_layers = [
+            {"Arn": "arn:aws:lambda:%s:123456789012:layer:Layer%d:1" % (region, j)}
+            for j in range(layers - 1)
+        ]
+        if i % 2 == 0:
+            function_layers.append(
+                {
+                    "Arn": "arn:aws:lambda:%s:451483290750:layer:NewRelicPython312:1"
+                    % region
+                }
+            )
+        functions.append(
+            {
+                "FunctionName": "function-%d" % i,
+                "Runtime": "python3.12",
+                "Layers": function_layers,
+            }
+        )
+    return functions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--functions", default=10000, type=int)
+    parser.add_argument("--layers", default=3, type=int)
+    parser.add_argument("--region", default="us-east-1")
+    parser.add_argument("--repeat", default=3, type=int)
+    args = parser.parse_args()
+
+    timings = []
+    for _ in range(args.repeat):
+        session = FakeSession(
+            args.region, synthetic_functions(args.region, args.functions, args.layers)
+        )
+        start = time.perf_counter()
+        installed = sum(
+            1 for func in list_functions(session) if func["x-new-relic-enabled"]
+        )
+        timings.append(time.perf_counter() - start)
+        assert installed == (args.functions + 1) // 2
+
+    print(
+        "list_functions: %d functions, %d layers each, best of %d: %.3fs"
+        % (args.functions, args.layers, args.repeat, min(timings))
+    )
+
+
+if __name__ == "__main__":
+    main()
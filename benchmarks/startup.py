@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+
+"""
+Benchmarks how long the CLI takes to start, in a new interpreter for each run.
+
+Usage:
+
+    $ python benchmarks/startup.py --repeat 10
+
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from tabulate import tabulate
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+COMMANDS = (
+    ("--help",),
+    ("layers", "--help"),
+    ("subscriptions", "install", "--help"),
+    ("functions", "list", "--help"),
+)
+
+
+def time_command(code, args, repeat):
+    """Returns the wall time of each run of the Python code with args"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, "-c", code] + list(args),
+            check=True,
+            cwd=ROOT,
+            stdout=subprocess.DEVNULL,
+        )
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", default=5, type=int)
+    args = parser.parse_args()
+
+    # The interpreter alone, to tell the CLI's own startup time apart
+    commands = [("python", "pass", ())]
+    commands += [
+        (
+            "newrelic-lambda " + " ".join(command_args),
+            "from newrelic_lambda_cli.cli import main; main()",
+            command_args,
+        )
+        for command_args in COMMANDS
+    ]
+
+    table = []
+    for name, code, command_args in commands:
+        timings = time_command(code, command_args, args.repeat)
+        table.append(
+            [
+                name,
+                "%.3fs" % min(timings),
+                "%.3fs" % statistics.median(timings),
+            ]
+        )
+    print(tabulate(table, headers=["Command", "Best", "Median"]))
+
+
+if __name__ == "__main__":
+    main()
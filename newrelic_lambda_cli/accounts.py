@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+
+import re
+
+import click
+
+from newrelic_lambda_cli import utils
+from newrelic_lambda_cli.concurrency import run_per_target
+
+DEFAULT_MAX_ACCOUNTS = 4
+DEFAULT_MAX_REGIONS = 4
+
+
+def read_accounts_file(path):
+    """
+    Returns the accounts listed in a file, one AWS account ID or IAM role ARN per
+    line. Blank lines and lines starting with # are ignored.
+    """
+    try:
+        with open(path) as f:
+            lines = [line.strip() for line in f]
+    except OSError as e:
+        raise click.UsageError("Could not read accounts file %s: %s" % (path, e))
+    return [line for line in lines if line and not line.startswith("#")]
+
+
+def get_role_arns(input):
+    """
+    Returns the IAM role to assume in each account passed to --account or
+    --accounts-file, or [None] to work with the AWS profile's own credentials
+    """
+    accounts = []
+    for value in input.accounts or ():
+        accounts.extend(account.strip() for account in value.split(","))
+    if input.accounts_file:
+        accounts.extend(read_accounts_file(input.accounts_file))
+    accounts = utils.unique(account for account in accounts if account)
+
+    if input.role_arn_template and not accounts:
+        raise click.UsageError(
+            "--role-arn-template needs accounts from --account or --accounts-file"
+        )
+
+    role_arns = []
+    for account in accounts:
+        if account.startswith("arn:"):
+            role_arns.append(account)
+            continue
+        if not re.match(r"^\d{12}$", account):
+            raise click.UsageError("Invalid AWS account ID: %s" % account)
+        if not input.role_arn_template:
+            raise click.UsageError(
+                "--role-arn-template is needed to work in account %s" % account
+            )
+        try:
+            role_arns.append(input.role_arn_template.format(account_id=account))
+        except (IndexError, KeyError, ValueError):
+            raise click.UsageError(
+                "Invalid --role-arn-template, use {account_id} for the account ID"
+            )
+    return utils.unique(role_arns) or [None]
+
+
+def get_account_id(role_arn):
+    """Returns the AWS account ID of an IAM role ARN, or None for no role"""
+    return utils.parse_arn(role_arn)["account"] if role_arn else None
+
+
+def run_in_accounts(func, role_arns, regions, max_accounts, max_regions=None):
+    """
+    Calls func(role_arn, region) for each account and region. Up to max_accounts
+    accounts are processed at a time, and up to max_regions regions of each account,
+    or all of them if None.
+
+    :returns: The (account ID, region) targets and the result for each of them,
+        which is the exception raised for the target if there are several
+    """
+    account_results = run_per_target(
+        lambda role_arn: run_per_target(
+            lambda region: func(role_arn, region), regions, max_regions
+        ),
+        role_arns,
+        max_accounts,
+    )
+    targets, results = [], []
+    for role_arn, region_results in zip(role_arns, account_results):
+        if isinstance(region_results, Exception):
+            region_results = [region_results] * len(regions)
+        for region, result in zip(regions, region_results):
+            targets.append((get_account_id(role_arn), region))
+            results.append(result)
+    return targets, results
@@ -10,12 +10,17 @@ Example usage:
 
 """
 
+import os
+import re
+import time
+
 from gql import Client, gql
 from gql.transport.requests import RequestsHTTPTransport
 
 import click
 import requests
 
+from newrelic_lambda_cli import stats, utils
 from newrelic_lambda_cli.cliutils import failure, success
 from newrelic_lambda_cli.types import (
     IntegrationInstall,
@@ -27,11 +32,52 @@ from newrelic_lambda_cli.types import (
 )
 from newrelic_lambda_cli.utils import parse_arn
 
+SCHEMA_CACHE_TTL = 24 * 60 * 60
+
 __cached_license_key = None
 
 
+def _schema_cache_path(url):
+    return os.path.join("nerdgraph", "%s.json" % re.sub(r"[^A-Za-z0-9.-]+", "_", url))
+
+
+def create_client(url, api_key, validate_schema=True):
+    """
+    Returns a gql client for a NerdGraph endpoint. Queries are validated against the
+    endpoint's schema before they are sent. Introspecting the schema is slow, so it
+    is cached on disk for each endpoint URL until SCHEMA_CACHE_TTL expires.
+
+    :param url: The NerdGraph endpoint URL
+    :param api_key: A New Relic User API key
+    :param validate_schema: Whether to fetch the schema and validate queries locally
+    """
+    transport = RequestsHTTPTransport(url=url, use_json=True)
+    transport.headers = {"api-key": api_key}
+    if not validate_schema:
+        return Client(transport=transport, fetch_schema_from_transport=False)
+
+    cache_path = _schema_cache_path(url)
+    cached = utils.read_cache(cache_path)
+    if cached and time.time() - cached.get("FetchedAt", 0) < SCHEMA_CACHE_TTL:
+        try:
+            return Client(transport=transport, introspection=cached["Introspection"])
+        except Exception:
+            # The cached schema is unusable, introspect the endpoint again
+            pass
+
+    try:
+        with stats.timed("newrelic:IntrospectSchema"):
+            client = Client(transport=transport, fetch_schema_from_transport=True)
+    except Exception:
+        return Client(transport=transport, fetch_schema_from_transport=False)
+    utils.write_cache(
+        cache_path, {"FetchedAt": time.time(), "Introspection": client.introspection}
+    )
+    return client
+
+
 class NewRelicGQL(object):
-    def __init__(self, account_id, api_key, region="us"):
+    def __init__(self, account_id, api_key, region="us", validate_schema=True):
         try:
             self.account_id = int(account_id)
         except ValueError:
@@ -48,18 +94,13 @@ class NewRelicGQL(object):
         else:
             raise ValueError("Region must be one of 'us' or 'eu'")
 
-        transport = RequestsHTTPTransport(url=self.url, use_json=True)
-        transport.headers = {"api-key": self.api_key}
-
-        try:
-            self.client = Client(transport=transport, fetch_schema_from_transport=True)
-        except Exception:
-            self.client = Client(transport=transport, fetch_schema_from_transport=False)
+        self.client = create_client(self.url, self.api_key, validate_schema)
 
     def query(self, query, timeout=None, **variable_values):
-        return self.client.execute(
-            gql(query), timeout=timeout, variable_values=variable_values or None
-        )
+        with stats.timed("newrelic:NerdGraph"):
+            return self.client.execute(
+                gql(query), timeout=timeout, variable_values=variable_values or None
+            )
 
     def get_linked_accounts(self):
         """
@@ -348,7 +389,12 @@ def validate_gql_credentials(input):
     )
 
     try:
-        return NewRelicGQL(input.nr_account_id, input.nr_api_key, input.nr_region)
+        return NewRelicGQL(
+            input.nr_account_id,
+            input.nr_api_key,
+            input.nr_region,
+            validate_schema=not input.skip_nr_schema_validation,
+        )
     except requests.exceptions.HTTPError:
         raise click.BadParameter(
             "Could not authenticate with New Relic. Check that your New Relic Account "
@@ -10,18 +10,19 @@ Example usage:
 
 """
 
-from gql import Client, gql
-from gql.transport.requests import RequestsHTTPTransport
+from gql import gql
 
 import click
 import requests
 import json
 
+from newrelic_lambda_cli import stats
+from newrelic_lambda_cli.api import create_client
 from newrelic_lambda_cli.cliutils import failure, success
 
 
 class NRGQL_APM(object):
-    def __init__(self, account_id, api_key, region="us"):
+    def __init__(self, account_id, api_key, region="us", validate_schema=True):
         try:
             self.account_id = int(account_id)
         except ValueError:
@@ -38,18 +39,13 @@ class NRGQL_APM(object):
         else:
             raise ValueError("Region must be one of 'us' or 'eu'")
 
-        transport = RequestsHTTPTransport(url=self.url, use_json=True)
-        transport.headers = {"api-key": self.api_key}
-
-        try:
-            self.client = Client(transport=transport, fetch_schema_from_transport=True)
-        except Exception:
-            self.client = Client(transport=transport, fetch_schema_from_transport=False)
+        self.client = create_client(self.url, self.api_key, validate_schema)
 
     def query(self, query, timeout=None, **variable_values):
-        return self.client.execute(
-            gql(query), timeout=timeout, variable_values=variable_values or None
-        )
+        with stats.timed("newrelic:NerdGraph"):
+            return self.client.execute(
+                gql(query), timeout=timeout, variable_values=variable_values or None
+            )
 
     def get_entity_guids_from_entity_name(self, entity_name) -> dict[str, str]:
         entity_dicts = {}
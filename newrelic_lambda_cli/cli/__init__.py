@@ -1,18 +1,83 @@
 # -*- coding: utf-8 -*-
 
+import importlib
+
 import click
 
-from newrelic_lambda_cli.cli import (
-    apm,
-    functions,
-    integrations,
-    layers,
-    otel_ingestions,
-    subscriptions,
-)
+# The module registering each command group and the group's short help, so that the
+# CLI can list its commands without importing them
+COMMAND_GROUPS = {
+    "apm": (
+        "newrelic_lambda_cli.cli.apm",
+        "Manage New Relic APM Mode of AWS Lambda instrumentation",
+    ),
+    "functions": (
+        "newrelic_lambda_cli.cli.functions",
+        "Manage New Relic AWS Lambda Functions",
+    ),
+    "integrations": (
+        "newrelic_lambda_cli.cli.integrations",
+        "Manage New Relic AWS Lambda Integrations",
+    ),
+    "otel-ingestions": (
+        "newrelic_lambda_cli.cli.otel_ingestions",
+        "Manage New Relic AWS Lambda Otel Log Ingestion lambda",
+    ),
+    "layers": (
+        "newrelic_lambda_cli.cli.layers",
+        "Manage New Relic AWS Lambda Layers",
+    ),
+    "subscriptions": (
+        "newrelic_lambda_cli.cli.subscriptions",
+        "Manage New Relic AWS Lambda Log Subscriptions",
+    ),
+}
+
+
+class LazyGroup(click.Group):
+    """
+    A click group that imports the module of a command group the first time the
+    command is used, so that the CLI starts without importing boto3, gql and the
+    other dependencies of every command
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(LazyGroup, self).__init__(*args, **kwargs)
+        self.lazy_commands = {}
+
+    def add_lazy_command(self, name, module_name, short_help):
+        """Adds a command registered by the module's register function when used"""
+        self.lazy_commands[name] = (module_name, short_help)
+
+    def list_commands(self, ctx):
+        return sorted(set(self.commands) | set(self.lazy_commands))
+
+    def get_command(self, ctx, cmd_name):
+        if cmd_name not in self.commands and cmd_name in self.lazy_commands:
+            module_name, _ = self.lazy_commands[cmd_name]
+            importlib.import_module(module_name).register(self)
+        return super(LazyGroup, self).get_command(ctx, cmd_name)
+
+    def format_commands(self, ctx, formatter):
+        names = [
+            name
+            for name in self.list_commands(ctx)
+            if name not in self.commands or not self.commands[name].hidden
+        ]
+        if not names:
+            return
+        limit = formatter.width - 6 - max(len(name) for name in names)
+        rows = []
+        for name in names:
+            if name in self.commands:
+                rows.append((name, self.commands[name].get_short_help_str(limit)))
+            else:
+                rows.append((name, self.lazy_commands[name][1]))
+        with formatter.section("Commands"):
+            formatter.write_dl(rows)
 
 
-@click.group()
+@click.group(cls=LazyGroup)
 @click.version_option()
 @click.option("--verbose", "-v", help="Increase verbosity", is_flag=True)
 @click.pass_context
@@ -22,12 +87,8 @@ def cli(ctx, verbose):
 
 
 def register_groups(group):
-    apm.register(group)
-    functions.register(group)
-    integrations.register(group)
-    otel_ingestions.register(group)
-    layers.register(group)
-    subscriptions.register(group)
+    for name, (module_name, short_help) in COMMAND_GROUPS.items():
+        group.add_lazy_command(name, module_name, short_help)
 
 
 def main():
@@ -7,7 +7,12 @@ from newrelic_lambda_cli import api, apm, otel_ingestions, permissions, integrat
 from newrelic_lambda_cli.types import (
     AlertsMigrate,
 )
-from newrelic_lambda_cli.cli.decorators import add_options, AWS_OPTIONS, NR_OPTIONS
+from newrelic_lambda_cli.cli.decorators import (
+    add_options,
+    AWS_OPTIONS,
+    NR_OPTIONS,
+    NR_SCHEMA_OPTIONS,
+)
 from newrelic_lambda_cli.cliutils import done, failure
 
 
@@ -49,6 +54,7 @@ def register(group):
     show_default=True,
     type=click.Choice(["us", "eu", "staging"]),
 )
+@add_options(NR_SCHEMA_OPTIONS)
 @add_options(AWS_OPTIONS)
 @click.option(
     "function",
@@ -95,6 +101,7 @@ def alerts_migrate(ctx, **kwargs):
         account_id=input.nr_account_id,
         api_key=input.nr_api_key,
         region=input.nr_region,
+        validate_schema=not input.skip_nr_schema_validation,
     )
 
     print(f"Getting entity GUID for function: {input.function}")
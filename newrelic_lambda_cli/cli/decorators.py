@@ -3,6 +3,58 @@
 import click
 
 from newrelic_lambda_cli import utils
+from newrelic_lambda_cli.accounts import DEFAULT_MAX_ACCOUNTS, DEFAULT_MAX_REGIONS
+from newrelic_lambda_cli.concurrency import parse_rate_limits
+from newrelic_lambda_cli.results import OUTPUT_FORMATS
+from newrelic_lambda_cli.sessions import DEFAULT_MAX_WORKERS
+
+
+def validate_rate_limits(ctx, param, value):
+    """A click callback to parse per operation AWS API rate limits"""
+    try:
+        return parse_rate_limits(value)
+    except ValueError as e:
+        raise click.BadParameter(str(e), ctx=ctx, param=param)
+
+
+def validate_aws_region(ctx, param, value):
+    """
+    A click callback to check that an AWS region is one Lambda is available in, when
+    the option is parsed rather than when the CLI is imported
+    """
+    if value and value not in utils.all_lambda_regions():
+        raise click.BadParameter(
+            "%s is not a region AWS Lambda is available in" % value,
+            ctx=ctx,
+            param=param,
+        )
+    return value
+
+
+def validate_aws_regions(ctx, param, value):
+    """
+    A click callback to expand a list of AWS regions, each of which may be a comma
+    separated list or 'all' for every region Lambda is available in
+    """
+    if not value:
+        return ()
+    available = utils.all_lambda_regions()
+    regions = []
+    for item in value:
+        for region in item.split(","):
+            region = region.strip()
+            if region == "all":
+                regions.extend(available)
+            elif region and region not in available:
+                raise click.BadParameter(
+                    "%s is not a region AWS Lambda is available in" % region,
+                    ctx=ctx,
+                    param=param,
+                )
+            elif region:
+                regions.append(region)
+    return tuple(utils.unique(regions))
+
 
 AWS_OPTIONS = [
     click.option(
@@ -17,10 +69,10 @@ AWS_OPTIONS = [
     click.option(
         "--aws-region",
         "-r",
+        callback=validate_aws_region,
         envvar="AWS_DEFAULT_REGION",
         help="AWS region",
         metavar="<region>",
-        type=click.Choice(utils.all_lambda_regions()),
     ),
     click.option(
         "--aws-permissions-check/--no-aws-permissions-check",
@@ -30,6 +82,138 @@ AWS_OPTIONS = [
     ),
 ]
 
+# For commands that can process several regions concurrently, --aws-region may be
+# passed more than once, as a comma separated list or as 'all'
+MULTI_REGION_AWS_OPTIONS = [
+    AWS_OPTIONS[0],
+    click.option(
+        "aws_regions",
+        "--aws-region",
+        "-r",
+        callback=validate_aws_regions,
+        envvar="AWS_DEFAULT_REGION",
+        help="AWS region, a comma separated list of regions or 'all'. Can be "
+        "passed more than once",
+        metavar="<region>",
+        multiple=True,
+    ),
+    AWS_OPTIONS[2],
+]
+
+CONCURRENCY_OPTIONS = [
+    click.option(
+        "--max-workers",
+        default=DEFAULT_MAX_WORKERS,
+        help="Maximum number of functions to process concurrently",
+        metavar="<count>",
+        show_default=True,
+        type=click.IntRange(min=1),
+    ),
+    click.option(
+        "--adaptive-concurrency/--no-adaptive-concurrency",
+        default=False,
+        show_default=True,
+        help="Adjust the number of in-flight AWS requests (up to --max-workers) to "
+        "observed throttling and latency",
+    ),
+    click.option(
+        "rate_limits",
+        "--rate-limit",
+        callback=validate_rate_limits,
+        help="Maximum requests per second for an AWS operation, shared by all "
+        "workers (e.g. lambda:UpdateFunctionConfiguration=5). Use 0 for no limit",
+        metavar="<operation=rate>",
+        multiple=True,
+    ),
+]
+
+ACCOUNT_OPTIONS = [
+    click.option(
+        "--role-arn-template",
+        help="IAM role to assume in each account passed to --account or "
+        "--accounts-file, with {account_id} in place of the account ID (e.g. "
+        "arn:aws:iam::{account_id}:role/NewRelicLambdaDeployer)",
+        metavar="<template>",
+    ),
+    click.option(
+        "accounts",
+        "--account",
+        help="AWS account ID (or IAM role ARN) to work in by assuming a role. Can be "
+        "a comma separated list and passed more than once",
+        metavar="<account_id>",
+        multiple=True,
+    ),
+    click.option(
+        "--accounts-file",
+        help="File listing an AWS account ID or IAM role ARN per line to work in",
+        metavar="<path>",
+        type=click.Path(exists=True, dir_okay=False, readable=True),
+    ),
+    click.option(
+        "--max-accounts",
+        default=DEFAULT_MAX_ACCOUNTS,
+        help="Maximum number of accounts to process concurrently",
+        metavar="<count>",
+        show_default=True,
+        type=click.IntRange(min=1),
+    ),
+    click.option(
+        "--max-regions",
+        default=DEFAULT_MAX_REGIONS,
+        help="Maximum number of regions of each account to process concurrently",
+        metavar="<count>",
+        show_default=True,
+        type=click.IntRange(min=1),
+    ),
+]
+
+OUTPUT_OPTIONS = [
+    click.option(
+        "--output",
+        default="table",
+        help="Format of the per-function results report. table prints the failed and "
+        "slowest functions to stderr, json prints every result to stdout",
+        show_default=True,
+        type=click.Choice(OUTPUT_FORMATS),
+    ),
+    click.option(
+        "--stats",
+        help="Print the number of calls, latency percentiles, retries and throttles "
+        "of every AWS API operation and New Relic HTTP call made, at exit",
+        is_flag=True,
+    ),
+]
+
+JOURNAL_OPTIONS = [
+    click.option(
+        "--resume",
+        help="Journal of an earlier run to resume, retrying only the functions that "
+        "are pending or failed in it",
+        metavar="<journal>",
+        type=click.Path(exists=True, dir_okay=False, readable=True),
+    ),
+]
+
+PLAN_OPTIONS = [
+    click.option(
+        "--plan",
+        help="Show the changes that would be made to each function without making them",
+        is_flag=True,
+    ),
+    click.option(
+        "--plan-file",
+        help="Save the plan to a file to apply later with --apply-plan (implies --plan)",
+        metavar="<path>",
+        type=click.Path(dir_okay=False, writable=True),
+    ),
+    click.option(
+        "--apply-plan",
+        help="Apply a plan saved with --plan-file instead of resolving functions",
+        metavar="<path>",
+        type=click.Path(exists=True, dir_okay=False, readable=True),
+    ),
+]
+
 NR_OPTIONS = [
     click.option(
         "--nr-account-id",
@@ -59,6 +243,18 @@ NR_OPTIONS = [
     ),
 ]
 
+NR_SCHEMA_OPTIONS = [
+    click.option(
+        "--skip-nr-schema-validation",
+        envvar="NEW_RELIC_SKIP_SCHEMA_VALIDATION",
+        help="Don't fetch the NerdGraph schema to validate queries before they are "
+        "sent. The schema is otherwise cached for a day.",
+        is_flag=True,
+    ),
+]
+
+NR_OPTIONS += NR_SCHEMA_OPTIONS
+
 
 def add_options(options):
     """
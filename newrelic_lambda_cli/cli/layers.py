@@ -1,14 +1,32 @@
 # -*- coding: utf-8 -*-
 
-from concurrent.futures import as_completed, ThreadPoolExecutor
+from concurrent.futures import ThreadPoolExecutor
 
-import boto3
 import click
 
-from newrelic_lambda_cli import layers, permissions
-from newrelic_lambda_cli.cli.decorators import add_options, AWS_OPTIONS
-from newrelic_lambda_cli.cliutils import done, failure
-from newrelic_lambda_cli.functions import get_aliased_functions
+from newrelic_lambda_cli import journals, layers, permissions, plans, stats
+from newrelic_lambda_cli.accounts import get_account_id, get_role_arns, run_in_accounts
+from newrelic_lambda_cli.cli.decorators import (
+    ACCOUNT_OPTIONS,
+    add_options,
+    MULTI_REGION_AWS_OPTIONS,
+    CONCURRENCY_OPTIONS,
+    JOURNAL_OPTIONS,
+    NR_SCHEMA_OPTIONS,
+    OUTPUT_OPTIONS,
+    PLAN_OPTIONS,
+)
+from newrelic_lambda_cli.cliutils import done, failure, target_results
+from newrelic_lambda_cli.concurrency import AdaptiveLimiter, RateLimiter, run_all
+from newrelic_lambda_cli.functions import iter_aliased_functions, UpdateWaiter
+from newrelic_lambda_cli.results import (
+    collect,
+    count_api_call,
+    echo_report,
+    report_output,
+    Results,
+)
+from newrelic_lambda_cli.sessions import get_client_pool
 from newrelic_lambda_cli.types import LayerInstall, LayerUninstall
 
 
@@ -24,6 +42,82 @@ def register(group):
     layers_group.add_command(uninstall)
 
 
+def _validate_plan_options(input, role_arns, regions):
+    if len(role_arns) * len(regions) > 1 and (
+        input.plan or input.plan_file or input.apply_plan or input.resume
+    ):
+        raise click.UsageError(
+            "--plan, --plan-file, --apply-plan and --resume work on a single "
+            "account and --aws-region"
+        )
+    if input.apply_plan and (input.plan or input.plan_file or input.resume):
+        raise click.UsageError(
+            "--apply-plan cannot be combined with --plan, --plan-file or --resume"
+        )
+    if not input.functions and not input.apply_plan and not input.resume:
+        raise click.UsageError("Missing option '--function' / '-f'.")
+
+
+def _resolve_functions(input, command, configs):
+    """Returns the functions to process and the journal to record their outcomes in"""
+    if input.resume:
+        return journals.resume_journal(
+            input.resume,
+            command,
+            input.session.region_name,
+            get_account_id(input.aws_role_arn),
+        )
+    return None, iter_aliased_functions(input, configs)
+
+
+def _resume_hint(journal):
+    if journal:
+        click.echo(
+            "To retry the functions that failed, run this command again with "
+            "--resume %s" % journal.path,
+            err=True,
+        )
+
+
+def _run_roles_stage(journal, func, input, roles):
+    """
+    Attaches or detaches the license key policy once per role, recording the stage
+    in the journal so that --resume finishes it if the run stops before it is done
+    """
+    if journal is None or not roles:
+        return func(input, roles)
+    journal.start_stage("roles", roles)
+    try:
+        succeeded = func(input, roles)
+    except BaseException:
+        journal.finish_stage("roles", False)
+        raise
+    journal.finish_stage("roles", succeeded)
+    return succeeded
+
+
+def _plan(input, limiter, action, plan_function, functions, configs):
+    """Plans the changes to the functions in parallel, then prints and saves them"""
+    with ThreadPoolExecutor(max_workers=input.max_workers) as executor:
+        changes = list(
+            executor.map(
+                lambda function: limiter.run(
+                    plan_function, input, function, configs.pop(function, None)
+                ),
+                functions,
+            )
+        )
+
+    click.echo(plans.format_plan(changes))
+
+    if input.plan_file:
+        plans.save_plan(input.plan_file, action, input.session.region_name, changes)
+        done("Plan saved to %s" % input.plan_file)
+
+    if any(change["status"] == "failed" for change in changes):
+        failure("Plan Incomplete. See messages above for details.", exit=True)
+
+
 @click.command(name="install")
 @click.option(
     "--nr-account-id",
@@ -58,7 +152,8 @@ def register(group):
     show_default=True,
     type=click.Choice(["us", "eu", "staging"]),
 )
-@add_options(AWS_OPTIONS)
+@add_options(NR_SCHEMA_OPTIONS)
+@add_options(MULTI_REGION_AWS_OPTIONS)
 @click.option(
     "functions",
     "--function",
@@ -66,7 +161,6 @@ def register(group):
     help="AWS Lambda function name or ARN",
     metavar="<arn>",
     multiple=True,
-    required=True,
 )
 @click.option(
     "excludes",
@@ -199,67 +293,67 @@ def register(group):
     type=bool,
     help="Java runtimes only - Use New Relic Java Agent layer (sets AWS_LAMBDA_EXEC_WRAPPER, keeps original handler)",
 )
+@add_options(CONCURRENCY_OPTIONS)
+@add_options(ACCOUNT_OPTIONS)
+@add_options(PLAN_OPTIONS)
+@add_options(JOURNAL_OPTIONS)
+@add_options(OUTPUT_OPTIONS)
 @click.pass_context
-def install(ctx, **kwargs):
+def install(ctx, aws_regions, **kwargs):
     """Install New Relic AWS Lambda Layers"""
-    input = LayerInstall(session=None, verbose=ctx.obj["VERBOSE"], **kwargs)
-    input = input._replace(
-        session=boto3.Session(
-            profile_name=input.aws_profile, region_name=input.aws_region
-        )
+    input = LayerInstall(
+        session=None,
+        aws_region=None,
+        aws_role_arn=None,
+        verbose=ctx.obj["VERBOSE"],
+        **kwargs,
     )
-    if input.aws_permissions_check:
-        permissions.ensure_layer_install_permissions(input)
-
-    functions = get_aliased_functions(input)
-
-    with ThreadPoolExecutor() as executor:
-        futures = [
-            executor.submit(
-                layers.install,
-                input._replace(
-                    session=boto3.Session(
-                        profile_name=input.aws_profile, region_name=input.aws_region
-                    )
-                ),
-                function,
-            )
-            for function in functions
-        ]
-        install_success = all(future.result() for future in as_completed(futures))
-
-    if install_success:
-        done("Install Complete")
-        if ctx.obj["VERBOSE"]:
-            click.echo(
-                "\nNext step. Configure the CloudWatch subscription filter for your "
-                "Lambda functions with the below command:\n"
-            )
-            command = [
-                "$",
-                "newrelic-lambda",
-                "subscriptions",
-                "install",
-                "--function",
-                "all",
-            ]
-            if input.aws_profile:
-                command.append("--aws-profile %s" % input.aws_profile)
-            if input.aws_region:
-                command.append("--aws-region %s" % input.aws_region)
-            click.echo(" ".join(command))
-            click.echo(
-                "\nIf you used `--enable-logs` for the `newrelic-lambda integrations "
-                "install` command earlier, run this command instead:\n"
-            )
-            command.append('--filter-pattern ""')
-            click.echo(" ".join(command))
-    else:
-        failure("Install Incomplete. See messages above for details.", exit=True)
+    _run_in_targets(
+        input,
+        aws_regions,
+        "install",
+        on_success=(
+            (lambda: _echo_next_step(input, aws_regions))
+            if ctx.obj["VERBOSE"]
+            else None
+        ),
+    )
+
+
+def _echo_next_step(input, aws_regions):
+    click.echo(
+        "\nNext step. Configure the CloudWatch subscription filter for your "
+        "Lambda functions with the below command:\n"
+    )
+    command = [
+        "$",
+        "newrelic-lambda",
+        "subscriptions",
+        "install",
+        "--function",
+        "all",
+    ]
+    if input.aws_profile:
+        command.append("--aws-profile %s" % input.aws_profile)
+    if aws_regions:
+        command.append("--aws-region %s" % ",".join(aws_regions))
+    if input.role_arn_template:
+        command.append("--role-arn-template %s" % input.role_arn_template)
+    if input.accounts:
+        command.append("--account %s" % ",".join(input.accounts))
+    if input.accounts_file:
+        command.append("--accounts-file %s" % input.accounts_file)
+    click.echo(" ".join(command))
+    click.echo(
+        "\nIf you used `--enable-logs` for the `newrelic-lambda integrations "
+        "install` command earlier, run this command instead:\n"
+    )
+    command.append('--filter-pattern ""')
+    click.echo(" ".join(command))
 
 
 @click.command(name="uninstall")
-@add_options(AWS_OPTIONS)
+@add_options(MULTI_REGION_AWS_OPTIONS)
 @click.option(
     "functions",
     "--function",
@@ -267,7 +361,6 @@ def install(ctx, **kwargs):
     help="Lambda function name or ARN",
     metavar="<arn>",
     multiple=True,
-    required=True,
 )
 @click.option(
     "excludes",
@@ -277,36 +370,174 @@ def install(ctx, **kwargs):
     metavar="<name>",
     multiple=True,
 )
+@add_options(CONCURRENCY_OPTIONS)
+@add_options(ACCOUNT_OPTIONS)
+@add_options(PLAN_OPTIONS)
+@add_options(JOURNAL_OPTIONS)
+@add_options(OUTPUT_OPTIONS)
 @click.pass_context
-def uninstall(ctx, **kwargs):
+def uninstall(ctx, aws_regions, **kwargs):
     """Uninstall New Relic AWS Lambda Layers"""
-    input = LayerUninstall(session=None, verbose=ctx.obj["VERBOSE"], **kwargs)
+    input = LayerUninstall(
+        session=None,
+        aws_region=None,
+        aws_role_arn=None,
+        verbose=ctx.obj["VERBOSE"],
+        **kwargs,
+    )
+    _run_in_targets(input, aws_regions, "uninstall")
+
+
+def _run_in_targets(input, aws_regions, action, on_success=None):
+    """
+    Installs or uninstalls the layers in every account and region, then reports the
+    results and exits with an error if a function failed
+
+    :param action: "install" or "uninstall"
+    :param on_success: Called after reporting that every function succeeded
+    """
+    regions = aws_regions or (None,)
+    role_arns = get_role_arns(input)
+    _validate_plan_options(input, role_arns, regions)
+    if input.stats:
+        stats.collect_until_exit()
+
+    with report_output(input.output) as stdout:
+        targets, results = run_in_accounts(
+            lambda role_arn, region: _run(
+                input._replace(aws_region=region, aws_role_arn=role_arn), action
+            ),
+            role_arns,
+            regions,
+            input.max_accounts,
+            input.max_regions,
+        )
+        if results == [None]:
+            # Only planned
+            return
+        if len(targets) > 1:
+            target_results(targets, results)
+        echo_report(collect(results), input.output, stdout)
+
+        if all(isinstance(result, dict) and result["success"] for result in results):
+            done("%s Complete" % action.capitalize())
+            if on_success is not None:
+                on_success()
+        else:
+            failure(
+                "%s Incomplete. See messages above for details." % action.capitalize(),
+                exit=True,
+            )
+
+
+def _run(input, action):
+    """
+    Installs or uninstalls the layers on the functions in one account and region,
+    with its own client pool and limiters
+
+    :param action: "install" or "uninstall"
+    :returns: None if the changes were only planned, otherwise a dict with the number
+        of functions processed, whether they all succeeded, the journal path and the
+        result record of each function
+    """
+    if action == "install":
+        check_permissions = permissions.ensure_layer_install_permissions
+        plan_function = layers.plan_install
+        process = layers.install
+        apply_change = layers.apply_install
+        roles_stage = layers.attach_license_key_policies
+    else:
+        check_permissions = permissions.ensure_layer_uninstall_permissions
+        plan_function = layers.plan_uninstall
+        process = layers.uninstall
+        apply_change = layers.apply_uninstall
+        roles_stage = layers.detach_license_key_policies
+    command = "layers %s" % action
+
     input = input._replace(
-        session=boto3.Session(
-            profile_name=input.aws_profile, region_name=input.aws_region
+        session=get_client_pool(
+            input.aws_profile,
+            input.aws_region,
+            max_pool_connections=input.max_workers,
+            role_arn=input.aws_role_arn,
         )
     )
+    RateLimiter(input.rate_limits).register(input.session)
+    if input.stats:
+        stats.register(input.session)
     if input.aws_permissions_check:
-        permissions.ensure_layer_uninstall_permissions(input)
-
-    functions = get_aliased_functions(input)
-
-    with ThreadPoolExecutor() as executor:
-        futures = [
-            executor.submit(
-                layers.uninstall,
-                input._replace(
-                    session=boto3.Session(
-                        profile_name=input.aws_profile, region_name=input.aws_region
-                    )
-                ),
-                function,
+        check_permissions(input)
+
+    limiter = AdaptiveLimiter(input.max_workers, adaptive=input.adaptive_concurrency)
+    limiter.register(input.session)
+    input.session.register_event_handler("before-call", count_api_call)
+
+    roles = set()
+    journal = None
+    function_results = Results(
+        action, input.session.region_name, get_account_id(input.aws_role_arn)
+    )
+
+    if input.apply_plan:
+        changes = plans.load_plan(input.apply_plan, action, input.session.region_name)
+        items = changes
+        record = function_results.record
+
+        def dispatch(change):
+            return function_results.run(
+                change["function"], apply_change, input, change, roles, False, waiter
             )
-            for function in functions
-        ]
-        uninstall_success = all(future.result() for future in as_completed(futures))
 
-    if uninstall_success:
-        done("Uninstall Complete")
     else:
-        failure("Uninstall Incomplete. See messages above for details.", exit=True)
+        configs = {}
+        journal, functions = _resolve_functions(input, command, configs)
+
+        if input.plan or input.plan_file:
+            _plan(input, limiter, action, plan_function, functions, configs)
+            return None
+
+        journal = journal or journals.create_journal(
+            command,
+            input.session.region_name,
+            get_account_id(input.aws_role_arn),
+        )
+        click.echo("Recording progress in %s" % journal.path, err=True)
+        # Roles an interrupted run did not get to
+        roles.update(journal.stages.get("roles", []))
+        items = journal.track(functions)
+
+        def record(function, succeeded):
+            journal.record(function, succeeded)
+            function_results.record(function, succeeded)
+
+        def dispatch(function):
+            # Drop each listed configuration once it is used to keep memory bounded
+            return journal.run(
+                function,
+                function_results.run,
+                function,
+                process,
+                input,
+                function,
+                roles,
+                configs.pop(function, None),
+                waiter,
+            )
+
+    waiter = UpdateWaiter(input.session, max_workers=input.max_workers, record=record)
+    success = run_all(
+        lambda item: limiter.run(dispatch, item), items, input.max_workers
+    )
+
+    # Calls waiting for function updates to finish may still be running
+    success = waiter.wait() and success
+    success = _run_roles_stage(journal, roles_stage, input, roles) and success
+
+    if not success:
+        _resume_hint(journal)
+    return {
+        "functions": journal.tracked if journal else len(changes),
+        "success": success,
+        "journal": journal.path if journal else None,
+        "records": function_results.records,
+    }
@@ -1,18 +1,53 @@
 # -*- coding: utf-8 -*-
 
-from concurrent.futures import as_completed, ThreadPoolExecutor
+import functools
 
-import boto3
 import click
+from tabulate import tabulate
 
-from newrelic_lambda_cli import permissions, subscriptions
-from newrelic_lambda_cli.cliutils import done, failure
-from newrelic_lambda_cli.cli.decorators import add_options, AWS_OPTIONS
-from newrelic_lambda_cli.functions import get_aliased_functions
-from newrelic_lambda_cli.types import SubscriptionInstall, SubscriptionUninstall
+from newrelic_lambda_cli import journals, permissions, stats, subscriptions
+from newrelic_lambda_cli.accounts import get_account_id, get_role_arns, run_in_accounts
+from newrelic_lambda_cli.cliutils import done, failure, target_results
+from newrelic_lambda_cli.cli.decorators import (
+    ACCOUNT_OPTIONS,
+    add_options,
+    MULTI_REGION_AWS_OPTIONS,
+    CONCURRENCY_OPTIONS,
+    JOURNAL_OPTIONS,
+    OUTPUT_OPTIONS,
+)
+from newrelic_lambda_cli.concurrency import (
+    AdaptiveLimiter,
+    RateLimiter,
+    run_all,
+    SharedCalls,
+)
+from newrelic_lambda_cli.functions import iter_aliased_functions
+from newrelic_lambda_cli.results import (
+    collect,
+    count_api_call,
+    echo_report,
+    record_error,
+    report_output,
+    Results,
+)
+from newrelic_lambda_cli.sessions import get_client_pool
+from newrelic_lambda_cli.types import (
+    SubscriptionInstall,
+    SubscriptionMigrate,
+    SubscriptionStatus,
+    SubscriptionUninstall,
+)
 
 DEFAULT_FILTER_PATTERN = '?REPORT ?NR_LAMBDA_MONITORING ?"Task timed out" ?RequestId'
 
+PERMISSION_CHECKS = {
+    "subscriptions install": permissions.ensure_subscription_install_permissions,
+    "subscriptions uninstall": permissions.ensure_subscription_uninstall_permissions,
+    "subscriptions migrate": permissions.ensure_subscription_migrate_permissions,
+    "subscriptions rollback": permissions.ensure_subscription_migrate_permissions,
+}
+
 
 @click.group(name="subscriptions")
 def subscriptions_group():
@@ -24,10 +59,291 @@ def register(group):
     group.add_command(subscriptions_group)
     subscriptions_group.add_command(install)
     subscriptions_group.add_command(uninstall)
+    subscriptions_group.add_command(migrate)
+    subscriptions_group.add_command(status)
+
+
+def _validate_options(input, role_arns, regions):
+    if isinstance(input, SubscriptionMigrate) and input.rollback:
+        if input.functions or input.resume:
+            raise click.UsageError(
+                "--rollback restores the functions recorded in the journal, it can't "
+                "be used with --function or --resume"
+            )
+        if len(role_arns) * len(regions) > 1:
+            raise click.UsageError(
+                "--rollback works on a single account and --aws-region"
+            )
+        return
+    if not isinstance(input, SubscriptionMigrate) and input.account_policy:
+        if input.functions or input.resume:
+            raise click.UsageError(
+                "--account-policy applies to every function, it can't be used with "
+                "--function or --resume"
+            )
+        return
+    if len(role_arns) * len(regions) > 1 and input.resume:
+        raise click.UsageError("--resume works on a single account and --aws-region")
+    if not input.functions and not input.resume:
+        raise click.UsageError("Missing option '--function' / '-f'.")
+
+
+def _confirm_account_policy(input, role_arns, regions):
+    """Asks for confirmation before installing an account policy, showing its scope"""
+    if input.force:
+        return
+    targets = len(role_arns) * len(regions)
+    scope = (
+        "%d accounts and regions" % targets if targets > 1 else "the account and region"
+    )
+    click.confirm(
+        "This will send the log events matching filter pattern '%s' of EVERY log "
+        "group in %s, not only those of Lambda functions, to the %slog ingestion "
+        "function. Only the log groups of the log ingestion function and of %d "
+        "excluded functions are left out. The policy counts against the limit of 2 "
+        "subscription filters of every log group. Are you sure you want to proceed?"
+        % (
+            input.filter_pattern,
+            scope,
+            "otel " if input.otel else "",
+            len(input.excludes),
+        ),
+        abort=True,
+        default=False,
+    )
+
+
+def _resolve_functions(input, command, configs):
+    """
+    Returns the functions to process and the journal to record their outcomes in.
+    The configurations of listed functions are stored in configs by function name.
+    """
+    region = input.session.region_name
+    account = get_account_id(input.aws_role_arn)
+    if input.resume:
+        return journals.resume_journal(input.resume, command, region, account)
+    return (
+        journals.create_journal(command, region, account),
+        iter_aliased_functions(input, configs),
+    )
+
+
+def _list_log_groups(input):
+    """
+    Returns the existing Lambda log groups when processing the functions of an alias,
+    or None to look up each function's log group instead
+    """
+    if not any(
+        function.lower() in ("all", "installed", "not-installed")
+        for function in input.functions
+    ):
+        return None
+    log_groups = subscriptions.list_log_groups(input.session)
+    click.echo("Found %d Lambda log groups" % len(log_groups), err=True)
+    return log_groups
+
+
+def _run_in_log_group(
+    input, command, function, func, configs, log_groups, existing_log_groups
+):
+    """
+    Calls func for the log group a function writes to, unless it was already called
+    for another function sharing the log group, in which case its result is reused.
+    Log groups that are known not to exist yet are reported without calling func,
+    and only fail installs.
+    """
+    log_group_name = subscriptions.get_log_group_name(
+        input.session, function, configs.pop(function, None)
+    )
+    if (
+        existing_log_groups is not None
+        and log_group_name.startswith(subscriptions.LAMBDA_LOG_GROUP_PREFIX)
+        and log_group_name not in existing_log_groups
+    ):
+        if command != "subscriptions install":
+            click.echo(
+                "Log group '%s' of '%s' does not exist, skipping"
+                % (log_group_name, function)
+            )
+            return True
+        failure(
+            "Log group '%s' of '%s' does not exist. It is created when the function "
+            "is first invoked." % (log_group_name, function)
+        )
+        record_error("ResourceNotFoundException")
+        return False
+    result, first = log_groups.run(
+        log_group_name, func, input, function, log_group_name
+    )
+    if not first:
+        click.echo(
+            "Log group '%s' of '%s' is shared with another function, already %s"
+            % (log_group_name, function, "processed" if result else "failed")
+        )
+    return result
+
+
+def _resolve_destination(input):
+    """
+    Returns input with the ARN of the log ingestion function to subscribe to, looked
+    up once for every function in the account and region, or None if it is missing
+    """
+    if isinstance(input, SubscriptionMigrate) or input.otel:
+        destination_arn = subscriptions.get_otel_log_ingestion_arn(input)
+    else:
+        destination_arn = subscriptions.get_log_ingestion_arn(input)
+    if destination_arn is None:
+        return None
+    return input._replace(destination_arn=destination_arn)
+
+
+def _run(input, command, func):
+    """
+    Calls func for each function in one account and region, with its own client pool
+    and limiters
+
+    With --account-policy, func installs or removes the account subscription filter
+    policy instead, once for the account and region. When rolling back a migration,
+    func is called with the filter saved for each function in the migration journal.
+
+    :returns: A dict with the number of functions processed, whether they all
+        succeeded, the journal path and the result record of each function
+    """
+    input = input._replace(
+        session=get_client_pool(
+            input.aws_profile,
+            input.aws_region,
+            max_pool_connections=input.max_workers,
+            role_arn=input.aws_role_arn,
+        )
+    )
+    RateLimiter(input.rate_limits).register(input.session)
+    if input.stats:
+        stats.register(input.session)
+    if input.aws_permissions_check:
+        PERMISSION_CHECKS[command](input)
+
+    if command in ("subscriptions install", "subscriptions migrate"):
+        input = _resolve_destination(input)
+        if input is None:
+            return {"functions": 0, "success": False, "journal": None, "records": []}
+
+    if not isinstance(input, SubscriptionMigrate) and input.account_policy:
+        input.session.register_event_handler("before-call", count_api_call)
+        policy_results = Results(
+            command.split()[-1],
+            input.session.region_name,
+            get_account_id(input.aws_role_arn),
+        )
+        success = policy_results.run(
+            subscriptions.account_policy_name(input.otel), func, input
+        )
+        return {
+            "functions": "all",
+            "success": bool(success),
+            "journal": None,
+            "records": policy_results.records,
+        }
+
+    if command == "subscriptions rollback":
+        region = input.session.region_name
+        account = get_account_id(input.aws_role_arn)
+        saved = journals.read_saved(
+            input.rollback, "subscriptions migrate", region, account
+        )
+        journal = journals.create_journal(command, region, account)
+        functions = list(saved)
+
+        def process(function):
+            return func(input, function, saved[function])
+
+    else:
+        configs = {}
+        journal, functions = _resolve_functions(input, command, configs)
+        existing_log_groups = _list_log_groups(input)
+        log_groups = SharedCalls()
+        if command == "subscriptions migrate":
+            # Save each replaced filter in the journal to be able to roll back
+            func = functools.partial(func, save=journal.save)
+
+        def process(function):
+            return _run_in_log_group(
+                input,
+                command,
+                function,
+                func,
+                configs,
+                log_groups,
+                existing_log_groups,
+            )
+
+    click.echo("Recording progress in %s" % journal.path, err=True)
+
+    limiter = AdaptiveLimiter(input.max_workers, adaptive=input.adaptive_concurrency)
+    limiter.register(input.session)
+    input.session.register_event_handler("before-call", count_api_call)
+
+    function_results = Results(
+        command.split()[-1],
+        input.session.region_name,
+        get_account_id(input.aws_role_arn),
+    )
+    success = run_all(
+        lambda function: limiter.run(
+            journal.run, function, function_results.run, function, process, function
+        ),
+        journal.track(functions),
+        input.max_workers,
+    )
+
+    if command == "subscriptions rollback":
+        if not success:
+            click.echo(
+                "To retry the functions that failed, run this command again",
+                err=True,
+            )
+    elif not success:
+        click.echo(
+            "To retry the functions that failed, run this command again with "
+            "--resume %s" % journal.path,
+            err=True,
+        )
+    if command == "subscriptions migrate":
+        click.echo(
+            "To restore the log subscriptions replaced, run this command with "
+            "--rollback %s" % journal.path,
+            err=True,
+        )
+    return {
+        "functions": journal.tracked,
+        "success": success,
+        "journal": journal.path,
+        "records": function_results.records,
+    }
+
+
+def _run_in_targets(input, role_arns, regions, command, func, stdout):
+    """
+    Runs command in each account and region, prints the results report to stdout and
+    returns whether it succeeded in all of them
+    """
+    targets, results = run_in_accounts(
+        lambda role_arn, region: _run(
+            input._replace(aws_region=region, aws_role_arn=role_arn), command, func
+        ),
+        role_arns,
+        regions,
+        input.max_accounts,
+        input.max_regions,
+    )
+    if len(targets) > 1:
+        target_results(targets, results)
+    echo_report(collect(results), input.output, stdout)
+    return all(isinstance(result, dict) and result["success"] for result in results)
 
 
 @click.command(name="install")
-@add_options(AWS_OPTIONS)
+@add_options(MULTI_REGION_AWS_OPTIONS)
 @click.option(
     "functions",
     "--function",
@@ -35,7 +351,6 @@ def register(group):
     help="AWS Lambda function name or ARN",
     metavar="<arn>",
     multiple=True,
-    required=True,
 )
 @click.option(
     "--stackname",
@@ -56,7 +371,6 @@ def register(group):
 @click.option(
     "filter_pattern",
     "--filter-pattern",
-    default=DEFAULT_FILTER_PATTERN,
     help="Custom log subscription filter pattern",
     metavar="<pattern>",
     show_default=False,
@@ -67,64 +381,71 @@ def register(group):
     help="Subscribe to OTEL log ingestion function",
     is_flag=True,
 )
-def install(**kwargs):
+@click.option(
+    "--account-policy",
+    help="Install a single account level subscription filter policy covering every "
+    "log group in the account and region, including those of functions created "
+    "later, instead of a subscription filter per function",
+    is_flag=True,
+)
+@click.option(
+    "--force",
+    help="Install the account level subscription filter policy without asking for "
+    "confirmation",
+    is_flag=True,
+)
+@add_options(CONCURRENCY_OPTIONS)
+@add_options(ACCOUNT_OPTIONS)
+@add_options(JOURNAL_OPTIONS)
+@add_options(OUTPUT_OPTIONS)
+def install(aws_regions, **kwargs):
     """Install New Relic AWS Lambda Log Subscriptions"""
-    input = SubscriptionInstall(session=None, **kwargs)
-    if input.otel and input.filter_pattern == DEFAULT_FILTER_PATTERN:
+    input = SubscriptionInstall(
+        session=None, aws_region=None, aws_role_arn=None, destination_arn=None, **kwargs
+    )
+    if input.account_policy and input.otel and input.filter_pattern is None:
+        raise click.UsageError(
+            "--account-policy with --otel would send every log event of every log "
+            "group in the account to the otel log ingestion function. Pass "
+            "--filter-pattern to select the log events to send, or --filter-pattern "
+            "'' to send them all."
+        )
+    if input.otel and input.filter_pattern in (None, DEFAULT_FILTER_PATTERN):
         input = input._replace(
             filter_pattern="",
         )
+    elif input.filter_pattern is None:
+        input = input._replace(filter_pattern=DEFAULT_FILTER_PATTERN)
     if input.otel and input.stackname == "NewRelicLogIngestion":
         input = input._replace(
             stackname="NewRelicOtelLogIngestion",
         )
-    input = input._replace(
-        session=boto3.Session(
-            profile_name=input.aws_profile, region_name=input.aws_region
-        )
-    )
-    if input.aws_permissions_check:
-        permissions.ensure_subscription_install_permissions(input)
-
-    functions = get_aliased_functions(input)
-
-    with ThreadPoolExecutor() as executor:
-        if input.otel:
-            futures = [
-                executor.submit(
-                    subscriptions.create_otel_log_subscription,
-                    input._replace(
-                        session=boto3.Session(
-                            profile_name=input.aws_profile, region_name=input.aws_region
-                        )
-                    ),
-                    function,
-                )
-                for function in functions
-            ]
-        else:
-            futures = [
-                executor.submit(
-                    subscriptions.create_log_subscription,
-                    input._replace(
-                        session=boto3.Session(
-                            profile_name=input.aws_profile, region_name=input.aws_region
-                        )
-                    ),
-                    function,
-                )
-                for function in functions
-            ]
-        install_success = all(future.result() for future in as_completed(futures))
-
-    if install_success:
-        done("Install Complete")
+    regions = aws_regions or (None,)
+    role_arns = get_role_arns(input)
+    _validate_options(input, role_arns, regions)
+    if input.account_policy:
+        _confirm_account_policy(input, role_arns, regions)
+    if input.stats:
+        stats.collect_until_exit()
+
+    if input.account_policy:
+        subscribe = subscriptions.install_account_policy
+    elif input.otel:
+        subscribe = subscriptions.create_otel_log_subscription
     else:
-        failure("Install Incomplete. See messages above for details.", exit=True)
+        subscribe = subscriptions.create_log_subscription
+
+    with report_output(input.output) as stdout:
+        if _run_in_targets(
+            input, role_arns, regions, "subscriptions install", subscribe, stdout
+        ):
+            done("Install Complete")
+        else:
+            failure("Install Incomplete. See messages above for details.", exit=True)
 
 
 @click.command(name="uninstall")
-@add_options(AWS_OPTIONS)
+@add_options(MULTI_REGION_AWS_OPTIONS)
 @click.option(
     "functions",
     "--function",
@@ -132,7 +453,6 @@ def install(**kwargs):
     help="Lambda function name or ARN",
     metavar="<arn>",
     multiple=True,
-    required=True,
 )
 @click.option(
     "excludes",
@@ -148,49 +468,175 @@ def install(**kwargs):
     help="Subscribe to OTEL log ingestion function",
     is_flag=True,
 )
-def uninstall(**kwargs):
+@click.option(
+    "--account-policy",
+    help="Uninstall the account level subscription filter policy",
+    is_flag=True,
+)
+@add_options(CONCURRENCY_OPTIONS)
+@add_options(ACCOUNT_OPTIONS)
+@add_options(JOURNAL_OPTIONS)
+@add_options(OUTPUT_OPTIONS)
+def uninstall(aws_regions, **kwargs):
     """Uninstall New Relic AWS Lambda Log Subscriptions"""
-    input = SubscriptionUninstall(session=None, **kwargs)
+    input = SubscriptionUninstall(
+        session=None, aws_region=None, aws_role_arn=None, **kwargs
+    )
+    regions = aws_regions or (None,)
+    role_arns = get_role_arns(input)
+    _validate_options(input, role_arns, regions)
+    if input.stats:
+        stats.collect_until_exit()
+
+    if input.account_policy:
+        unsubscribe = subscriptions.remove_account_policy
+    elif input.otel:
+        unsubscribe = subscriptions.remove_otel_log_subscription
+    else:
+        unsubscribe = subscriptions.remove_log_subscription
+
+    with report_output(input.output) as stdout:
+        if _run_in_targets(
+            input, role_arns, regions, "subscriptions uninstall", unsubscribe, stdout
+        ):
+            done("Uninstall Complete")
+        else:
+            failure("Uninstall Incomplete. See messages above for details.", exit=True)
+
+
+@click.command(name="migrate")
+@add_options(MULTI_REGION_AWS_OPTIONS)
+@click.option(
+    "functions",
+    "--function",
+    "-f",
+    help="AWS Lambda function name or ARN",
+    metavar="<arn>",
+    multiple=True,
+)
+@click.option(
+    "--stackname",
+    default="NewRelicOtelLogIngestion",
+    help="The AWS Cloudformation stack name which contains the "
+    "newrelic-otel-log-ingestion lambda function",
+    metavar="<arn>",
+    show_default=True,
+)
+@click.option(
+    "excludes",
+    "--exclude",
+    "-e",
+    help="Functions to exclude (if using 'all, 'installed', 'not-installed aliases)",
+    metavar="<name>",
+    multiple=True,
+)
+@click.option(
+    "filter_pattern",
+    "--filter-pattern",
+    default="",
+    help="Custom log subscription filter pattern for the otel subscription",
+    metavar="<pattern>",
+    show_default=False,
+)
+@click.option(
+    "--rollback",
+    help="Restore the log subscriptions replaced by the migration that recorded "
+    "its progress in this journal",
+    metavar="<path>",
+    type=click.Path(exists=True, dir_okay=False, readable=True),
+)
+@add_options(CONCURRENCY_OPTIONS)
+@add_options(ACCOUNT_OPTIONS)
+@add_options(JOURNAL_OPTIONS)
+@add_options(OUTPUT_OPTIONS)
+def migrate(aws_regions, **kwargs):
+    """Migrate New Relic AWS Lambda Log Subscriptions to OTEL log ingestion"""
+    input = SubscriptionMigrate(
+        session=None, aws_region=None, aws_role_arn=None, destination_arn=None, **kwargs
+    )
+    regions = aws_regions or (None,)
+    role_arns = get_role_arns(input)
+    _validate_options(input, role_arns, regions)
+    if input.stats:
+        stats.collect_until_exit()
+
+    if input.rollback:
+        command = "subscriptions rollback"
+        func = subscriptions.restore_log_subscription
+    else:
+        command = "subscriptions migrate"
+        func = subscriptions.migrate_log_subscription
+
+    with report_output(input.output) as stdout:
+        if _run_in_targets(input, role_arns, regions, command, func, stdout):
+            done("Migration Complete" if not input.rollback else "Rollback Complete")
+        else:
+            failure(
+                "%s Incomplete. See messages above for details."
+                % ("Rollback" if input.rollback else "Migration"),
+                exit=True,
+            )
+
+
+def _get_account_policies(input):
     input = input._replace(
-        session=boto3.Session(
-            profile_name=input.aws_profile, region_name=input.aws_region
+        session=get_client_pool(
+            input.aws_profile, input.aws_region, role_arn=input.aws_role_arn
         )
     )
     if input.aws_permissions_check:
-        permissions.ensure_subscription_uninstall_permissions(input)
-
-    functions = get_aliased_functions(input)
-
-    with ThreadPoolExecutor() as executor:
-        if input.otel:
-            futures = [
-                executor.submit(
-                    subscriptions.remove_otel_log_subscription,
-                    input._replace(
-                        session=boto3.Session(
-                            profile_name=input.aws_profile, region_name=input.aws_region
-                        )
-                    ),
-                    function,
-                )
-                for function in functions
-            ]
-        else:
-            futures = [
-                executor.submit(
-                    subscriptions.remove_log_subscription,
-                    input._replace(
-                        session=boto3.Session(
-                            profile_name=input.aws_profile, region_name=input.aws_region
-                        )
-                    ),
-                    function,
-                )
-                for function in functions
-            ]
-        uninstall_success = all(future.result() for future in as_completed(futures))
-
-    if uninstall_success:
-        done("Uninstall Complete")
-    else:
-        failure("Uninstall Incomplete. See messages above for details.", exit=True)
+        permissions.ensure_subscription_status_permissions(input)
+    return input.session.region_name, subscriptions.get_account_policies(input.session)
+
+
+@click.command(name="status")
+@add_options(MULTI_REGION_AWS_OPTIONS)
+@add_options(ACCOUNT_OPTIONS)
+def status(aws_regions, **kwargs):
+    """Show the New Relic account level log subscription filter policies"""
+    input = SubscriptionStatus(
+        session=None, aws_region=None, aws_role_arn=None, **kwargs
+    )
+    regions = aws_regions or (None,)
+    targets, results = run_in_accounts(
+        lambda role_arn, region: _get_account_policies(
+            input._replace(aws_region=region, aws_role_arn=role_arn)
+        ),
+        get_role_arns(input),
+        regions,
+        input.max_accounts,
+        input.max_regions,
+    )
+
+    accounts = any(account for account, _ in targets)
+    headers = ["Region", "Policy", "Destination", "Filter Pattern", "Log Groups"]
+    if accounts:
+        headers.insert(0, "Account")
+    table = []
+    for (account, region), result in zip(targets, results):
+        row = [account] if accounts else []
+        if isinstance(result, Exception):
+            message = (
+                result.format_message()
+                if isinstance(result, click.ClickException)
+                else str(result) or result.__class__.__name__
+            )
+            table.append(row + [region, "Error: %s" % message, "", "", ""])
+            continue
+        region, policies = result
+        if not policies:
+            table.append(row + [region, "Not installed", "", "", ""])
+        for policy in policies:
+            table.append(
+                row
+                + [
+                    region,
+                    policy["name"],
+                    policy["destination_arn"],
+                    policy["filter_pattern"],
+                    policy["selection_criteria"] or "All",
+                ]
+            )
+    click.echo(tabulate(table, headers=headers))
+    if not all(isinstance(result, tuple) for result in results):
+        failure("Could not check every account and region", exit=True)
@@ -3,6 +3,7 @@
 import click
 
 from click.exceptions import Exit
+from tabulate import tabulate
 
 
 def done(message):
@@ -35,3 +36,38 @@ def warning(message):
         f"⚠️ {message}",
         fg="blue",
     )
+
+
+def target_results(targets, results):
+    """
+    Prints a table of the outcome of a command in each account and region
+
+    :param targets: The (account ID, region) pairs the command was run in. The
+        account ID is None when working with the AWS profile's own account.
+    :param results: For each target, a dict with the number of functions processed,
+        whether they all succeeded and the journal recording them, or the exception
+        raised for the target
+    """
+    accounts = any(account for account, _ in targets)
+    table = []
+    for (account, region), result in zip(targets, results):
+        row = [account] if accounts else []
+        row.append(region)
+        if isinstance(result, Exception):
+            message = (
+                result.format_message()
+                if isinstance(result, click.ClickException)
+                else str(result) or result.__class__.__name__
+            )
+            table.append(row + ["-", "Error: %s" % message, ""])
+            continue
+        table.append(
+            row
+            + [
+                result["functions"],
+                "Complete" if result["success"] else "Incomplete",
+                result["journal"] or "",
+            ]
+        )
+    headers = ["Region", "Functions", "Result", "Journal"]
+    click.echo(tabulate(table, headers=(["Account"] if accounts else []) + headers))
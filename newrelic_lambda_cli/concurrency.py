@@ -0,0 +1,317 @@
+# -*- coding: utf-8 -*-
+
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+THROTTLING_ERROR_CODES = (
+    "LimitExceededException",
+    "RequestLimitExceeded",
+    "RequestThrottled",
+    "RequestThrottledException",
+    "Throttling",
+    "ThrottlingException",
+    "TooManyRequestsException",
+)
+
+
+def is_throttling_response(response):
+    """Returns True if a botocore (http_response, parsed) pair is a throttling error"""
+    if not response:
+        return False
+    _, parsed = response
+    return parsed.get("Error", {}).get("Code") in THROTTLING_ERROR_CODES
+
+
+class AdaptiveLimiter(object):
+    """
+    Limits the number of in-flight tasks, adjusting the limit to the highest rate the
+    AWS control plane will sustain.
+
+    The limit grows by one for every window of tasks that complete without being
+    throttled, is halved when AWS throttles a request and shrinks slowly while task
+    latency is well above the best latency seen so far. When adaptive is False the
+    limit stays fixed at max_limit.
+    """
+
+    def __init__(
+        self,
+        max_limit,
+        adaptive=True,
+        min_limit=1,
+        initial_limit=None,
+        latency_tolerance=2.0,
+    ):
+        self.max_limit = max_limit
+        self.min_limit = min(min_limit, max_limit)
+        self.adaptive = adaptive
+        self.latency_tolerance = latency_tolerance
+        if not adaptive:
+            initial_limit = max_limit
+        elif initial_limit is None:
+            initial_limit = max(self.min_limit, max_limit // 4)
+        self.limit = float(min(max(initial_limit, self.min_limit), max_limit))
+        self.throttles = 0
+        self._in_flight = 0
+        self._latency = None
+        self._best_latency = None
+        self._last_decrease = 0.0
+        self._throttled = False
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        with self._condition:
+            while self._in_flight >= int(self.limit):
+                self._condition.wait()
+            self._in_flight += 1
+
+    def release(self, latency=None):
+        with self._condition:
+            self._in_flight -= 1
+            if self.adaptive:
+                self._adjust(latency)
+            self._condition.notify_all()
+
+    def _adjust(self, latency):
+        now = time.monotonic()
+        if latency is not None:
+            self._latency = (
+                latency
+                if self._latency is None
+                else 0.8 * self._latency + 0.2 * latency
+            )
+            if self._best_latency is None or self._latency < self._best_latency:
+                self._best_latency = self._latency
+
+        # Only back off once per round trip so a burst of throttles from requests
+        # that were already in flight does not collapse the limit
+        cooling_down = now - self._last_decrease < (self._latency or 0)
+
+        if self._throttled:
+            self._throttled = False
+            if not cooling_down:
+                self.limit = max(self.min_limit, self.limit / 2)
+                self._last_decrease = now
+        elif (
+            self._best_latency
+            and self._latency > self._best_latency * self.latency_tolerance
+        ):
+            if not cooling_down:
+                self.limit = max(self.min_limit, self.limit * 0.9)
+                self._last_decrease = now
+        else:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+    def record_throttle(self):
+        with self._condition:
+            self.throttles += 1
+            self._throttled = True
+
+    def on_needs_retry(self, response=None, **kwargs):
+        """A botocore needs-retry event handler that records throttled requests"""
+        if is_throttling_response(response):
+            self.record_throttle()
+
+    def register(self, session):
+        """Records throttling from all AWS clients created by the client pool"""
+        session.register_event_handler("needs-retry", self.on_needs_retry)
+
+    def run(self, func, *args, **kwargs):
+        """Runs func once a slot is available, recording its latency"""
+        self.acquire()
+        start = time.monotonic()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self.release(time.monotonic() - start)
+
+
+# Requests per second allowed for each AWS operation, named as in IAM policies. Based
+# on the documented Lambda, CloudWatch Logs and IAM control-plane quotas.
+DEFAULT_API_RATES = {
+    "iam:AttachRolePolicy": 10,
+    "iam:DetachRolePolicy": 10,
+    "lambda:GetFunction": 100,
+    "lambda:GetFunctionConfiguration": 15,
+    "lambda:ListFunctions": 15,
+    "lambda:TagResource": 10,
+    "lambda:UpdateFunctionConfiguration": 10,
+    "logs:DeleteSubscriptionFilter": 5,
+    "logs:DescribeLogGroups": 5,
+    "logs:DescribeSubscriptionFilters": 5,
+    "logs:PutSubscriptionFilter": 5,
+}
+
+# botocore event names use the hyphenated service id rather than the IAM prefix
+SERVICE_ID_PREFIXES = {
+    "cloudwatch-logs": "logs",
+    "secrets-manager": "secretsmanager",
+}
+
+
+class TokenBucket(object):
+    """A thread safe token bucket refilled at rate tokens per second"""
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.burst = float(burst or max(1, rate))
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Blocks until a token is available"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.burst, self._tokens + (now - self._updated) * self.rate
+                )
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class RateLimiter(object):
+    """
+    Holds one token bucket per AWS operation, shared by every worker thread, so that
+    a bulk run stays under each API's quota instead of retrying its way through it.
+
+    :param rates: A dict of operation name (e.g. "lambda:GetFunction") to requests
+        per second. A "<service>:*" entry applies to operations of that service that
+        are not listed. A rate of 0 or None disables limiting for that operation.
+    """
+
+    def __init__(self, rates):
+        self._buckets = {
+            operation: TokenBucket(rate) for operation, rate in rates.items() if rate
+        }
+
+    def acquire(self, operation):
+        bucket = self._buckets.get(operation)
+        if bucket is None:
+            bucket = self._buckets.get("%s:*" % operation.split(":", 1)[0])
+        if bucket is not None:
+            bucket.acquire()
+
+    def on_before_send(self, event_name=None, **kwargs):
+        """A botocore before-send event handler, called for every request attempt"""
+        _, service_id, operation_name = event_name.split(".", 2)
+        self.acquire(
+            "%s:%s" % (SERVICE_ID_PREFIXES.get(service_id, service_id), operation_name)
+        )
+
+    def register(self, session):
+        """Rate limits all AWS clients created by the client pool"""
+        session.register_event_handler("before-send", self.on_before_send)
+
+
+def parse_rate_limits(values):
+    """
+    Parses "<operation>=<requests per second>" values into a dict of rates, applied on
+    top of DEFAULT_API_RATES
+    """
+    rates = dict(DEFAULT_API_RATES)
+    for value in values or ():
+        operation, sep, rate = value.partition("=")
+        if not sep or ":" not in operation:
+            raise ValueError(
+                "Expected <service>:<operation>=<requests per second>, got: %s" % value
+            )
+        rates[operation.strip()] = float(rate) if rate.strip() else None
+    return rates
+
+
+def run_all(func, items, max_workers):
+    """
+    Calls func for each item with up to max_workers calls in flight. The next item is
+    only read once a call slot is free, so memory stays bounded however many items
+    there are. The calls run on threads as botocore only has blocking clients, and
+    the per-function install and uninstall steps are written against them.
+
+    :param func: Called with each item, returns True if it succeeded
+    :param items: An iterable of items, consumed as calls are dispatched
+    :param max_workers: The maximum number of concurrent calls
+    :returns: True if all calls succeeded
+    :raises: The first exception raised by func, once the calls in flight finish.
+        No more items are read after it.
+    """
+    slots = threading.Semaphore(max_workers)
+    failed = []
+    errors = []
+
+    def _done(future):
+        try:
+            if not future.result():
+                failed.append(future)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            slots.release()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for item in items:
+            slots.acquire()
+            if errors:
+                break
+            executor.submit(func, item).add_done_callback(_done)
+
+    if errors:
+        raise errors[0]
+    return not failed
+
+
+def run_per_target(func, targets, max_workers=None):
+    """
+    Calls func for each target (e.g. an AWS region or account) concurrently, up to
+    max_workers at a time or all of them if None, and returns the results in the
+    order of targets. With several targets, an exception raised for a target is
+    returned as its result so that it doesn't stop the other targets.
+    """
+    if len(targets) == 1:
+        return [func(targets[0])]
+    with ThreadPoolExecutor(max_workers=max_workers or len(targets)) as executor:
+        futures = [executor.submit(func, target) for target in targets]
+    results = []
+    for future in futures:
+        try:
+            results.append(future.result())
+        except Exception as e:
+            results.append(e)
+    return results
+
+
+class SharedCalls(object):
+    """
+    Makes a call once per key however many workers ask for it, e.g. to update a log
+    group shared by several functions once. The first worker asking for a key makes
+    the call, the others wait for it and get its result, or its exception raised.
+    """
+
+    def __init__(self):
+        self._futures = {}
+        self._lock = threading.Lock()
+
+    def run(self, key, func, *args, **kwargs):
+        """
+        Calls func for key unless it was already called for it
+
+        :returns: The result of func and whether this worker made the call
+        """
+        with self._lock:
+            future = self._futures.get(key)
+            first = future is None
+            if first:
+                future = self._futures[key] = Future()
+        if not first:
+            return future.result(), False
+        try:
+            result = func(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        future.set_result(result)
+        return result, True
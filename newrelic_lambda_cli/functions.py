@@ -1,5 +1,9 @@
 # -*- coding: utf-8 -*-
 
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import botocore
 import click
 
@@ -7,9 +11,14 @@ from newrelic_lambda_cli.types import (
     LayerInstall,
     LayerUninstall,
     SubscriptionInstall,
+    SubscriptionMigrate,
     SubscriptionUninstall,
 )
 from newrelic_lambda_cli import utils
+from newrelic_lambda_cli.cliutils import failure
+
+READY_POLL_INTERVAL = 1.0
+READY_TIMEOUT = 5 * 60
 
 
 @utils.catch_boto_errors
@@ -17,6 +26,7 @@ def list_functions(session, filter=None):
     client = session.client("lambda")
 
     all = filter == "all" or not filter
+    arn_prefix = utils.get_arn_prefix(session.region_name)
 
     pager = client.get_paginator("list_functions")
     for res in pager.paginate():
@@ -24,9 +34,7 @@ def list_functions(session, filter=None):
         for func in funcs:
             func.setdefault("x-new-relic-enabled", False)
             for layer in func.get("Layers", []):
-                if layer.get("Arn", "").startswith(
-                    utils.get_arn_prefix(session.region_name)
-                ):
+                if layer.get("Arn", "").startswith(arn_prefix):
                     func["x-new-relic-enabled"] = True
             if all:
                 yield func
@@ -51,40 +59,258 @@ def get_function(session, function_name):
         raise click.UsageError(str(e))
 
 
-def get_aliased_functions(input):
+def get_function_configuration(session, function_name):
     """
-    Retrieves functions for 'all, 'installed' and 'not-installed' aliases and appends
-    them to existing list of functions.
+    Returns the configuration of an AWS lambda function in the same shape as
+    get_function, without the code location and tags that GetFunction also fetches
+    """
+    try:
+        res = session.client("lambda").get_function_configuration(
+            FunctionName=function_name
+        )
+    except botocore.exceptions.ClientError as e:
+        if (
+            e.response
+            and "ResponseMetadata" in e.response
+            and "HTTPStatusCode" in e.response["ResponseMetadata"]
+            and e.response["ResponseMetadata"]["HTTPStatusCode"] == 404
+        ):
+            return None
+        raise click.UsageError(str(e))
+    else:
+        return {"Configuration": res} if res else None
+
+
+def iter_aliased_functions(input, configs=None):
+    """
+    Yields the functions named in input, followed by the functions for the 'all',
+    'installed' and 'not-installed' aliases as each page of the listing arrives, so
+    that callers can start working on the first functions while the rest are listed.
+    Functions are only yielded once and excludes are applied.
+
+    If a dict is passed as configs, the configuration returned by the listing for each
+    aliased function is stored in it by function name, in the same shape as
+    get_function, before the function is yielded, so that it does not need to be
+    fetched again.
     """
     assert isinstance(
         input,
-        (LayerInstall, LayerUninstall, SubscriptionInstall, SubscriptionUninstall),
+        (
+            LayerInstall,
+            LayerUninstall,
+            SubscriptionInstall,
+            SubscriptionMigrate,
+            SubscriptionUninstall,
+        ),
     )
 
-    aliases = [
+    aliases = set(
         function.lower()
         for function in input.functions
         if function.lower() in ("all", "installed", "not-installed")
-    ]
+    )
 
-    functions = [
-        function
-        for function in input.functions
-        if function.lower() not in ("all", "installed", "not-installed")
-        and "newrelic-log-ingestion" not in function.lower()
-        and function not in input.excludes
-    ]
+    seen = set()
+    for function in input.functions:
+        if (
+            function.lower() not in ("all", "installed", "not-installed")
+            and "newrelic-log-ingestion" not in function.lower()
+            and function not in input.excludes
+            and function not in seen
+        ):
+            seen.add(function)
+            yield function
 
     if not aliases:
-        return utils.unique(functions)
+        return
+
+    # One listing covers all the aliases if it is unfiltered
+    if "all" in aliases or aliases == {"installed", "not-installed"}:
+        aliases = {"all"}
 
-    for alias in set(aliases):
+    for alias in aliases:
         for function in list_functions(input.session, alias):
             if (
                 "FunctionName" in function
                 and "newrelic-log-ingestion" not in function["FunctionName"]
                 and function["FunctionName"] not in input.excludes
+                and function["FunctionName"] not in seen
             ):
-                functions.append(function["FunctionName"])
+                seen.add(function["FunctionName"])
+                if configs is not None:
+                    configs[function["FunctionName"]] = {"Configuration": function}
+                yield function["FunctionName"]
+
+
+def get_aliased_functions(input, configs=None):
+    """
+    Retrieves functions for 'all, 'installed' and 'not-installed' aliases and appends
+    them to existing list of functions.
+
+    If a dict is passed as configs, the configuration returned by the listing for each
+    aliased function is stored in it by function name, in the same shape as
+    get_function, so that it does not need to be fetched again.
+    """
+    return list(iter_aliased_functions(input, configs))
+
+
+def is_update_in_progress(e):
+    """Returns True if a call failed because the function is being updated"""
+    return (
+        e.response
+        and e.response.get("Error", {}).get("Code") == "ResourceConflictException"
+    )
+
+
+def is_function_ready(session, function_name):
+    """
+    Returns True if a function has no create or update in progress, so that it
+    accepts further configuration changes
+    """
+    try:
+        res = session.client("lambda").get_function_configuration(
+            FunctionName=function_name
+        )
+    except botocore.exceptions.ClientError:
+        # Let the call waiting on the function report the error
+        return True
+    return res.get("State") != "Pending" and res.get("LastUpdateStatus") != "InProgress"
+
+
+def wait_until_ready(
+    session, function_name, interval=READY_POLL_INTERVAL, timeout=READY_TIMEOUT
+):
+    """Waits for a function update to finish, returns False if it timed out"""
+    deadline = time.monotonic() + timeout
+    while not is_function_ready(session, function_name):
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(interval)
+    return True
+
+
+class UpdateWaiter(object):
+    """
+    A pipeline stage for calls that have to wait until a function update finishes.
+
+    Waiting functions are polled together with GetFunctionConfiguration, and each
+    call runs on the stage's own threads once its function is ready, so the threads
+    making updates never block on a busy function.
+
+    :param session: A boto3 session or client pool
+    :param max_workers: The number of threads polling and making waiting calls
+    :param record: Called with the function name and result of each waiting call,
+        which is results.DEFERRED if the call had to wait again. A call that has to
+        wait again keeps the deadline of the call that handed it back, so a function
+        that never stops updating times out instead of being retried forever.
+    """
+
+    def __init__(
+        self,
+        session,
+        max_workers=None,
+        interval=READY_POLL_INTERVAL,
+        timeout=READY_TIMEOUT,
+        record=None,
+    ):
+        self.session = session
+        self.interval = interval
+        self.timeout = timeout
+        self.record = record
+        self._pending = []
+        self._running = 0
+        self._closed = False
+        self._futures = []
+        self._thread = None
+        self._condition = threading.Condition()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._local = threading.local()
+
+    def when_ready(self, function_name, func):
+        """Calls func once the function has no update in progress"""
+        deadline = time.monotonic() + self.timeout
+        current = getattr(self._local, "current", None)
+        if current is not None and current[0] == function_name:
+            deadline = current[1]
+        with self._condition:
+            self._pending.append((function_name, func, deadline))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._poll, daemon=True)
+                self._thread.start()
+            self._condition.notify_all()
+
+    def _poll(self):
+        while True:
+            with self._condition:
+                while not self._pending and not (self._closed and not self._running):
+                    self._condition.wait()
+                if not self._pending:
+                    return
+
+            time.sleep(self.interval)
+
+            with self._condition:
+                pending, self._pending = self._pending, []
+            names = list(set(function_name for function_name, _, _ in pending))
+            ready = dict(
+                zip(
+                    names,
+                    self._executor.map(
+                        lambda name: is_function_ready(self.session, name), names
+                    ),
+                )
+            )
+
+            now = time.monotonic()
+            with self._condition:
+                for function_name, func, deadline in pending:
+                    # Past its deadline a call fails even if the function reports
+                    # ready, as it may still be conflicting with other updates
+                    timed_out = now >= deadline
+                    if ready[function_name] or timed_out:
+                        self._running += 1
+                        self._futures.append(
+                            self._executor.submit(
+                                self._run,
+                                function_name,
+                                func,
+                                not timed_out,
+                                deadline,
+                            )
+                        )
+                    else:
+                        self._pending.append((function_name, func, deadline))
+
+    def _run(self, function_name, func, ready, deadline):
+        self._local.current = (function_name, deadline)
+        try:
+            if ready:
+                result = func()
+            else:
+                failure(
+                    "Timed out waiting for the update of '%s' to finish" % function_name
+                )
+                result = False
+            if self.record:
+                self.record(function_name, result)
+            return result
+        except BaseException:
+            if self.record:
+                self.record(function_name, False)
+            raise
+        finally:
+            self._local.current = None
+            with self._condition:
+                self._running -= 1
+                self._condition.notify_all()
 
-    return utils.unique(functions)
+    def wait(self):
+        """Waits for all calls to be made, returns True if they all succeeded"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join()
+        self._executor.shutdown()
+        return all([future.result() for future in self._futures])
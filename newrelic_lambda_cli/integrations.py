@@ -21,9 +21,7 @@ from newrelic_lambda_cli.utils import catch_boto_errors, NR_DOCS_ACT_LINKING_URL
 INGEST_STACK_NAME = "NewRelicLogIngestion"
 LICENSE_KEY_STACK_NAME = "NewRelicLicenseKeySecret"
 
-__cached_license_key_arn = None
-__cached_license_key_policy_arn = None
-__cached_license_key_nr_account_id = None
+__cached_license_key_outputs = {}
 
 
 def _get_role(session, role_name):
@@ -814,30 +812,25 @@ def remove_license_key(input):
 
 def _get_license_key_outputs(session):
     """Returns the account id, secret arn and policy ARN for the license key secret if they exist"""
-    global __cached_license_key_arn
-    global __cached_license_key_nr_account_id
-    global __cached_license_key_policy_arn
-    if (
-        __cached_license_key_arn
-        and __cached_license_key_nr_account_id
-        and __cached_license_key_policy_arn
-    ):
-        return (
-            __cached_license_key_arn,
-            __cached_license_key_nr_account_id,
-            __cached_license_key_policy_arn,
-        )
+    # The license key secret stack is per account and region, so is the cache
+    key = (
+        getattr(session, "profile_name", None),
+        getattr(session, "region_name", None),
+        getattr(session, "role_arn", None),
+    )
+    if key in __cached_license_key_outputs:
+        return __cached_license_key_outputs[key]
     output_values = _get_stack_output_value(
         session, ["LicenseKeySecretARN", "NrAccountId", "ViewPolicyARN"]
     )
-    __cached_license_key_arn = output_values.get("LicenseKeySecretARN")
-    __cached_license_key_nr_account_id = output_values.get("NrAccountId")
-    __cached_license_key_policy_arn = output_values.get("ViewPolicyARN")
-    return (
-        __cached_license_key_arn,
-        __cached_license_key_nr_account_id,
-        __cached_license_key_policy_arn,
+    outputs = (
+        output_values.get("LicenseKeySecretARN"),
+        output_values.get("NrAccountId"),
+        output_values.get("ViewPolicyARN"),
     )
+    if all(outputs):
+        __cached_license_key_outputs[key] = outputs
+    return outputs
 
 
 def _get_stack_output_value(session, output_keys):
@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import threading
+import time
+
+import click
+
+from newrelic_lambda_cli import utils
+from newrelic_lambda_cli.results import DEFERRED
+
+
+class Journal(object):
+    """
+    An append-only JSON lines file recording the outcome of each function of a bulk
+    run as soon as it completes, so that an interrupted run can be resumed.
+
+    The first line records the command. Every other line records a function as
+    pending when it is dispatched, or its outcome. The last status recorded for a
+    function wins. Commands may also save what they changed on a function, e.g. to
+    undo it later, and record stages run once all functions are done, e.g. attaching
+    a policy to their roles, so that a resumed run finishes them.
+
+    :param stages: The items of stages that an earlier run did not finish, by stage
+    """
+
+    def __init__(self, path, stages=None):
+        self.path = path
+        self.tracked = 0
+        self.stages = stages or {}
+        self._lock = threading.Lock()
+
+    def _append(self, entry):
+        with self._lock:
+            with open(self.path, "a") as f:
+                f.write(json.dumps(entry) + "\n")
+
+    def track(self, functions):
+        """Yields the functions, recording each as pending before it is dispatched"""
+        for function in functions:
+            self._append({"function": function, "status": "pending"})
+            self.tracked += 1
+            yield function
+
+    def record(self, function, succeeded):
+        """
+        Records the outcome for a function, unless it was deferred in which case the
+        function stays pending until its outcome is recorded
+        """
+        if succeeded is DEFERRED:
+            return
+        self._append(
+            {
+                "function": function,
+                "status": "succeeded" if succeeded else "failed",
+                "time": time.time(),
+            }
+        )
+
+    def save(self, function, **fields):
+        """Saves fields for a function, to read back with read_saved"""
+        self._append({"function": function, "saved": fields})
+
+    def start_stage(self, stage, items):
+        """Records the items of a stage as pending before the stage is run"""
+        self._append({"stage": stage, "items": sorted(items), "status": "pending"})
+
+    def finish_stage(self, stage, succeeded):
+        """Records the outcome of a stage"""
+        self._append(
+            {
+                "stage": stage,
+                "status": "succeeded" if succeeded else "failed",
+                "time": time.time(),
+            }
+        )
+
+    def run(self, function, func, *args, **kwargs):
+        """Calls func for a function and records whether it returned a truthy value"""
+        try:
+            result = func(*args, **kwargs)
+        except BaseException:
+            self.record(function, False)
+            raise
+        self.record(function, result)
+        return result
+
+
+def create_journal(command, region=None, account=None):
+    """
+    Starts a journal in the journal directory for a run of command
+
+    :param command: The command being run, e.g. "layers install"
+    :param region: The AWS region the command is run in, if known
+    :param account: The AWS account ID the command is run in, if a role is assumed
+    """
+    os.makedirs(utils.JOURNAL_DIR, exist_ok=True)
+    target = [value for value in (account, region) if value]
+    path = os.path.join(
+        utils.JOURNAL_DIR,
+        "%s-%s-%d.jsonl"
+        % (
+            "-".join([command.replace(" ", "-")] + target),
+            time.strftime("%Y%m%dT%H%M%S"),
+            os.getpid(),
+        ),
+    )
+    journal = Journal(path)
+    header = {"command": command}
+    if account:
+        header["account"] = account
+    if region:
+        header["region"] = region
+    journal._append(header)
+    return journal
+
+
+def _read_journal(path, command, region=None, account=None):
+    """
+    Reads a journal written by a run of command in region and account
+
+    :returns: The lines of the journal and its entries
+    """
+    try:
+        with open(path) as f:
+            lines = f.read().splitlines(True)
+        header = json.loads(lines[0]) if lines else None
+    except (OSError, ValueError) as e:
+        raise click.UsageError("Could not read journal %s: %s" % (path, e))
+
+    entries = []
+    for line in lines[1:]:
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            # The run was interrupted while writing this line
+            continue
+        if isinstance(entry, dict) and ("function" in entry or "stage" in entry):
+            entries.append(entry)
+
+    if not isinstance(header, dict) or header.get("command") != command:
+        raise click.UsageError("Journal %s was not written by %s" % (path, command))
+    if region and header.get("region", region) != region:
+        raise click.UsageError(
+            "Journal %s was written in region %s, not %s"
+            % (path, header["region"], region)
+        )
+    if header.get("account") != account:
+        raise click.UsageError(
+            "Journal %s was written in a different AWS account (%s, not %s)"
+            % (path, header.get("account") or "default", account or "default")
+        )
+    return lines, entries
+
+
+def resume_journal(path, command, region=None, account=None):
+    """
+    Reopens a journal written by an earlier run of command in region and account
+
+    :returns: The journal and the functions that are pending or failed in it. The
+        items of stages that did not succeed are in the journal's stages.
+    """
+    lines, entries = _read_journal(path, command, region, account)
+    statuses = {}
+    stages = {}
+    for entry in entries:
+        if "stage" in entry:
+            # A failed stage keeps the items it was started with
+            if entry.get("status") == "pending":
+                stages[entry["stage"]] = entry.get("items", [])
+            elif entry.get("status") == "succeeded":
+                stages.pop(entry["stage"], None)
+        elif "status" in entry:
+            statuses[entry["function"]] = entry["status"]
+
+    # Start new outcomes on their own line if the last one was cut short
+    if lines and not lines[-1].endswith("\n"):
+        with open(path, "a") as f:
+            f.write("\n")
+
+    return Journal(path, stages), [
+        function for function, status in statuses.items() if status != "succeeded"
+    ]
+
+
+def read_saved(path, command, region=None, account=None):
+    """
+    Returns the fields saved for each function by a run of command in region and
+    account, the last ones saved for a function winning
+    """
+    _, entries = _read_journal(path, command, region, account)
+    return {
+        entry["function"]: entry["saved"]
+        for entry in entries
+        if "function" in entry and isinstance(entry.get("saved"), dict)
+    }
@@ -1,6 +1,10 @@
 # -*- coding: utf-8 -*-
 #
 import sys  #
+import copy
+import os
+import threading
+import time
 
 import botocore
 import click
@@ -8,14 +12,18 @@ import json
 import requests
 
 
-from newrelic_lambda_cli import api, subscriptions, utils
+from newrelic_lambda_cli import api, plans, results, stats, subscriptions, utils
 from newrelic_lambda_cli.cliutils import failure, success, warning
-from newrelic_lambda_cli.functions import get_function
+from newrelic_lambda_cli.functions import (
+    get_function_configuration,
+    is_update_in_progress,
+    list_functions,
+    wait_until_ready,
+)
 from newrelic_lambda_cli.integrations import _get_license_key_outputs
 from newrelic_lambda_cli.types import LayerInstall, LayerUninstall
 from newrelic_lambda_cli.utils import catch_boto_errors
 
-
 NEW_RELIC_ENV_VARS = (
     "AWS_LAMBDA_EXEC_WRAPPER",
     "NEW_RELIC_ACCOUNT_ID",
@@ -34,16 +42,96 @@ NEW_RELIC_ENV_VARS = (
     "NR_ENV_DELIMITER",
 )
 
+LAYER_INDEX_URL = (
+    "https://%s.layers.newrelic-external.com/get-layers?CompatibleRuntime=%s"
+)
+LAYER_CACHE_TTL = 60 * 60
+
+__cached_layers = {}
+__cached_layers_key_locks = {}
+__cached_layers_lock = threading.Lock()
+
+
+def _layer_cache_path(region, runtime):
+    return os.path.join("layers", "%s-%s.json" % (region, runtime))
+
+
+def _fetch_layers(region, runtime):
+    """
+    Returns the New Relic layers published for the region and runtime, using the
+    on-disk cache while it is fresh and revalidating it with the layer service once
+    it is stale.
+    """
+    cache_path = _layer_cache_path(region, runtime)
+    cached = utils.read_cache(cache_path)
+    if cached and time.time() - cached.get("FetchedAt", 0) < LAYER_CACHE_TTL:
+        return cached.get("Layers", [])
+
+    headers = {}
+    if cached and cached.get("ETag"):
+        headers["If-None-Match"] = cached["ETag"]
+    if cached and cached.get("LastModified"):
+        headers["If-Modified-Since"] = cached["LastModified"]
+
+    try:
+        with stats.timed("newrelic:GetLayerIndex"):
+            req = requests.get(LAYER_INDEX_URL % (region, runtime), headers=headers)
+    except requests.exceptions.RequestException:
+        if cached:
+            return cached.get("Layers", [])
+        raise
+
+    if req.status_code == 304 and cached:
+        cached["FetchedAt"] = time.time()
+        utils.write_cache(cache_path, cached)
+        return cached.get("Layers", [])
+
+    layers = req.json().get("Layers", [])
+    if req.ok:
+        utils.write_cache(
+            cache_path,
+            {
+                "ETag": req.headers.get("ETag"),
+                "FetchedAt": time.time(),
+                "LastModified": req.headers.get("Last-Modified"),
+                "Layers": layers,
+            },
+        )
+    return layers
+
+
+def _get_layers(region, runtime):
+    """Returns the layers for the region and runtime, fetching them once per run"""
+    key = (region, runtime)
+    with __cached_layers_lock:
+        if key in __cached_layers:
+            return __cached_layers[key]
+        key_lock = __cached_layers_key_locks.setdefault(key, threading.Lock())
+
+    # Concurrent workers asking for the same runtime wait for a single fetch
+    with key_lock:
+        with __cached_layers_lock:
+            if key in __cached_layers:
+                return __cached_layers[key]
+        layers = _fetch_layers(region, runtime)
+        with __cached_layers_lock:
+            __cached_layers[key] = layers
+        return layers
+
+
+def clear_index_cache():
+    """Drops the in-memory layer catalog"""
+    global __cached_layers
+    global __cached_layers_key_locks
+    with __cached_layers_lock:
+        __cached_layers = {}
+        __cached_layers_key_locks = {}
+
 
 def index(region, runtime, architecture):
-    req = requests.get(
-        "https://%s.layers.newrelic-external.com/get-layers"
-        "?CompatibleRuntime=%s" % (region, runtime)
-    )
-    layers_response = req.json()
     return [
         layer
-        for layer in layers_response.get("Layers", [])
+        for layer in _get_layers(region, runtime)
         if architecture
         in layer.get("LatestMatchingVersion", {}).get(
             "CompatibleArchitectures", ["x86_64"]
@@ -58,7 +146,16 @@ def layer_selection(
     upgrade=False,
     existing_layer_arn=None,
     slim=False,
+    interactive=None,
 ):
+    """
+    Returns the ARN of the layer to install from the available layers
+
+    :param interactive: Whether to prompt for a layer if there are several to choose
+        from. Defaults to prompting if stdout is a terminal.
+    """
+    if interactive is None:
+        interactive = sys.stdout.isatty()
     layer_options = [
         layer["LatestMatchingVersion"]["LayerVersionArn"] for layer in available_layers
     ]
@@ -81,7 +178,7 @@ def layer_selection(
     if len(available_layers) == 1:
         return available_layers[0]["LatestMatchingVersion"]["LayerVersionArn"]
 
-    if sys.stdout.isatty():
+    if interactive:
         output = "\n".join(
             [
                 "Discovered multiple layers for runtime %s (%s):"
@@ -111,6 +208,17 @@ def layer_selection(
         return selected
 
 
+def _planning(input):
+    """Returns True if the changes are only planned (--plan or --plan-file)"""
+    return bool(input.plan or input.plan_file)
+
+
+def _report_setting(input, message):
+    """Reports a setting an install makes to a function, unless it is only planned"""
+    if not _planning(input):
+        success(message)
+
+
 def _add_new_relic(input, config, nr_license_key):
     assert isinstance(input, LayerInstall)
 
@@ -122,6 +230,7 @@ def _add_new_relic(input, config, nr_license_key):
             "Unsupported Lambda runtime for '%s': %s"
             % (config["Configuration"]["FunctionArn"], runtime)
         )
+        results.record_error("UnsupportedRuntime")
         return False
 
     architectures = config["Configuration"].get("Architectures", ["x86_64"])
@@ -146,10 +255,12 @@ def _add_new_relic(input, config, nr_license_key):
         )
         runtime_handler = prefix + ".handler"
 
+    arn_prefix = utils.get_arn_prefix(aws_region)
+
     existing_newrelic_layer = [
         layer["Arn"]
         for layer in config["Configuration"].get("Layers", [])
-        if layer["Arn"].startswith(utils.get_arn_prefix(aws_region))
+        if layer["Arn"].startswith(arn_prefix)
     ]
 
     has_log_flags = any(
@@ -177,7 +288,7 @@ def _add_new_relic(input, config, nr_license_key):
     existing_layers = [
         layer["Arn"]
         for layer in config["Configuration"].get("Layers", [])
-        if not layer["Arn"].startswith(utils.get_arn_prefix(aws_region))
+        if not layer["Arn"].startswith(arn_prefix)
     ]
 
     new_relic_layer = []
@@ -207,6 +318,7 @@ def _add_new_relic(input, config, nr_license_key):
                 "No Lambda layers published for %s (%s) runtime: %s"
                 % (config["Configuration"]["FunctionArn"], runtime, architecture)
             )
+            results.record_error("NoLayerPublished")
             return False
         existing_layer_arn = (
             existing_newrelic_layer[0] if existing_newrelic_layer else None
@@ -218,6 +330,8 @@ def _add_new_relic(input, config, nr_license_key):
             upgrade=input.upgrade,
             existing_layer_arn=existing_layer_arn,
             slim=input.slim,
+            # Planning never prompts, the layer selected is saved in the plan
+            interactive=False if _planning(input) else None,
         )
 
     update_kwargs = {
@@ -261,9 +375,10 @@ def _add_new_relic(input, config, nr_license_key):
         update_kwargs["Environment"]["Variables"]["NEW_RELIC_APP_NAME"] = str(
             input.app_name
         )
-        success(
+        _report_setting(
+            input,
             "Successfully set NEW_RELIC_APP_NAME to '%s' for the function"
-            % input.app_name
+            % input.app_name,
         )
 
     # Update the NEW_RELIC_LAMBDA_HANDLER envvars only when it's a new install.
@@ -299,15 +414,17 @@ def _add_new_relic(input, config, nr_license_key):
             update_kwargs["Environment"]["Variables"][
                 "NEW_RELIC_EXTENSION_SEND_FUNCTION_LOGS"
             ] = "true"
-            success(
-                "Successfully enabled NEW_RELIC_EXTENSION_SEND_FUNCTION_LOGS tag to the function"
+            _report_setting(
+                input,
+                "Successfully enabled NEW_RELIC_EXTENSION_SEND_FUNCTION_LOGS tag to the function",
             )
         elif input.disable_extension_function_logs or input.disable_function_logs:
             update_kwargs["Environment"]["Variables"][
                 "NEW_RELIC_EXTENSION_SEND_FUNCTION_LOGS"
             ] = "false"
-            success(
-                "Successfully disabled NEW_RELIC_EXTENSION_SEND_FUNCTION_LOGS tag to the function"
+            _report_setting(
+                input,
+                "Successfully disabled NEW_RELIC_EXTENSION_SEND_FUNCTION_LOGS tag to the function",
             )
         elif not input.upgrade:
             update_kwargs["Environment"]["Variables"][
@@ -318,15 +435,17 @@ def _add_new_relic(input, config, nr_license_key):
             update_kwargs["Environment"]["Variables"][
                 "NEW_RELIC_EXTENSION_SEND_EXTENSION_LOGS"
             ] = "true"
-            success(
-                "Successfully enabled NEW_RELIC_EXTENSION_SEND_EXTENSION_LOGS tag to the function"
+            _report_setting(
+                input,
+                "Successfully enabled NEW_RELIC_EXTENSION_SEND_EXTENSION_LOGS tag to the function",
             )
         elif input.disable_extension_logs:
             update_kwargs["Environment"]["Variables"][
                 "NEW_RELIC_EXTENSION_SEND_EXTENSION_LOGS"
             ] = "false"
-            success(
-                "Successfully disabled NEW_RELIC_EXTENSION_SEND_EXTENSION_LOGS tag to the function"
+            _report_setting(
+                input,
+                "Successfully disabled NEW_RELIC_EXTENSION_SEND_EXTENSION_LOGS tag to the function",
             )
         elif not input.upgrade:
             update_kwargs["Environment"]["Variables"][
@@ -337,15 +456,17 @@ def _add_new_relic(input, config, nr_license_key):
             update_kwargs["Environment"]["Variables"][
                 "NEW_RELIC_EXTENSION_SEND_PLATFORM_LOGS"
             ] = "true"
-            success(
-                "Successfully enabled NEW_RELIC_EXTENSION_SEND_PLATFORM_LOGS tag to the function"
+            _report_setting(
+                input,
+                "Successfully enabled NEW_RELIC_EXTENSION_SEND_PLATFORM_LOGS tag to the function",
             )
         elif input.disable_platform_logs:
             update_kwargs["Environment"]["Variables"][
                 "NEW_RELIC_EXTENSION_SEND_PLATFORM_LOGS"
             ] = "false"
-            success(
-                "Successfully disabled NEW_RELIC_EXTENSION_SEND_PLATFORM_LOGS tag to the function"
+            _report_setting(
+                input,
+                "Successfully disabled NEW_RELIC_EXTENSION_SEND_PLATFORM_LOGS tag to the function",
             )
         elif not input.upgrade:
             update_kwargs["Environment"]["Variables"][
@@ -357,22 +478,26 @@ def _add_new_relic(input, config, nr_license_key):
                 "NEW_RELIC_EXTENSION_LOGS_ENABLED"
             ] = input.extension_logs_enabled
             if input.extension_logs_enabled == "true":
-                success(
-                    "Successfully enabled NEW_RELIC_EXTENSION_LOGS_ENABLED for the function"
+                _report_setting(
+                    input,
+                    "Successfully enabled NEW_RELIC_EXTENSION_LOGS_ENABLED for the function",
                 )
             else:
-                success(
-                    "Successfully disabled NEW_RELIC_EXTENSION_LOGS_ENABLED for the function"
+                _report_setting(
+                    input,
+                    "Successfully disabled NEW_RELIC_EXTENSION_LOGS_ENABLED for the function",
                 )
 
         if input.nr_tags:
             update_kwargs["Environment"]["Variables"]["NR_TAGS"] = input.nr_tags
-            success("Successfully added NR_TAGS tag to the function")
+            _report_setting(input, "Successfully added NR_TAGS tag to the function")
         if input.nr_env_delimiter:
             update_kwargs["Environment"]["Variables"][
                 "NR_ENV_DELIMITER"
             ] = input.nr_env_delimiter
-            success("Successfully added NR_ENV_DELIMITER tag to the function")
+            _report_setting(
+                input, "Successfully added NR_ENV_DELIMITER tag to the function"
+            )
         if input.nr_region == "staging":
             update_kwargs["Environment"]["Variables"][
                 "NEW_RELIC_TELEMETRY_ENDPOINT"
@@ -385,7 +510,7 @@ def _add_new_relic(input, config, nr_license_key):
             update_kwargs["Environment"]["Variables"][
                 "NEW_RELIC_LICENSE_KEY"
             ] = input.nr_ingest_key
-            success("Using New Relic ingest key for layer configuration")
+            _report_setting(input, "Using New Relic ingest key for layer configuration")
         elif nr_license_key:
             update_kwargs["Environment"]["Variables"][
                 "NEW_RELIC_LICENSE_KEY"
@@ -408,30 +533,21 @@ def _add_new_relic(input, config, nr_license_key):
         ] = "/opt/lib/newrelic-dotnet-agent/libNewRelicProfiler.so"
 
     if input.apm:
-        success(
+        _report_setting(
+            input,
             "Enabling APM Lambda mode for function '%s' "
-            % config["Configuration"]["FunctionArn"]
+            % config["Configuration"]["FunctionArn"],
         )
         update_kwargs["Environment"]["Variables"]["NEW_RELIC_APM_LAMBDA_MODE"] = "True"
 
     return update_kwargs
 
 
-@catch_boto_errors
-def install(input, function_arn):
-    if input.nr_api_key and input.nr_ingest_key:
-        raise click.UsageError(
-            "Please provide either the --nr-api-key or the --nr-ingest-key flag, but not both."
-        )
-    assert isinstance(input, LayerInstall)
-
-    client = input.session.client("lambda")
-
-    config = get_function(input.session, function_arn)
-    if not config:
-        failure("Could not find function: %s" % function_arn)
-        return False
-
+def _license_key_settings(input):
+    """
+    Returns the license key secret policy ARN and, if the license key is to be set
+    as an environment variable, the license key
+    """
     _, nr_account_id, policy_arn = _get_license_key_outputs(input.session)
 
     # If a managed secret exists but it was created with a different NR account
@@ -483,47 +599,171 @@ def install(input, function_arn):
         gql = api.validate_gql_credentials(input)
         nr_license_key = api.retrieve_license_key(gql)
 
+    return policy_arn, nr_license_key
+
+
+def _planned_change(function_arn, action, status, config=None, update_kwargs=None):
+    """Returns a plan entry for a function that can be saved and applied later"""
+    change = {"function": function_arn, "action": action, "status": status}
+    if config:
+        change["role"] = config["Configuration"].get("Role")
+        change["old_layers"] = [
+            layer["Arn"] for layer in config["Configuration"].get("Layers", [])
+        ]
+        results.annotate(old_layers=change["old_layers"])
+    if update_kwargs and not plans.changes_configuration(
+        config["Configuration"], update_kwargs
+    ):
+        success("No changes needed for the function: %s" % function_arn)
+        change["status"] = "unchanged"
+    if change["status"] == "unchanged":
+        results.annotate(action="skip")
+    elif update_kwargs:
+        if "RevisionId" in config["Configuration"]:
+            update_kwargs["RevisionId"] = config["Configuration"]["RevisionId"]
+        change["update"] = update_kwargs
+        change["changes"] = plans.diff_configuration(
+            config["Configuration"], update_kwargs
+        )
+    return change
+
+
+@catch_boto_errors
+def plan_install(input, function_arn, config=None):
+    """
+    Computes the configuration update that installing the New Relic layer would make
+    to a function, without updating the function
+
+    :param input: A LayerInstall instance
+    :param function_arn: The name or ARN of the function
+    :param config: The function configuration if it is already known (e.g. from
+        listing functions). It is fetched if not provided.
+    :returns: A plan entry to pass to apply_install
+    """
+    if input.nr_api_key and input.nr_ingest_key:
+        raise click.UsageError(
+            "Please provide either the --nr-api-key or the --nr-ingest-key flag, but not both."
+        )
+    assert isinstance(input, LayerInstall)
+
+    if config is None:
+        config = get_function_configuration(input.session, function_arn)
+    if not config:
+        failure("Could not find function: %s" % function_arn)
+        results.record_error("ResourceNotFoundException")
+        return _planned_change(function_arn, "install", "failed")
+
+    policy_arn, nr_license_key = _license_key_settings(input)
+
+    # _add_new_relic updates the environment variables in place, keep the current
+    # configuration to diff against
+    current = copy.deepcopy(config)
     update_kwargs = _add_new_relic(input, config, nr_license_key)
-    if isinstance(update_kwargs, bool):
-        return update_kwargs
+    if update_kwargs is False:
+        return _planned_change(function_arn, "install", "failed")
+    if update_kwargs is True:
+        # Already installed, keep the role so that its license key policy is still
+        # attached if an earlier run stopped before attaching it
+        change = _planned_change(function_arn, "install", "unchanged", current)
+    else:
+        change = _planned_change(
+            function_arn, "install", "update", current, update_kwargs
+        )
+    if change["status"] == "update":
+        # The layer selected, e.g. automatically when planning, applied as planned
+        change["layer_arn"] = update_kwargs["Layers"][0]
+    change["policy_arn"] = policy_arn if input.enable_extension else None
+    change["apm"] = bool(input.apm)
+    change["remove_log_subscription"] = bool(input.enable_extension_function_logs)
+    change["log_group"] = (
+        current["Configuration"].get("LoggingConfig", {}).get("LogGroup")
+    )
+    return change
+
+
+@catch_boto_errors
+def apply_install(input, change, roles=None, retry=False, waiter=None):
+    """
+    Applies a plan entry made by plan_install
+
+    :param input: A LayerInstall instance
+    :param change: The plan entry
+    :param roles: If a set is passed, the license key policy is not attached here.
+        Instead the function's role is added to the set so that the caller can attach
+        the policy once per role with attach_license_key_policies. The roles of
+        functions that are already installed are added too, and their log
+        subscription removal and APM tag are made if they are missing.
+    :param retry: Whether to plan again and retry once if the function changed since
+        it was planned
+    :param waiter: An UpdateWaiter to hand calls that have to wait for a function
+        update to. If not provided, this waits for the update itself.
+    """
+    assert isinstance(input, LayerInstall)
+
+    if change["status"] == "unchanged":
+        return _finish_install(input, change, roles)
+    if change["status"] != "update":
+        return False
+
+    client = input.session.client("lambda")
+    function_arn = change["function"]
+    update_kwargs = change["update"]
 
     try:
         res = client.update_function_configuration(**update_kwargs)
-        if input.apm:
-            client.tag_resource(
-                Resource=config["Configuration"]["FunctionArn"],
-                Tags={
-                    "NR.Apm.Lambda.Mode": "true",
-                },
-            )
-            success("Successfully added APM tag to the function")
     except botocore.exceptions.ClientError as e:
+        if is_update_in_progress(e):
+            # Another update is in progress, try again once it is done
+            return _when_ready(
+                input.session,
+                function_arn,
+                waiter,
+                lambda: apply_install(input, change, roles, retry, waiter),
+            )
+        if _is_revision_conflict(e):
+            if retry:
+                # The function changed since it was read, start over with its
+                # current configuration
+                return install(input, function_arn, roles, waiter=waiter, retry=False)
+            _revision_conflict_failure(input, function_arn)
+            results.record_error(e)
+            return False
         failure(
             "Failed to update configuration for '%s': %s"
-            % (config["Configuration"]["FunctionArn"], e)
+            % (update_kwargs["FunctionName"], e)
         )
+        results.record_error(e)
         return False
     else:
-        if input.enable_extension and policy_arn:
-            _attach_license_key_policy(
-                input.session, config["Configuration"]["Role"], policy_arn
-            )
+        if change["policy_arn"]:
+            if roles is not None:
+                roles.add(change["role"])
+            else:
+                _attach_license_key_policy(
+                    input.session, change["role"], change["policy_arn"]
+                )
 
-        if input.enable_extension_function_logs:
-            subscriptions.remove_log_subscription(input, function_arn)
+        if change["remove_log_subscription"]:
+            subscriptions.remove_log_subscription(
+                input,
+                function_arn,
+                res.get("LoggingConfig", {}).get("LogGroup"),
+            )
 
         if input.verbose:
             click.echo(json.dumps(res, indent=2))
 
-        old_layers = config["Configuration"].get("Layers", [])
-        old_layer_arn = old_layers[0]["Arn"].rsplit(":", 1)[0] if old_layers else "None"
-        old_layer_version = (
-            old_layers[0]["Arn"].split(":")[-1] if old_layers else "None"
-        )
+        old_layers = change["old_layers"]
+        old_layer_arn = old_layers[0].rsplit(":", 1)[0] if old_layers else "None"
+        old_layer_version = old_layers[0].split(":")[-1] if old_layers else "None"
         new_layer = update_kwargs["Layers"][0]
         new_layer_arn = update_kwargs["Layers"][0].rsplit(":", 1)[0]
         new_layer_version = update_kwargs["Layers"][0].split(":")[-1]
 
+        results.annotate(
+            action="install" if old_layer_arn == "None" else "upgrade",
+            new_layers=update_kwargs["Layers"],
+        )
         if old_layer_arn == "None":
             success(
                 "Successfully installed Layer ARN %s for the function: %s"
@@ -534,9 +774,59 @@ def install(input, function_arn):
                 "Successfully upgraded Layer ARN %s from version: %s to version: %s for the function: %s"
                 % (new_layer_arn, old_layer_version, new_layer_version, function_arn)
             )
+
+        if change["apm"]:
+            # Tagging fails until the update above has finished
+            return _when_ready(
+                input.session,
+                function_arn,
+                waiter,
+                lambda: _tag_apm(client, update_kwargs["FunctionName"]),
+            )
         return True
 
 
+def _finish_install(input, change, roles):
+    """
+    Makes the writes that follow the update of a function that needs no update, in
+    case an earlier run updated it but stopped before making them. They only change
+    what is not in place yet.
+    """
+    function_arn = change["function"]
+    if change.get("policy_arn") and change.get("role") and roles is not None:
+        roles.add(change["role"])
+    succeeded = True
+    if change.get("remove_log_subscription"):
+        succeeded = subscriptions.remove_log_subscription(
+            input, function_arn, change.get("log_group")
+        )
+    if change.get("apm"):
+        # Tagging is idempotent and costs as much as reading the tags first
+        succeeded = _tag_apm(input.session.client("lambda"), function_arn) and succeeded
+    return succeeded
+
+
+@catch_boto_errors
+def install(input, function_arn, roles=None, config=None, waiter=None, retry=True):
+    """
+    Installs the New Relic layer on a function
+
+    :param input: A LayerInstall instance
+    :param function_arn: The name or ARN of the function
+    :param roles: If a set is passed, the license key policy is not attached here.
+        Instead the function's role is added to the set so that the caller can attach
+        the policy once per role with attach_license_key_policies.
+    :param config: The function configuration if it is already known (e.g. from
+        listing functions). It is fetched if not provided.
+    :param waiter: An UpdateWaiter to hand calls that have to wait for a function
+        update to
+    :param retry: Whether to read the function again and retry once if it changed
+        while it was being updated
+    """
+    change = plan_install(input, function_arn, config)
+    return apply_install(input, change, roles, retry, waiter)
+
+
 def _remove_new_relic(input, config):
     assert isinstance(input, LayerUninstall)
 
@@ -574,6 +864,7 @@ def _remove_new_relic(input, config):
                 "function '%s'. Unrecognized handler in deployed function."
                 % config["Configuration"]["FunctionArn"]
             )
+            results.record_error("UnrecognizedHandler")
             return False
 
     env_handler = (
@@ -594,10 +885,11 @@ def _remove_new_relic(input, config):
     }
 
     # Remove New Relic layers
+    arn_prefix = utils.get_arn_prefix(aws_region)
     layers = [
         layer["Arn"]
         for layer in config["Configuration"].get("Layers")
-        if not layer["Arn"].startswith(utils.get_arn_prefix(aws_region))
+        if not layer["Arn"].startswith(arn_prefix)
     ]
 
     return {
@@ -609,47 +901,215 @@ def _remove_new_relic(input, config):
 
 
 @catch_boto_errors
-def uninstall(input, function_arn):
+def plan_uninstall(input, function_arn, config=None):
+    """
+    Computes the configuration update that removing the New Relic layer would make
+    to a function, without updating the function
+
+    :param input: A LayerUninstall instance
+    :param function_arn: The name or ARN of the function
+    :param config: The function configuration if it is already known (e.g. from
+        listing functions). It is fetched if not provided.
+    :returns: A plan entry to pass to apply_uninstall
+    """
     assert isinstance(input, LayerUninstall)
 
-    client = input.session.client("lambda")
-
-    config = get_function(input.session, function_arn)
+    if config is None:
+        config = get_function_configuration(input.session, function_arn)
     if not config:
         failure("Could not find function: %s" % function_arn)
-        return False
+        results.record_error("ResourceNotFoundException")
+        return _planned_change(function_arn, "uninstall", "failed")
 
+    # _remove_new_relic updates the environment variables in place, keep the
+    # current configuration to diff against
+    current = copy.deepcopy(config)
     update_kwargs = _remove_new_relic(input, config)
-
     if isinstance(update_kwargs, bool):
-        return update_kwargs
+        return _planned_change(
+            function_arn, "uninstall", "unchanged" if update_kwargs else "failed"
+        )
+
+    return _planned_change(function_arn, "uninstall", "update", current, update_kwargs)
+
+
+@catch_boto_errors
+def apply_uninstall(input, change, roles=None, retry=False, waiter=None):
+    """
+    Applies a plan entry made by plan_uninstall
+
+    :param input: A LayerUninstall instance
+    :param change: The plan entry
+    :param roles: If a set is passed, the license key policy is not detached here.
+        Instead the function's role is added to the set so that the caller can detach
+        the policy once per role with detach_license_key_policies.
+    :param retry: Whether to plan again and retry once if the function changed since
+        it was planned
+    :param waiter: An UpdateWaiter to hand calls that have to wait for a function
+        update to. If not provided, this waits for the update itself.
+    """
+    assert isinstance(input, LayerUninstall)
+
+    if change["status"] != "update":
+        return change["status"] != "failed"
+
+    client = input.session.client("lambda")
+    function_arn = change["function"]
+    update_kwargs = change["update"]
 
     try:
         res = client.update_function_configuration(**update_kwargs)
     except botocore.exceptions.ClientError as e:
+        if is_update_in_progress(e):
+            return _when_ready(
+                input.session,
+                function_arn,
+                waiter,
+                lambda: apply_uninstall(input, change, roles, retry, waiter),
+            )
+        if _is_revision_conflict(e):
+            if retry:
+                return uninstall(input, function_arn, roles, waiter=waiter, retry=False)
+            _revision_conflict_failure(input, function_arn)
+            results.record_error(e)
+            return False
         failure(
             "Failed to update configuration for '%s': %s"
-            % (config["Configuration"]["FunctionArn"], e)
+            % (update_kwargs["FunctionName"], e)
         )
+        results.record_error(e)
         return False
     else:
-        _, _, policy_arn = _get_license_key_outputs(input.session)
-        if policy_arn:
-            _detach_license_key_policy(
-                input.session, config["Configuration"]["Role"], policy_arn
-            )
+        if roles is not None:
+            roles.add(change["role"])
+        else:
+            detach_license_key_policies(input, [change["role"]])
 
         if input.verbose:
             click.echo(json.dumps(res, indent=2))
 
-        old_layers = config["Configuration"].get("Layers", [])
-        old_layer_arn = old_layers[0]["Arn"] if old_layers else "None"
+        old_layers = change["old_layers"]
+        old_layer_arn = old_layers[0] if old_layers else "None"
+        results.annotate(new_layers=update_kwargs.get("Layers", []))
         success(
             "Successfully uninstalled Layer %s from %s" % (old_layer_arn, function_arn)
         )
         return True
 
 
+@catch_boto_errors
+def uninstall(input, function_arn, roles=None, config=None, waiter=None, retry=True):
+    """
+    Removes the New Relic layer from a function
+
+    :param input: A LayerUninstall instance
+    :param function_arn: The name or ARN of the function
+    :param roles: If a set is passed, the license key policy is not detached here.
+        Instead the function's role is added to the set so that the caller can detach
+        the policy once per role with detach_license_key_policies.
+    :param config: The function configuration if it is already known (e.g. from
+        listing functions). It is fetched if not provided.
+    :param waiter: An UpdateWaiter to hand calls that have to wait for a function
+        update to
+    :param retry: Whether to read the function again and retry once if it changed
+        while it was being updated
+    """
+    change = plan_uninstall(input, function_arn, config)
+    return apply_uninstall(input, change, roles, retry, waiter)
+
+
+def _when_ready(session, function_arn, waiter, func):
+    """
+    Calls func once the function has no update in progress, handing it to the waiter
+    if there is one instead of blocking
+
+    :returns: The result of func, or results.DEFERRED if it was handed to the waiter,
+        which records its result
+    """
+    if waiter is not None:
+        waiter.when_ready(function_arn, results.bind(func))
+        return results.DEFERRED
+    if not wait_until_ready(session, function_arn):
+        failure("Timed out waiting for the update of '%s' to finish" % function_arn)
+        results.record_error("UpdateTimeout")
+        return False
+    return func()
+
+
+def _revision_conflict_failure(input, function_arn):
+    if input.apply_plan:
+        failure(
+            "Function '%s' changed since the plan was made, plan again" % function_arn
+        )
+    else:
+        failure(
+            "Function '%s' changed while it was being updated, try again" % function_arn
+        )
+
+
+def _tag_apm(client, function_arn):
+    """Tags a function for APM Lambda mode"""
+    try:
+        client.tag_resource(
+            Resource=function_arn,
+            Tags={
+                "NR.Apm.Lambda.Mode": "true",
+            },
+        )
+    except botocore.exceptions.ClientError as e:
+        failure("Failed to add APM tag to '%s': %s" % (function_arn, e))
+        results.record_error(e)
+        return False
+    else:
+        success("Successfully added APM tag to the function")
+        return True
+
+
+def _is_revision_conflict(e):
+    """Returns True if an update failed because the function's RevisionId changed"""
+    return (
+        e.response
+        and e.response.get("Error", {}).get("Code") == "PreconditionFailedException"
+    )
+
+
+def attach_license_key_policies(input, role_arns):
+    """Attaches the license key secret policy once to each of the roles"""
+    _, _, policy_arn = _get_license_key_outputs(input.session)
+    if not policy_arn:
+        return True
+    return all(
+        [
+            _attach_license_key_policy(input.session, role_arn, policy_arn)
+            for role_arn in sorted(set(role_arns))
+        ]
+    )
+
+
+def detach_license_key_policies(input, role_arns):
+    """
+    Detaches the license key secret policy from each of the roles that is no longer
+    used by a function with a New Relic layer
+    """
+    role_arns = set(role_arns)
+    _, _, policy_arn = _get_license_key_outputs(input.session)
+    if not policy_arn or not role_arns:
+        return True
+    roles_in_use = set(
+        function.get("Role") for function in list_functions(input.session, "installed")
+    )
+    detached = []
+    for role_arn in sorted(role_arns):
+        if role_arn in roles_in_use:
+            click.echo(
+                "Keeping %s policy on %s, it is still used by functions with the New "
+                "Relic layer" % (policy_arn, role_arn)
+            )
+            continue
+        detached.append(_detach_license_key_policy(input.session, role_arn, policy_arn))
+    return all(detached)
+
+
 def _attach_license_key_policy(session, role_arn, policy_arn):
     """Attaches the license key secret policy to the specified role"""
     _, role_name = role_arn.rsplit("/", 1)
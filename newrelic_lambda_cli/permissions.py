@@ -10,6 +10,8 @@ from newrelic_lambda_cli.types import (
     LayerInstall,
     LayerUninstall,
     SubscriptionInstall,
+    SubscriptionMigrate,
+    SubscriptionStatus,
     SubscriptionUninstall,
 )
 from newrelic_lambda_cli.utils import catch_boto_errors
@@ -159,7 +161,10 @@ def ensure_layer_install_permissions(input):
     assert isinstance(input, LayerInstall)
     needed_permissions = check_permissions(
         input.session,
-        actions=["lambda:GetFunction", "lambda:UpdateFunctionConfiguration"],
+        actions=[
+            "lambda:GetFunctionConfiguration",
+            "lambda:UpdateFunctionConfiguration",
+        ],
     )
 
     if needed_permissions:
@@ -186,7 +191,10 @@ def ensure_layer_uninstall_permissions(input):
     assert isinstance(input, LayerUninstall)
     needed_permissions = check_permissions(
         input.session,
-        actions=["lambda:GetFunction", "lambda:UpdateFunctionConfiguration"],
+        actions=[
+            "lambda:GetFunctionConfiguration",
+            "lambda:UpdateFunctionConfiguration",
+        ],
     )
 
     if needed_permissions:
@@ -224,15 +232,22 @@ def ensure_subscription_install_permissions(input):
     :param input: A SubscriptionInstall instance
     """
     assert isinstance(input, SubscriptionInstall)
-    needed_permissions = check_permissions(
-        input.session,
-        actions=[
+    if input.account_policy:
+        actions = [
             "lambda:GetFunction",
+            "lambda:GetFunctionConfiguration",
+            "logs:PutAccountPolicy",
+        ]
+    else:
+        actions = [
+            "lambda:GetFunction",
+            "lambda:GetFunctionConfiguration",
             "logs:DeleteSubscriptionFilter",
+            "logs:DescribeLogGroups",
             "logs:DescribeSubscriptionFilters",
             "logs:PutSubscriptionFilter",
-        ],
-    )
+        ]
+    needed_permissions = check_permissions(input.session, actions=actions)
     if needed_permissions:
         message = [
             "The following AWS permissions are needed to install the New Relic log "
@@ -252,16 +267,74 @@ def ensure_subscription_uninstall_permissions(input):
     :param input: A SubscriptionUninstall instance
     """
     assert isinstance(input, SubscriptionUninstall)
+    if input.account_policy:
+        actions = ["logs:DeleteAccountPolicy"]
+    else:
+        actions = [
+            "lambda:GetFunctionConfiguration",
+            "logs:DeleteSubscriptionFilter",
+            "logs:DescribeLogGroups",
+            "logs:DescribeSubscriptionFilters",
+        ]
+    needed_permissions = check_permissions(input.session, actions=actions)
+    if needed_permissions:
+        message = [
+            "The following AWS permissions are needed to uninstall the New Relic log "
+            "subscription filter:\n"
+        ]
+        for needed_permission in needed_permissions:
+            message.append(" * %s" % needed_permission)
+        message.append("\nEnsure your AWS user has these permissions and try again.")
+        raise click.UsageError("\n".join(message))
+
+
+def ensure_subscription_migrate_permissions(input):
+    """
+    Ensures that the current AWS session has the necessary permissions to migrate the
+    New Relic log subscription filter to the otel one.
+
+    :param input: A SubscriptionMigrate instance
+    """
+    assert isinstance(input, SubscriptionMigrate)
     needed_permissions = check_permissions(
         input.session,
-        actions=["logs:DeleteSubscriptionFilter", "logs:DescribeSubscriptionFilters"],
+        actions=[
+            "lambda:GetFunction",
+            "lambda:GetFunctionConfiguration",
+            "logs:DeleteSubscriptionFilter",
+            "logs:DescribeLogGroups",
+            "logs:DescribeSubscriptionFilters",
+            "logs:PutSubscriptionFilter",
+        ],
     )
     if needed_permissions:
         message = [
-            "The following AWS permissions are needed to uninstall the New Relic log "
+            "The following AWS permissions are needed to migrate the New Relic log "
             "subscription filter:\n"
         ]
         for needed_permission in needed_permissions:
             message.append(" * %s" % needed_permission)
         message.append("\nEnsure your AWS user has these permissions and try again.")
         raise click.UsageError("\n".join(message))
+
+
+def ensure_subscription_status_permissions(input):
+    """
+    Ensures that the current AWS session has the necessary permissions to check the
+    New Relic account subscription filter policies.
+
+    :param input: A SubscriptionStatus instance
+    """
+    assert isinstance(input, SubscriptionStatus)
+    needed_permissions = check_permissions(
+        input.session, actions=["logs:DescribeAccountPolicies"]
+    )
+    if needed_permissions:
+        message = [
+            "The following AWS permissions are needed to check the New Relic account "
+            "subscription filter policies:\n"
+        ]
+        for needed_permission in needed_permissions:
+            message.append(" * %s" % needed_permission)
+        message.append("\nEnsure your AWS user has these permissions and try again.")
+        raise click.UsageError("\n".join(message))
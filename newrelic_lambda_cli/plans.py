@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+
+import json
+import os
+
+import click
+
+PLAN_VERSION = 1
+
+
+def diff_configuration(configuration, update_kwargs):
+    """
+    Returns the layer, handler and environment variable changes that an
+    UpdateFunctionConfiguration call with update_kwargs would make to a function
+
+    :param configuration: The current function configuration
+    :param update_kwargs: The UpdateFunctionConfiguration arguments
+    """
+    old_layers = [layer["Arn"] for layer in configuration.get("Layers", [])]
+    new_layers = update_kwargs.get("Layers", old_layers)
+    old_handler = configuration.get("Handler")
+    new_handler = update_kwargs.get("Handler", old_handler)
+    old_env = configuration.get("Environment", {}).get("Variables", {})
+    new_env = update_kwargs.get("Environment", {}).get("Variables", old_env)
+    return {
+        "layers": {
+            "added": [layer for layer in new_layers if layer not in old_layers],
+            "removed": [layer for layer in old_layers if layer not in new_layers],
+        },
+        "handler": [old_handler, new_handler] if old_handler != new_handler else None,
+        "environment": {
+            "added": sorted(set(new_env) - set(old_env)),
+            "changed": sorted(
+                key
+                for key in set(old_env) & set(new_env)
+                if old_env[key] != new_env[key]
+            ),
+            "removed": sorted(set(old_env) - set(new_env)),
+        },
+    }
+
+
+def changes_configuration(configuration, update_kwargs):
+    """
+    Returns True if an UpdateFunctionConfiguration call with update_kwargs would
+    change the function, False if it would leave the configuration as it is
+    """
+    current = {
+        "Layers": [layer["Arn"] for layer in configuration.get("Layers", [])],
+        "Handler": configuration.get("Handler"),
+        "Environment": {
+            "Variables": configuration.get("Environment", {}).get("Variables", {})
+        },
+    }
+    return any(
+        value != current.get(key)
+        for key, value in update_kwargs.items()
+        if key not in ("FunctionName", "RevisionId")
+    )
+
+
+def format_plan(changes):
+    """
+    Returns a compact, human readable diff for each planned change followed by
+    totals. Environment variables are listed by name only, as their values may be
+    license keys.
+    """
+    lines = []
+    totals = {"update": 0, "unchanged": 0, "failed": 0}
+    for change in changes:
+        totals[change["status"]] += 1
+        if change["status"] != "update":
+            lines.append("  %s (%s)" % (change["function"], change["status"]))
+            continue
+        lines.append("~ %s" % change["function"])
+        diff = change["changes"]
+        for layer in diff["layers"]["added"]:
+            lines.append("    layer    + %s" % layer)
+        for layer in diff["layers"]["removed"]:
+            lines.append("    layer    - %s" % layer)
+        if diff["handler"]:
+            lines.append("    handler  %s -> %s" % tuple(diff["handler"]))
+        for sign, key in (("+", "added"), ("~", "changed"), ("-", "removed")):
+            if diff["environment"][key]:
+                lines.append(
+                    "    env      %s %s" % (sign, ", ".join(diff["environment"][key]))
+                )
+    lines.append(
+        "\nPlan: %(update)d to update, %(unchanged)d unchanged, %(failed)d failed"
+        % totals
+    )
+    return "\n".join(lines)
+
+
+def save_plan(path, action, region, changes):
+    """
+    Saves planned changes so that they can be applied later with load_plan. The file
+    is only readable by the current user since environment variables may contain
+    license keys.
+    """
+    plan = {
+        "version": PLAN_VERSION,
+        "action": action,
+        "region": region,
+        "changes": changes,
+    }
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w") as f:
+        json.dump(plan, f, indent=2)
+
+
+def load_plan(path, action, region):
+    """Loads the planned changes saved by save_plan for the action and region"""
+    try:
+        with open(path) as f:
+            plan = json.load(f)
+    except (OSError, ValueError) as e:
+        raise click.UsageError("Could not read plan %s: %s" % (path, e))
+    if not isinstance(plan, dict) or plan.get("version") != PLAN_VERSION:
+        raise click.UsageError("Unsupported plan file: %s" % path)
+    if plan.get("action") != action:
+        raise click.UsageError(
+            "Plan %s was made for layers %s, not layers %s"
+            % (path, plan.get("action"), action)
+        )
+    if plan.get("region") != region:
+        raise click.UsageError(
+            "Plan %s was made for region %s, not %s"
+            % (path, plan.get("region"), region)
+        )
+    return plan["changes"]
@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+
+import contextlib
+import functools
+import json
+import sys
+import threading
+import time
+
+import botocore
+import click
+from tabulate import tabulate
+
+OUTPUT_FORMATS = ("table", "json")
+SLOWEST_FUNCTIONS = 5
+
+_local = threading.local()
+
+# Returned for a function whose remaining calls were handed to another thread, e.g.
+# an UpdateWaiter. It is truthy so that it doesn't fail the run, but the function
+# stays pending until the deferred call records its outcome.
+DEFERRED = type("Deferred", (object,), {"__repr__": lambda self: "DEFERRED"})()
+
+
+class Results(object):
+    """
+    Collects a result record for every function processed by a bulk command: the
+    action taken, its status, the layers before and after, the time spent on it,
+    the AWS API calls it made and the error class if it failed.
+
+    Records are filled in by the thread processing a function. Calls deferred to
+    another thread, e.g. until a function update finishes, are attributed to the
+    same record with bind.
+    """
+
+    def __init__(self, action, region=None, account=None):
+        self.action = action
+        self.region = region
+        self.account = account
+        self._records = {}
+        self._lock = threading.Lock()
+
+    def _record(self, function):
+        with self._lock:
+            if function not in self._records:
+                self._records[function] = {
+                    "function": function,
+                    "account": self.account,
+                    "region": self.region,
+                    "action": self.action,
+                    "status": "pending",
+                    "old_layers": None,
+                    "new_layers": None,
+                    "duration": 0.0,
+                    "api_calls": 0,
+                    "error": None,
+                }
+            return self._records[function]
+
+    def run(self, function, func, *args, **kwargs):
+        """Calls func for a function and records its outcome in the function's record"""
+        return _call(self._record(function), func, *args, **kwargs)
+
+    def record(self, function, succeeded):
+        """Records the outcome for a function, e.g. of a call made by an UpdateWaiter"""
+        if succeeded is not DEFERRED:
+            self._record(function)["status"] = "succeeded" if succeeded else "failed"
+
+    @property
+    def records(self):
+        with self._lock:
+            return list(self._records.values())
+
+
+def _call(record, func, *args, **kwargs):
+    previous = getattr(_local, "record", None)
+    _local.record = record
+    start = time.monotonic()
+    try:
+        result = func(*args, **kwargs)
+    except Exception as e:
+        record["status"] = "failed"
+        record["error"] = record["error"] or error_class(e)
+        raise
+    finally:
+        record["duration"] += time.monotonic() - start
+        _local.record = previous
+    if result is not DEFERRED:
+        record["status"] = "succeeded" if result else "failed"
+    return result
+
+
+def bind(func):
+    """
+    Returns func bound to the result record of the function being processed by the
+    current thread, to call it later from another thread
+    """
+    record = getattr(_local, "record", None)
+    if record is None:
+        return func
+    return functools.partial(_call, record, func)
+
+
+def annotate(**fields):
+    """Sets fields on the result record of the function being processed, if any"""
+    record = getattr(_local, "record", None)
+    if record is not None:
+        record.update(fields)
+
+
+def record_error(error):
+    """
+    Records why the function being processed failed
+
+    :param error: An exception, or an error class name for failures that are not
+        raised as one
+    """
+    annotate(error=error_class(error))
+
+
+def error_class(error):
+    """Returns the AWS error code of a ClientError, otherwise the exception class"""
+    if isinstance(error, str):
+        return error
+    if isinstance(error, botocore.exceptions.ClientError):
+        return error.response.get("Error", {}).get("Code") or "ClientError"
+    return error.__class__.__name__
+
+
+def count_api_call(**kwargs):
+    """A botocore before-call handler counting calls for the function being processed"""
+    record = getattr(_local, "record", None)
+    if record is not None:
+        record["api_calls"] += 1
+
+
+def collect(target_results):
+    """
+    Returns the result records of every target (account and region) of a run,
+    skipping targets that failed before processing functions
+    """
+    return [
+        record
+        for result in target_results
+        if isinstance(result, dict)
+        for record in result["records"]
+    ]
+
+
+def summarize(records):
+    """Returns the totals for a list of result records"""
+    return {
+        "functions": len(records),
+        "succeeded": sum(1 for record in records if record["status"] == "succeeded"),
+        "failed": sum(1 for record in records if record["status"] != "succeeded"),
+        "api_calls": sum(record["api_calls"] for record in records),
+        "duration": sum(record["duration"] for record in records),
+    }
+
+
+def _rows(records, targets):
+    rows = []
+    for record in records:
+        row = [record["function"]]
+        if targets:
+            row.append(
+                "/".join(
+                    value for value in (record["account"], record["region"]) if value
+                )
+            )
+        row.extend(
+            [
+                record["action"],
+                record["error"] or record["status"],
+                "%.2fs" % record["duration"],
+                record["api_calls"],
+            ]
+        )
+        rows.append(row)
+    return rows
+
+
+def format_table(records):
+    """
+    Returns the totals of a run followed by tables of the functions that failed and
+    of the slowest functions
+    """
+    totals = summarize(records)
+    lines = [
+        "Processed %(functions)d functions: %(succeeded)d succeeded, %(failed)d "
+        "failed, %(api_calls)d AWS API calls" % totals
+    ]
+    targets = len(set((record["account"], record["region"]) for record in records)) > 1
+    headers = ["Function"] + (["Target"] if targets else [])
+    headers += ["Action", "Result", "Duration", "API Calls"]
+
+    failed = [record for record in records if record["status"] != "succeeded"]
+    if failed:
+        lines.append("\nFailed functions:")
+        lines.append(tabulate(_rows(failed, targets), headers=headers))
+
+    slowest = sorted(records, key=lambda record: record["duration"], reverse=True)
+    if slowest:
+        lines.append("\nSlowest functions:")
+        lines.append(
+            tabulate(_rows(slowest[:SLOWEST_FUNCTIONS], targets), headers=headers)
+        )
+    return "\n".join(lines)
+
+
+def format_json(records):
+    """Returns a JSON report with every result record and the totals"""
+    return json.dumps(
+        {"summary": summarize(records), "results": records}, indent=2, default=str
+    )
+
+
+def echo_report(records, output, file=None):
+    """
+    Prints the report of a run, as JSON to file (stdout by default) or as tables to
+    stderr along with the other messages
+    """
+    if output == "json":
+        click.echo(format_json(records), file=file)
+    elif records:
+        click.echo("\n" + format_table(records), err=True)
+
+
+@contextlib.contextmanager
+def report_output(output):
+    """
+    Yields the stream to print the report of a run to. For JSON reports, anything
+    else printed to stdout inside the block goes to stderr, so that the report can
+    be parsed.
+    """
+    stdout = sys.stdout
+    if output != "json":
+        yield stdout
+        return
+    with contextlib.redirect_stdout(sys.stderr):
+        yield stdout
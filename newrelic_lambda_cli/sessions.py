@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+
+import os
+import threading
+
+import boto3
+import botocore
+import botocore.credentials
+import botocore.session
+
+DEFAULT_MAX_WORKERS = min(32, (os.cpu_count() or 1) + 4)
+ROLE_SESSION_NAME = "newrelic-lambda-cli"
+
+__cached_pools = {}
+__cached_pools_lock = threading.Lock()
+__cached_role_credentials = {}
+
+
+class ClientPool(object):
+    """
+    A boto3 session wrapper that creates each service client once and shares it
+    between worker threads.
+
+    boto3 sessions are not thread safe, but the clients they create are. Credentials
+    are resolved by the wrapped session once and reused by every client, so
+    assume-role and SSO profiles only hit STS a single time per run.
+    """
+
+    def __init__(self, session, max_pool_connections=None, role_arn=None):
+        self.session = session
+        self.max_pool_connections = max_pool_connections
+        self.role_arn = role_arn
+        self._clients = {}
+        self._event_handlers = []
+        self._lock = threading.Lock()
+
+    @property
+    def profile_name(self):
+        return self.session.profile_name
+
+    @property
+    def region_name(self):
+        return self.session.region_name
+
+    def client(self, service_name, **kwargs):
+        """Returns a shared client for the service, creating it if necessary"""
+        with self._lock:
+            if kwargs:
+                return self.session.client(service_name, **kwargs)
+            if service_name not in self._clients:
+                config = None
+                if self.max_pool_connections:
+                    config = botocore.config.Config(
+                        max_pool_connections=self.max_pool_connections
+                    )
+                client = self.session.client(service_name, config=config)
+                for event_name, handler in self._event_handlers:
+                    client.meta.events.register(event_name, handler)
+                self._clients[service_name] = client
+            return self._clients[service_name]
+
+    def register_event_handler(self, event_name, handler):
+        """Registers a botocore event handler on every client created by the pool"""
+        with self._lock:
+            if (event_name, handler) in self._event_handlers:
+                return
+            self._event_handlers.append((event_name, handler))
+            for client in self._clients.values():
+                client.meta.events.register(event_name, handler)
+
+    def resize(self, max_pool_connections):
+        """Grows the HTTP connection pool, recreating clients on next use"""
+        with self._lock:
+            if max_pool_connections > (self.max_pool_connections or 0):
+                self.max_pool_connections = max_pool_connections
+                self._clients = {}
+
+    def __getattr__(self, name):
+        return getattr(self.session, name)
+
+
+def _get_role_credentials(profile_name, role_arn):
+    """
+    Returns refreshable credentials for an assumed role, shared by the sessions of
+    every region so that STS is called once per role until the credentials are about
+    to expire. Must be called with __cached_pools_lock held.
+    """
+    key = (profile_name, role_arn)
+    if key not in __cached_role_credentials:
+        source = boto3.Session(profile_name=profile_name)
+        fetcher = botocore.credentials.AssumeRoleCredentialFetcher(
+            client_creator=source.client,
+            source_credentials=source.get_credentials(),
+            role_arn=role_arn,
+            extra_args={"RoleSessionName": ROLE_SESSION_NAME},
+        )
+        __cached_role_credentials[key] = (
+            botocore.credentials.DeferredRefreshableCredentials(
+                method="assume-role", refresh_using=fetcher.fetch_credentials
+            )
+        )
+    return __cached_role_credentials[key]
+
+
+def _create_session(profile_name, region_name, role_arn):
+    if not role_arn:
+        return boto3.Session(profile_name=profile_name, region_name=region_name)
+    botocore_session = botocore.session.Session(profile=profile_name)
+    botocore_session._credentials = _get_role_credentials(profile_name, role_arn)
+    return boto3.Session(botocore_session=botocore_session, region_name=region_name)
+
+
+def get_client_pool(
+    profile_name=None, region_name=None, max_pool_connections=None, role_arn=None
+):
+    """
+    Returns the process wide client pool for the AWS profile and region
+
+    :param profile_name: The AWS profile name, uses the default chain if None
+    :param region_name: The AWS region name, uses the profile default if None
+    :param max_pool_connections: HTTP connections per client, usually the number of
+        worker threads sharing the pool
+    :param role_arn: An IAM role to assume with the profile's credentials, e.g. to
+        work in another AWS account
+    """
+    global __cached_pools
+    key = (profile_name, region_name, role_arn)
+    with __cached_pools_lock:
+        pool = __cached_pools.get(key)
+        if pool is None:
+            pool = ClientPool(
+                _create_session(profile_name, region_name, role_arn),
+                max_pool_connections=max_pool_connections,
+                role_arn=role_arn,
+            )
+            __cached_pools[key] = pool
+        elif max_pool_connections:
+            pool.resize(max_pool_connections)
+    return pool
+
+
+def clear_client_pools():
+    """Drops all cached client pools and assumed role credentials"""
+    global __cached_pools
+    with __cached_pools_lock:
+        __cached_pools = {}
+        __cached_role_credentials.clear()
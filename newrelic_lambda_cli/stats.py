@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+
+import contextlib
+import threading
+import time
+
+import click
+from tabulate import tabulate
+
+from newrelic_lambda_cli.concurrency import is_throttling_response, SERVICE_ID_PREFIXES
+
+PERCENTILES = (50, 90, 99)
+
+__stats = None
+
+
+class Stats(object):
+    """
+    Call count, latencies, retries, throttles and errors per operation, for AWS API
+    calls made through client pools and for the HTTP calls to New Relic
+    """
+
+    def __init__(self):
+        self._operations = {}
+        self._lock = threading.Lock()
+
+    def _operation(self, operation):
+        if operation not in self._operations:
+            self._operations[operation] = {
+                "latencies": [],
+                "retries": 0,
+                "throttles": 0,
+                "errors": 0,
+            }
+        return self._operations[operation]
+
+    def add(self, operation, latency, retries=0, error=False):
+        """Records a call and how long it took, including its retries"""
+        with self._lock:
+            stats = self._operation(operation)
+            stats["latencies"].append(latency)
+            stats["retries"] += retries
+            stats["errors"] += 1 if error else 0
+
+    def throttle(self, operation):
+        """Records a throttled request attempt"""
+        with self._lock:
+            self._operation(operation)["throttles"] += 1
+
+    def summary(self):
+        """Returns a row per operation, the operations taking the most time first"""
+        with self._lock:
+            operations = {
+                operation: dict(stats, latencies=sorted(stats["latencies"]))
+                for operation, stats in self._operations.items()
+            }
+        rows = []
+        for operation, stats in operations.items():
+            latencies = stats["latencies"]
+            row = {
+                "operation": operation,
+                "calls": len(latencies),
+                "total": sum(latencies),
+                "max": latencies[-1] if latencies else 0.0,
+                "retries": stats["retries"],
+                "throttles": stats["throttles"],
+                "errors": stats["errors"],
+            }
+            for percentile in PERCENTILES:
+                row["p%d" % percentile] = _percentile(latencies, percentile)
+            rows.append(row)
+        return sorted(rows, key=lambda row: row["total"], reverse=True)
+
+
+def _percentile(latencies, percentile):
+    """Returns the nearest rank percentile of sorted latencies"""
+    if not latencies:
+        return 0.0
+    rank = max(1, -(-len(latencies) * percentile // 100))
+    return latencies[rank - 1]
+
+
+def _operation_name(event_name):
+    _, service_id, operation_name = event_name.split(".", 2)
+    return "%s:%s" % (SERVICE_ID_PREFIXES.get(service_id, service_id), operation_name)
+
+
+def start():
+    """Starts collecting stats for the calls made from now on"""
+    global __stats
+    __stats = Stats()
+    return __stats
+
+
+def stop():
+    """Stops collecting stats, returns the stats collected so far"""
+    global __stats
+    stats, __stats = __stats, None
+    return stats
+
+
+def on_before_call(context=None, **kwargs):
+    """A botocore before-call handler, called once per API call"""
+    if __stats is not None and context is not None:
+        context["stats_start"] = time.monotonic()
+
+
+def on_after_call(event_name=None, parsed=None, context=None, **kwargs):
+    """A botocore after-call handler, called once the last attempt of a call is made"""
+    stats = __stats
+    if stats is None or not context or "stats_start" not in context:
+        return
+    parsed = parsed or {}
+    stats.add(
+        _operation_name(event_name),
+        time.monotonic() - context["stats_start"],
+        retries=parsed.get("ResponseMetadata", {}).get("RetryAttempts", 0),
+        error="Error" in parsed,
+    )
+
+
+def on_after_call_error(event_name=None, context=None, **kwargs):
+    """A botocore after-call-error handler, called when a call raises"""
+    stats = __stats
+    if stats is None or not context or "stats_start" not in context:
+        return
+    stats.add(
+        _operation_name(event_name),
+        time.monotonic() - context["stats_start"],
+        error=True,
+    )
+
+
+def on_needs_retry(event_name=None, response=None, **kwargs):
+    """A botocore needs-retry handler, called after every request attempt"""
+    stats = __stats
+    if stats is not None and is_throttling_response(response):
+        stats.throttle(_operation_name(event_name))
+
+
+def register(session):
+    """Records stats for the AWS API calls made by a client pool's clients"""
+    session.register_event_handler("before-call", on_before_call)
+    session.register_event_handler("after-call", on_after_call)
+    session.register_event_handler("after-call-error", on_after_call_error)
+    session.register_event_handler("needs-retry", on_needs_retry)
+
+
+@contextlib.contextmanager
+def timed(operation):
+    """Records stats for a call that isn't made through botocore, e.g. to New Relic"""
+    start_time = time.monotonic()
+    error = False
+    try:
+        yield
+    except Exception:
+        error = True
+        raise
+    finally:
+        stats = __stats
+        if stats is not None:
+            stats.add(operation, time.monotonic() - start_time, error=error)
+
+
+def format_stats(stats):
+    """Returns a table of the stats per operation"""
+    headers = ["Operation", "Calls", "Total"]
+    headers += ["p%d" % percentile for percentile in PERCENTILES]
+    headers += ["Max", "Retries", "Throttles", "Errors"]
+    table = []
+    for row in stats.summary():
+        table.append(
+            [row["operation"], row["calls"], "%.2fs" % row["total"]]
+            + ["%.3fs" % row["p%d" % percentile] for percentile in PERCENTILES]
+            + ["%.3fs" % row["max"], row["retries"], row["throttles"], row["errors"]]
+        )
+    return tabulate(table, headers=headers)
+
+
+def echo_stats():
+    """Stops collecting stats and prints them to stderr"""
+    stats = stop()
+    if stats is not None:
+        click.echo("\nAPI calls:\n" + format_stats(stats), err=True)
+
+
+def collect_until_exit():
+    """Collects stats until the current command exits, then prints them"""
+    start()
+    click.get_current_context().call_on_close(echo_stats)
@@ -1,20 +1,33 @@
 # -*- coding: utf-8 -*-
 
+import json
+
 import botocore
 import click
 
+from newrelic_lambda_cli import results
 from newrelic_lambda_cli.cliutils import failure, success, warning
-from newrelic_lambda_cli.functions import get_function
+from newrelic_lambda_cli.functions import get_function, get_function_configuration
 from newrelic_lambda_cli.integrations import get_unique_newrelic_log_ingestion_name
 from newrelic_lambda_cli.integrations import get_newrelic_log_ingestion_function
 from newrelic_lambda_cli.otel_ingestions import get_newrelic_otel_log_ingestion_function
 from newrelic_lambda_cli.types import (
     LayerInstall,
     SubscriptionInstall,
+    SubscriptionMigrate,
     SubscriptionUninstall,
 )
 from newrelic_lambda_cli.utils import catch_boto_errors
 
+LAMBDA_LOG_GROUP_PREFIX = "/aws/lambda/"
+# CloudWatch Logs allows two subscription filters per log group
+MAX_SUBSCRIPTION_FILTERS = 2
+
+ACCOUNT_POLICY_TYPE = "SUBSCRIPTION_FILTER_POLICY"
+ACCOUNT_POLICY_NAMES = ("NewRelicLogStreaming", "NewRelicOtelLogStreaming")
+# The most log groups the selection criteria of an account policy can exclude
+MAX_ACCOUNT_POLICY_EXCLUDES = 50
+
 
 def _get_log_group_name(function_name):
     """Builds a log group name path; handling ARNs if provided"""
@@ -25,9 +38,43 @@ def _get_log_group_name(function_name):
     return "/aws/lambda/%s" % function_name
 
 
-def _get_subscription_filters(session, function_name):
-    """Returns all the log subscription filters for the function"""
-    log_group_name = _get_log_group_name(function_name)
+def get_log_group_name(session, function_name, config=None):
+    """
+    Returns the log group a function writes to: the log group of its logging
+    configuration, which may be a custom one shared with other functions, or
+    /aws/lambda/<name> if the function can't be found
+
+    :param config: The function configuration if it is already known (e.g. from
+        listing functions). It is fetched if not provided.
+    """
+    if config is None:
+        config = get_function_configuration(session, function_name)
+    if config:
+        log_group_name = (
+            config["Configuration"].get("LoggingConfig", {}).get("LogGroup")
+        )
+        if log_group_name:
+            return log_group_name
+    return _get_log_group_name(function_name)
+
+
+@catch_boto_errors
+def list_log_groups(session, prefix=LAMBDA_LOG_GROUP_PREFIX):
+    """
+    Returns the names of the existing log groups starting with prefix. Lambda only
+    creates a function's log group when it is first invoked, so bulk commands list
+    them once up front rather than looking up each function's log group.
+    """
+    pager = session.client("logs").get_paginator("describe_log_groups")
+    return set(
+        log_group["logGroupName"]
+        for res in pager.paginate(logGroupNamePrefix=prefix)
+        for log_group in res.get("logGroups", [])
+    )
+
+
+def _get_subscription_filters(session, log_group_name):
+    """Returns all the log subscription filters for the log group"""
     try:
         res = session.client("logs").describe_subscription_filters(
             logGroupName=log_group_name
@@ -42,53 +89,61 @@ def _get_subscription_filters(session, function_name):
             return []
         failure(
             "Error retrieving log subscription filters for '%s': %s"
-            % (function_name, e)
+            % (log_group_name, e)
         )
+        results.record_error(e)
     else:
         return res.get("subscriptionFilters", [])
 
 
 def _create_subscription_filter(
     session,
-    function_name,
+    log_group_name,
     destination_arn,
     filter_pattern,
     filter_name="NewRelicLogStreaming",
 ):
     try:
         session.client("logs").put_subscription_filter(
-            logGroupName=_get_log_group_name(function_name),
+            logGroupName=log_group_name,
             filterName=filter_name,
             filterPattern=filter_pattern,
             destinationArn=destination_arn,
         )
     except botocore.exceptions.ClientError as e:
         failure(
-            "Error creating log subscription filter for '%s': %s" % (function_name, e)
+            "Error creating log subscription filter for '%s': %s" % (log_group_name, e)
         )
+        results.record_error(e)
         return False
     else:
-        success("Successfully installed log subscription on %s" % function_name)
+        success("Successfully installed log subscription on %s" % log_group_name)
         return True
 
 
-def _remove_subscription_filter(session, function_name, filter_name):
+def _remove_subscription_filter(session, log_group_name, filter_name):
     try:
         session.client("logs").delete_subscription_filter(
-            logGroupName=_get_log_group_name(function_name), filterName=filter_name
+            logGroupName=log_group_name, filterName=filter_name
         )
     except botocore.exceptions.ClientError as e:
         failure(
-            "Error removing log subscription filter for '%s': %s" % (function_name, e)
+            "Error removing log subscription filter for '%s': %s" % (log_group_name, e)
         )
+        results.record_error(e)
         return False
     else:
-        success("Successfully uninstalled log subscription on %s" % function_name)
+        success("Successfully uninstalled log subscription on %s" % log_group_name)
         return True
 
 
 @catch_boto_errors
-def create_log_subscription(input, function_name):
+def get_log_ingestion_arn(input):
+    """
+    Returns the ARN of the newrelic-log-ingestion function of input.stackname that log
+    groups are subscribed to, or None if it can't be found. It doesn't change during
+    a run, so bulk commands look it up once and pass it as input.destination_arn.
+    """
     assert isinstance(input, SubscriptionInstall)
     function = get_function(input.session, "newrelic-log-ingestion")
     if function:
@@ -103,9 +158,44 @@ def create_log_subscription(input, function_name):
             "Could not find newrelic-log-ingestion function in stack: %s. Is the New Relic AWS "
             "integration installed?" % input.stackname
         )
+        return None
+    return destination["Configuration"]["FunctionArn"]
+
+
+@catch_boto_errors
+def get_otel_log_ingestion_arn(input):
+    """
+    Returns the ARN of the newrelic-otel-log-ingestion function of input.stackname
+    that log groups are subscribed to, or None if it can't be found
+    """
+    assert isinstance(input, (SubscriptionInstall, SubscriptionMigrate))
+    destination = get_newrelic_otel_log_ingestion_function(
+        input.session, input.stackname
+    )
+    if destination is None:
+        failure(
+            "Could not find newrelic-otel-log-ingestion function. Is the New Relic AWS "
+            "integration installed?"
+        )
+        return None
+    return destination["Configuration"]["FunctionArn"]
+
+
+@catch_boto_errors
+def create_log_subscription(input, function_name, log_group_name=None):
+    """
+    Subscribes the log group of a function to the log ingestion function
+
+    :param log_group_name: The function's log group if it is already known (see
+        get_log_group_name), otherwise /aws/lambda/<name>
+    """
+    assert isinstance(input, SubscriptionInstall)
+    log_group_name = log_group_name or _get_log_group_name(function_name)
+    destination_arn = input.destination_arn or get_log_ingestion_arn(input)
+    if destination_arn is None:
+        results.record_error("LogIngestionFunctionNotFound")
         return False
-    destination_arn = destination["Configuration"]["FunctionArn"]
-    subscription_filters = _get_subscription_filters(input.session, function_name)
+    subscription_filters = _get_subscription_filters(input.session, log_group_name)
     if subscription_filters is None:
         return False
     newrelic_filters = [
@@ -126,7 +216,7 @@ def create_log_subscription(input, function_name):
     if not newrelic_filters:
         click.echo("Adding New Relic log subscription to '%s'" % function_name)
         return _create_subscription_filter(
-            input.session, function_name, destination_arn, input.filter_pattern
+            input.session, log_group_name, destination_arn, input.filter_pattern
         )
     else:
         click.echo(
@@ -138,29 +228,29 @@ def create_log_subscription(input, function_name):
             or newrelic_filter["destinationArn"] != destination_arn
         ):
             return _remove_subscription_filter(
-                input.session, function_name, newrelic_filter["filterName"]
+                input.session, log_group_name, newrelic_filter["filterName"]
             ) and _create_subscription_filter(
-                input.session, function_name, destination_arn, input.filter_pattern
+                input.session, log_group_name, destination_arn, input.filter_pattern
             )
         return True
 
 
 @catch_boto_errors
-def create_otel_log_subscription(input, function_name):
-    assert isinstance(input, SubscriptionInstall)
+def create_otel_log_subscription(input, function_name, log_group_name=None):
+    """
+    Subscribes the log group of a function to the log ingestion function
 
-    destination = get_newrelic_otel_log_ingestion_function(
-        input.session, input.stackname
-    )
-    if destination is None:
-        failure(
-            "Could not find newrelic-otel-log-ingestion function. Is the New Relic AWS "
-            "integration installed?"
-        )
+    :param log_group_name: The function's log group if it is already known (see
+        get_log_group_name), otherwise /aws/lambda/<name>
+    """
+    assert isinstance(input, SubscriptionInstall)
+    log_group_name = log_group_name or _get_log_group_name(function_name)
+    destination_arn = input.destination_arn or get_otel_log_ingestion_arn(input)
+    if destination_arn is None:
+        results.record_error("LogIngestionFunctionNotFound")
         return False
-    destination_arn = destination["Configuration"]["FunctionArn"]
 
-    subscription_filters = _get_subscription_filters(input.session, function_name)
+    subscription_filters = _get_subscription_filters(input.session, log_group_name)
     if subscription_filters is None:
         return False
     newrelic_filters = [
@@ -182,7 +272,7 @@ def create_otel_log_subscription(input, function_name):
         click.echo("Adding New Relic otel log subscription to '%s'" % function_name)
         return _create_subscription_filter(
             input.session,
-            function_name,
+            log_group_name,
             destination_arn,
             input.filter_pattern,
             "NewRelicOtelLogStreaming",
@@ -197,10 +287,10 @@ def create_otel_log_subscription(input, function_name):
             or newrelic_filter["destinationArn"] != destination_arn
         ):
             return _remove_subscription_filter(
-                input.session, function_name, newrelic_filter["filterName"]
+                input.session, log_group_name, newrelic_filter["filterName"]
             ) and _create_subscription_filter(
                 input.session,
-                function_name,
+                log_group_name,
                 destination_arn,
                 input.filter_pattern,
                 "NewRelicOtelLogStreaming",
@@ -209,9 +299,16 @@ def create_otel_log_subscription(input, function_name):
 
 
 @catch_boto_errors
-def remove_log_subscription(input, function_name):
+def remove_log_subscription(input, function_name, log_group_name=None):
+    """
+    Removes the New Relic subscription filter from the log group of a function
+
+    :param log_group_name: The function's log group if it is already known (see
+        get_log_group_name), otherwise /aws/lambda/<name>
+    """
     assert isinstance(input, (LayerInstall, SubscriptionUninstall))
-    subscription_filters = _get_subscription_filters(input.session, function_name)
+    log_group_name = log_group_name or _get_log_group_name(function_name)
+    subscription_filters = _get_subscription_filters(input.session, log_group_name)
     if subscription_filters is None:
         return False
     newrelic_filters = [
@@ -227,14 +324,21 @@ def remove_log_subscription(input, function_name):
     newrelic_filter = newrelic_filters[0]
     click.echo("Removing New Relic log subscription from '%s'" % function_name)
     return _remove_subscription_filter(
-        input.session, function_name, newrelic_filter["filterName"]
+        input.session, log_group_name, newrelic_filter["filterName"]
     )
 
 
 @catch_boto_errors
-def remove_otel_log_subscription(input, function_name):
+def remove_otel_log_subscription(input, function_name, log_group_name=None):
+    """
+    Removes the New Relic otel subscription filter from the log group of a function
+
+    :param log_group_name: The function's log group if it is already known (see
+        get_log_group_name), otherwise /aws/lambda/<name>
+    """
     assert isinstance(input, (SubscriptionUninstall))
-    subscription_filters = _get_subscription_filters(input.session, function_name)
+    log_group_name = log_group_name or _get_log_group_name(function_name)
+    subscription_filters = _get_subscription_filters(input.session, log_group_name)
     if subscription_filters is None:
         return False
     newrelic_filters = [
@@ -251,5 +355,319 @@ def remove_otel_log_subscription(input, function_name):
     newrelic_filter = newrelic_filters[0]
     click.echo("Removing New Relic otel log subscription from '%s'" % function_name)
     return _remove_subscription_filter(
-        input.session, function_name, newrelic_filter["filterName"]
+        input.session, log_group_name, newrelic_filter["filterName"]
     )
+
+
+def _find_filter(subscription_filters, filter_name):
+    for subscription_filter in subscription_filters:
+        if filter_name in subscription_filter["filterName"]:
+            return subscription_filter
+    return None
+
+
+def _swap_subscription_filter(session, log_group_name, subscription_filters, old, new):
+    """
+    Replaces the old subscription filter of a log group with new, a dict with the
+    filterName, filterPattern and destinationArn to create. If the log group has room
+    for both, new is created before old is removed so that no logs are missed while
+    swapping. Otherwise old is removed first, and restored if new can't be created.
+    """
+    if len(subscription_filters) < MAX_SUBSCRIPTION_FILTERS:
+        return _create_subscription_filter(
+            session,
+            log_group_name,
+            new["destinationArn"],
+            new["filterPattern"],
+            new["filterName"],
+        ) and _remove_subscription_filter(session, log_group_name, old["filterName"])
+
+    if not _remove_subscription_filter(session, log_group_name, old["filterName"]):
+        return False
+    if _create_subscription_filter(
+        session,
+        log_group_name,
+        new["destinationArn"],
+        new["filterPattern"],
+        new["filterName"],
+    ):
+        return True
+    warning("Restoring log subscription filter %s" % old["filterName"])
+    _create_subscription_filter(
+        session,
+        log_group_name,
+        old["destinationArn"],
+        old["filterPattern"],
+        old["filterName"],
+    )
+    return False
+
+
+def _replace_subscription_filter(
+    session, log_group_name, old_name, new, before_change=None, create_missing=False
+):
+    """
+    Replaces the subscription filter named old_name of a log group with new, after
+    removing any outdated filter with the name of new
+
+    :param before_change: Called with the old filter before the log group is changed
+    :param create_missing: Whether to create new if the log group has neither filter,
+        e.g. when restoring a filter removed by a swap that did not finish
+    :returns: Whether it succeeded and the old filter replaced, if any
+    """
+    subscription_filters = _get_subscription_filters(session, log_group_name)
+    if subscription_filters is None:
+        return False, None
+    old = _find_filter(subscription_filters, old_name)
+    current = _find_filter(subscription_filters, new["filterName"])
+    if old is None:
+        if current is None and create_missing:
+            return (
+                _create_subscription_filter(
+                    session,
+                    log_group_name,
+                    new["destinationArn"],
+                    new["filterPattern"],
+                    new["filterName"],
+                ),
+                None,
+            )
+        return True, None
+    if before_change is not None:
+        before_change(old)
+
+    if current is not None:
+        if (
+            current["filterPattern"] == new["filterPattern"]
+            and current["destinationArn"] == new["destinationArn"]
+        ):
+            return (
+                _remove_subscription_filter(session, log_group_name, old["filterName"]),
+                old,
+            )
+        if not _remove_subscription_filter(
+            session, log_group_name, current["filterName"]
+        ):
+            return False, old
+        subscription_filters.remove(current)
+
+    return (
+        _swap_subscription_filter(
+            session, log_group_name, subscription_filters, old, new
+        ),
+        old,
+    )
+
+
+@catch_boto_errors
+def migrate_log_subscription(input, function_name, log_group_name=None, save=None):
+    """
+    Replaces the New Relic log subscription filter of a function's log group with the
+    otel one, reading the log group's filters once
+
+    :param log_group_name: The function's log group if it is already known (see
+        get_log_group_name), otherwise /aws/lambda/<name>
+    :param save: Called with the function name, the log group name and the replaced
+        subscription filter before it is changed, to be able to restore it with
+        restore_log_subscription
+    """
+    assert isinstance(input, SubscriptionMigrate)
+    destination_arn = input.destination_arn or get_otel_log_ingestion_arn(input)
+    if destination_arn is None:
+        results.record_error("LogIngestionFunctionNotFound")
+        return False
+    log_group_name = log_group_name or _get_log_group_name(function_name)
+
+    def _save(old):
+        if save is not None:
+            save(function_name, log_group_name=log_group_name, subscription_filter=old)
+
+    click.echo("Migrating New Relic log subscription of '%s' to otel" % function_name)
+    succeeded, old = _replace_subscription_filter(
+        input.session,
+        log_group_name,
+        "NewRelicLogStreaming",
+        {
+            "filterName": "NewRelicOtelLogStreaming",
+            "filterPattern": input.filter_pattern,
+            "destinationArn": destination_arn,
+        },
+        _save,
+    )
+    if succeeded and old is None:
+        click.echo(
+            "No New Relic log subscription found for '%s', skipping" % function_name
+        )
+    return succeeded
+
+
+@catch_boto_errors
+def restore_log_subscription(input, function_name, saved):
+    """
+    Restores the New Relic log subscription filter replaced by
+    migrate_log_subscription in place of the otel one
+
+    :param saved: The fields saved by migrate_log_subscription for the function
+    """
+    assert isinstance(input, SubscriptionMigrate)
+    old = saved["subscription_filter"]
+    click.echo("Restoring New Relic log subscription of '%s'" % function_name)
+    succeeded, _ = _replace_subscription_filter(
+        input.session,
+        saved["log_group_name"],
+        "NewRelicOtelLogStreaming",
+        {
+            "filterName": old["filterName"],
+            "filterPattern": old["filterPattern"],
+            "destinationArn": old["destinationArn"],
+        },
+        # The migration may have removed the filter without adding the otel one
+        create_missing=True,
+    )
+    return succeeded
+
+
+def account_policy_name(otel):
+    """Returns the name of the account subscription filter policy"""
+    return ACCOUNT_POLICY_NAMES[1] if otel else ACCOUNT_POLICY_NAMES[0]
+
+
+@catch_boto_errors
+def install_account_policy(input):
+    """
+    Installs an account level subscription filter policy that subscribes every log
+    group in the account and region to the log ingestion function, except the log
+    groups of excluded functions and of the log ingestion function itself. Functions
+    created later are covered too.
+
+    Account policies can only select log groups by excluding them, so the policy
+    applies to all log groups, not only those of Lambda functions.
+    """
+    assert isinstance(input, SubscriptionInstall)
+    destination_arn = input.destination_arn
+    if destination_arn is None:
+        if input.otel:
+            destination_arn = get_otel_log_ingestion_arn(input)
+        else:
+            destination_arn = get_log_ingestion_arn(input)
+        if destination_arn is None:
+            return False
+
+    # Subscribing the log ingestion function to its own logs would loop
+    functions = set([destination_arn] + list(input.excludes))
+    if len(functions) > MAX_ACCOUNT_POLICY_EXCLUDES:
+        raise click.UsageError(
+            "An account policy can exclude at most %d log groups, including the log "
+            "ingestion function's" % MAX_ACCOUNT_POLICY_EXCLUDES
+        )
+    excluded = sorted(
+        set(get_log_group_name(input.session, function) for function in functions)
+    )
+
+    policy_name = account_policy_name(input.otel)
+    try:
+        input.session.client("logs").put_account_policy(
+            policyName=policy_name,
+            policyDocument=json.dumps(
+                {
+                    "DestinationArn": destination_arn,
+                    "FilterPattern": input.filter_pattern,
+                }
+            ),
+            policyType=ACCOUNT_POLICY_TYPE,
+            scope="ALL",
+            selectionCriteria="LogGroupName NOT IN %s" % json.dumps(excluded),
+        )
+    except botocore.exceptions.ClientError as e:
+        failure("Error installing account subscription filter policy: %s" % e)
+        return False
+    success(
+        "Successfully installed account subscription filter policy %s, excluding %s"
+        % (policy_name, ", ".join(excluded))
+    )
+
+    try:
+        subscribed = _count_function_subscriptions(input.session, excluded)
+    except botocore.exceptions.ClientError as e:
+        warning("Could not check for per function log subscription filters: %s" % e)
+        return True
+    if subscribed:
+        warning(
+            "WARNING: %d Lambda log groups covered by the account policy still have a "
+            "per function New Relic log subscription filter, so their log events are "
+            "sent to New Relic twice. Remove the filters with 'newrelic-lambda "
+            "subscriptions uninstall --function all' (and '--otel' for otel ones), "
+            "excluding the same functions." % subscribed
+        )
+    return True
+
+
+def _count_function_subscriptions(session, excluded):
+    """
+    Returns the number of Lambda log groups, other than the excluded ones, that have a
+    per function New Relic subscription filter
+    """
+    count = 0
+    for log_group_name in list_log_groups(session) or ():
+        if log_group_name in excluded:
+            continue
+        filters = _get_subscription_filters(session, log_group_name) or []
+        if any(
+            name in filter["filterName"]
+            for filter in filters
+            for name in ACCOUNT_POLICY_NAMES
+        ):
+            count += 1
+    return count
+
+
+@catch_boto_errors
+def remove_account_policy(input):
+    """Removes the account level subscription filter policy, if any"""
+    assert isinstance(input, SubscriptionUninstall)
+    policy_name = account_policy_name(input.otel)
+    try:
+        input.session.client("logs").delete_account_policy(
+            policyName=policy_name, policyType=ACCOUNT_POLICY_TYPE
+        )
+    except botocore.exceptions.ClientError as e:
+        if e.response.get("Error", {}).get("Code") == "ResourceNotFoundException":
+            click.echo(
+                "No account subscription filter policy %s found, skipping" % policy_name
+            )
+            return True
+        failure("Error removing account subscription filter policy: %s" % e)
+        return False
+    success(
+        "Successfully uninstalled account subscription filter policy %s" % policy_name
+    )
+    return True
+
+
+@catch_boto_errors
+def get_account_policies(session):
+    """
+    Returns the New Relic account level subscription filter policies, each with its
+    destination, filter pattern and selection criteria
+    """
+    res = session.client("logs").describe_account_policies(
+        policyType=ACCOUNT_POLICY_TYPE
+    )
+    policies = []
+    for policy in res.get("accountPolicies", []):
+        if policy.get("policyName") not in ACCOUNT_POLICY_NAMES:
+            continue
+        try:
+            document = json.loads(policy.get("policyDocument") or "{}")
+        except ValueError:
+            document = {}
+        policies.append(
+            {
+                "name": policy["policyName"],
+                "destination_arn": document.get("DestinationArn"),
+                "filter_pattern": document.get("FilterPattern"),
+                "selection_criteria": policy.get("selectionCriteria"),
+                "last_updated": policy.get("lastUpdatedTime"),
+            }
+        )
+    return policies
@@ -14,6 +14,7 @@ INTEGRATION_INSTALL_KEYS = [
     "nr_account_id",
     "nr_api_key",
     "nr_region",
+    "skip_nr_schema_validation",
     "timeout",
     "role_name",
     "enable_license_key_secret",
@@ -43,6 +44,7 @@ INTEGRATION_UPDATE_KEYS = [
     "nr_account_id",
     "nr_api_key",
     "nr_region",
+    "skip_nr_schema_validation",
     "timeout",
     "role_name",
     "enable_license_key_secret",
@@ -61,6 +63,7 @@ OTEL_INGESTION_INSTALL_KEYS = [
     "nr_account_id",
     "nr_api_key",
     "nr_region",
+    "skip_nr_schema_validation",
     "timeout",
     "role_name",
     "tags",
@@ -86,6 +89,7 @@ OTEL_INGESTION_UPDATE_KEYS = [
     "nr_account_id",
     "nr_api_key",
     "nr_region",
+    "skip_nr_schema_validation",
     "timeout",
     "role_name",
     "tags",
@@ -98,8 +102,10 @@ LAYER_INSTALL_KEYS = [
     "nr_api_key",
     "nr_ingest_key",
     "nr_region",
+    "skip_nr_schema_validation",
     "aws_profile",
     "aws_region",
+    "aws_role_arn",
     "aws_permissions_check",
     "functions",
     "excludes",
@@ -123,6 +129,20 @@ LAYER_INSTALL_KEYS = [
     "slim",
     "extension_logs_enabled",
     "app_name",
+    "max_workers",
+    "adaptive_concurrency",
+    "rate_limits",
+    "plan",
+    "plan_file",
+    "apply_plan",
+    "resume",
+    "role_arn_template",
+    "accounts",
+    "accounts_file",
+    "max_accounts",
+    "max_regions",
+    "output",
+    "stats",
 ]
 
 LAYER_UNINSTALL_KEYS = [
@@ -130,21 +150,51 @@ LAYER_UNINSTALL_KEYS = [
     "verbose",
     "aws_profile",
     "aws_region",
+    "aws_role_arn",
     "aws_permissions_check",
     "functions",
     "excludes",
+    "max_workers",
+    "adaptive_concurrency",
+    "rate_limits",
+    "plan",
+    "plan_file",
+    "apply_plan",
+    "resume",
+    "role_arn_template",
+    "accounts",
+    "accounts_file",
+    "max_accounts",
+    "max_regions",
+    "output",
+    "stats",
 ]
 
 SUBSCRIPTION_INSTALL_KEYS = [
     "session",
     "aws_profile",
     "aws_region",
+    "aws_role_arn",
     "aws_permissions_check",
     "functions",
     "stackname",
+    "destination_arn",
     "excludes",
     "filter_pattern",
     "otel",
+    "account_policy",
+    "force",
+    "max_workers",
+    "adaptive_concurrency",
+    "rate_limits",
+    "resume",
+    "role_arn_template",
+    "accounts",
+    "accounts_file",
+    "max_accounts",
+    "max_regions",
+    "output",
+    "stats",
 ]
 
 ALERTS_MIGRATE_KEYS = [
@@ -155,6 +205,7 @@ ALERTS_MIGRATE_KEYS = [
     "nr_account_id",
     "nr_api_key",
     "nr_region",
+    "skip_nr_schema_validation",
     "function",
     "excludes",
     "verbose",
@@ -164,10 +215,61 @@ SUBSCRIPTION_UNINSTALL_KEYS = [
     "session",
     "aws_profile",
     "aws_region",
+    "aws_role_arn",
     "aws_permissions_check",
     "functions",
     "excludes",
     "otel",
+    "account_policy",
+    "max_workers",
+    "adaptive_concurrency",
+    "rate_limits",
+    "resume",
+    "role_arn_template",
+    "accounts",
+    "accounts_file",
+    "max_accounts",
+    "max_regions",
+    "output",
+    "stats",
+]
+
+SUBSCRIPTION_MIGRATE_KEYS = [
+    "session",
+    "aws_profile",
+    "aws_region",
+    "aws_role_arn",
+    "aws_permissions_check",
+    "functions",
+    "stackname",
+    "destination_arn",
+    "excludes",
+    "filter_pattern",
+    "rollback",
+    "max_workers",
+    "adaptive_concurrency",
+    "rate_limits",
+    "resume",
+    "role_arn_template",
+    "accounts",
+    "accounts_file",
+    "max_accounts",
+    "max_regions",
+    "output",
+    "stats",
+]
+
+SUBSCRIPTION_STATUS_KEYS = [
+    "session",
+    "aws_profile",
+    "aws_region",
+    "aws_role_arn",
+    "aws_permissions_check",
+    "role_arn_template",
+    "accounts",
+    "accounts_file",
+    "max_accounts",
+    "max_regions",
 ]
 
 
@@ -189,3 +291,5 @@ AlertsMigrate = namedtuple("AlertsMigrate", ALERTS_MIGRATE_KEYS)
 
 SubscriptionInstall = namedtuple("SubscriptionInstall", SUBSCRIPTION_INSTALL_KEYS)
 SubscriptionUninstall = namedtuple("SubscriptionUninstall", SUBSCRIPTION_UNINSTALL_KEYS)
+SubscriptionMigrate = namedtuple("SubscriptionMigrate", SUBSCRIPTION_MIGRATE_KEYS)
+SubscriptionStatus = namedtuple("SubscriptionStatus", SUBSCRIPTION_STATUS_KEYS)
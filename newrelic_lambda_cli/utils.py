@@ -1,6 +1,10 @@
 # -*- coding: utf-8 -*-
 
+import functools
+import json
+import os
 import sys
+import threading
 
 import boto3
 import botocore
@@ -8,6 +12,11 @@ import click
 
 NR_DOCS_ACT_LINKING_URL = "https://docs.newrelic.com/docs/serverless-function-monitoring/aws-lambda-monitoring/enable-lambda-monitoring/account-linking/#manually-configuring-the-license-key-secret"
 NEW_RELIC_ARN_PREFIX_TEMPLATE = "arn:aws:lambda:%s:451483290750"
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".newrelic-lambda-cli", "cache")
+JOURNAL_DIR = os.path.join(os.path.expanduser("~"), ".newrelic-lambda-cli", "journals")
+
+__cached_default_region = None
+__cached_lambda_regions = None
 RUNTIME_CONFIG = {
     "dotnetcore3.1": {"LambdaExtension": True},
     "dotnet6": {"LambdaExtension": True},
@@ -114,17 +123,20 @@ def catch_boto_errors(func):
     return _boto_error_wrapper
 
 
+@functools.lru_cache(maxsize=None)
 def get_arn_prefix(region):
     return NEW_RELIC_ARN_PREFIX_TEMPLATE % (get_region(region),)
 
 
 @catch_boto_errors
 def get_region(region):
-    boto_kwargs = {}
     if region:
-        boto_kwargs["region_name"] = region
-    session = boto3.session.Session(**boto_kwargs)
-    return session.region_name
+        return region
+    # Only resolve the default region from the environment and AWS config once
+    global __cached_default_region
+    if __cached_default_region is None:
+        __cached_default_region = boto3.session.Session().region_name
+    return __cached_default_region
 
 
 @catch_boto_errors
@@ -134,7 +146,19 @@ def get_lambda_client(session):
 
 @catch_boto_errors
 def all_lambda_regions():
-    return boto3.Session().get_available_regions("lambda")
+    """
+    Returns the regions AWS Lambda is available in. Loading botocore's endpoint data
+    is slow, so the list is cached on disk for each botocore version.
+    """
+    global __cached_lambda_regions
+    if __cached_lambda_regions is None:
+        cache_path = "lambda-regions-%s.json" % botocore.__version__
+        regions = read_cache(cache_path)
+        if not regions:
+            regions = boto3.Session().get_available_regions("lambda")
+            write_cache(cache_path, regions)
+        __cached_lambda_regions = regions
+    return __cached_lambda_regions
 
 
 def is_valid_handler(runtime, handler):
@@ -201,5 +225,29 @@ def parse_arn(arn):
     return result
 
 
+def read_cache(path):
+    """Returns the JSON document cached at the path, or None if it is unreadable"""
+    try:
+        with open(os.path.join(CACHE_DIR, path)) as cache_file:
+            return json.load(cache_file)
+    except (OSError, ValueError):
+        return None
+
+
+def write_cache(path, data):
+    """Atomically writes a JSON document to the cache, ignoring filesystem errors"""
+    cache_path = os.path.join(CACHE_DIR, path)
+    tmp_path = "%s.%d.%d.tmp" % (cache_path, os.getpid(), threading.get_ident())
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        with open(tmp_path, "w") as cache_file:
+            json.dump(data, cache_file)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        return False
+    else:
+        return True
+
+
 def supports_lambda_extension(runtime):
     return RUNTIME_CONFIG.get(runtime, {}).get("LambdaExtension", False)
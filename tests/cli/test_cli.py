@@ -0,0 +1,51 @@
+import importlib
+import subprocess
+import sys
+
+import click
+
+from newrelic_lambda_cli.cli import cli, COMMAND_GROUPS, register_groups
+
+
+def test_help_does_not_import_commands():
+    """
+    Assert that 'newrelic-lambda --help' lists the command groups without importing
+    them or boto3
+    """
+    code = (
+        "import sys\n"
+        "from newrelic_lambda_cli.cli import main\n"
+        "sys.argv = ['newrelic-lambda', '--help']\n"
+        "try:\n"
+        "    main()\n"
+        "except SystemExit:\n"
+        "    pass\n"
+        "print(sorted(m for m in ('boto3', 'gql', 'newrelic_lambda_cli.cli.layers') "
+        "if m in sys.modules))\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    assert "Manage New Relic AWS Lambda Layers" in result.stdout
+    assert result.stdout.strip().splitlines()[-1] == "[]"
+
+
+def test_command_groups_short_help():
+    """Assert that the short help listed for each group is the group's own"""
+    for name, (module_name, short_help) in COMMAND_GROUPS.items():
+        group = click.Group()
+        importlib.import_module(module_name).register(group)
+        assert group.commands[name].get_short_help_str(100) == short_help
+
+
+def test_lazy_command(cli_runner):
+    """Assert that a command group is loaded the first time it is used"""
+    register_groups(cli)
+
+    result = cli_runner.invoke(cli, ["layers", "--help"])
+    assert result.exit_code == 0, result.output
+    assert "install" in result.stdout
+
+    result = cli_runner.invoke(cli, ["functions", "list", "--aws-region", "nowhere-1"])
+    assert result.exit_code == 2
+    assert "nowhere-1 is not a region AWS Lambda is available in" in result.stderr
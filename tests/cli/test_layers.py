@@ -167,3 +167,124 @@ def test_layers_uninstall(aws_credentials, cli_runner):
     assert result2.exit_code == 1
     assert result2.stdout == ""
     assert "Could not find function: foobar" in result2.stderr
+
+
+def test_layers_install_invalid_rate_limit(aws_credentials, cli_runner):
+    """
+    Assert that 'newrelic-lambda layers install' rejects malformed --rate-limit values
+    """
+    register_groups(cli)
+
+    result = cli_runner.invoke(
+        cli,
+        [
+            "layers",
+            "install",
+            "--function",
+            "foobar",
+            "--nr-account-id",
+            "12345678",
+            "--aws-region",
+            "us-east-1",
+            "--rate-limit",
+            "UpdateFunctionConfiguration",
+        ],
+    )
+
+    assert result.exit_code == 2
+    assert "Invalid value for '--rate-limit'" in result.stderr
+
+
+@mock_aws
+def test_layers_uninstall_plan(aws_credentials, cli_runner, tmp_path):
+    """
+    Assert that 'newrelic-lambda layers uninstall --plan' reports without updating
+    and saves a plan that --apply-plan accepts
+    """
+    register_groups(cli)
+    plan_file = str(tmp_path / "plan.json")
+
+    result = cli_runner.invoke(
+        cli,
+        [
+            "layers",
+            "uninstall",
+            "--no-aws-permissions-check",
+            "--function",
+            "foobar",
+            "--aws-region",
+            "us-east-1",
+            "--plan-file",
+            plan_file,
+        ],
+    )
+
+    assert result.exit_code == 1
+    assert "foobar (failed)" in result.stdout
+    assert "Plan: 0 to update, 0 unchanged, 1 failed" in result.stdout
+    assert "Could not find function: foobar" in result.stderr
+
+    result = cli_runner.invoke(
+        cli,
+        [
+            "layers",
+            "uninstall",
+            "--no-aws-permissions-check",
+            "--aws-region",
+            "us-east-1",
+            "--apply-plan",
+            plan_file,
+        ],
+    )
+
+    assert result.exit_code == 1
+    assert "Uninstall Incomplete" in result.stderr
+
+    result = cli_runner.invoke(
+        cli,
+        [
+            "layers",
+            "install",
+            "--no-aws-permissions-check",
+            "--nr-account-id",
+            "12345678",
+            "--aws-region",
+            "us-east-1",
+            "--apply-plan",
+            plan_file,
+        ],
+    )
+
+    assert result.exit_code == 2
+    assert "was made for layers uninstall" in result.stderr
+
+
+def test_layers_plan_options(aws_credentials, cli_runner, tmp_path):
+    """
+    Assert that 'newrelic-lambda layers uninstall' requires functions unless applying
+    a plan, and does not plan and apply at once
+    """
+    register_groups(cli)
+    plan_file = tmp_path / "plan.json"
+    plan_file.write_text("{}")
+
+    result = cli_runner.invoke(
+        cli, ["layers", "uninstall", "--aws-region", "us-east-1"]
+    )
+    assert result.exit_code == 2
+    assert "Missing option '--function'" in result.stderr
+
+    result = cli_runner.invoke(
+        cli,
+        [
+            "layers",
+            "uninstall",
+            "--aws-region",
+            "us-east-1",
+            "--plan",
+            "--apply-plan",
+            str(plan_file),
+        ],
+    )
+    assert result.exit_code == 2
+    assert "--apply-plan cannot be combined" in result.stderr
@@ -1,5 +1,10 @@
+import json
+import re
+from unittest.mock import ANY, patch
+
 from moto import mock_aws
 
+from newrelic_lambda_cli import stats
 from newrelic_lambda_cli.cli import cli, register_groups
 
 
@@ -148,3 +153,626 @@ def test_subscriptions_uninstall(aws_credentials, cli_runner):
 
     assert result2.exit_code == 1
     assert result2.stdout == ""
+
+
+@mock_aws
+def test_subscriptions_uninstall_resume(aws_credentials, cli_runner):
+    """
+    Assert that 'newrelic-lambda subscriptions uninstall --resume' only retries the
+    functions that failed in the journal of an earlier run
+    """
+    register_groups(cli)
+
+    with patch(
+        "newrelic_lambda_cli.subscriptions.remove_log_subscription"
+    ) as mock_remove_log_subscription:
+        mock_remove_log_subscription.side_effect = (
+            lambda input, function, log_group_name: function == "foobar"
+        )
+        result = cli_runner.invoke(
+            cli,
+            [
+                "subscriptions",
+                "uninstall",
+                "--function",
+                "foobar",
+                "--function",
+                "barbaz",
+                "--aws-region",
+                "us-east-1",
+            ],
+        )
+        assert result.exit_code == 1
+        journal = re.search(r"--resume (\S+)", result.stderr).group(1)
+
+        mock_remove_log_subscription.reset_mock()
+        mock_remove_log_subscription.side_effect = None
+        mock_remove_log_subscription.return_value = True
+        result = cli_runner.invoke(
+            cli,
+            [
+                "subscriptions",
+                "uninstall",
+                "--aws-region",
+                "us-east-1",
+                "--resume",
+                journal,
+            ],
+        )
+        assert result.exit_code == 0, result.stderr
+        assert "Uninstall Complete" in result.stdout
+        mock_remove_log_subscription.assert_called_once_with(
+            ANY, "barbaz", "/aws/lambda/barbaz"
+        )
+
+
+def test_subscriptions_install_requires_function(aws_credentials, cli_runner):
+    """
+    Assert that 'newrelic-lambda subscriptions install' needs --function unless
+    resuming
+    """
+    register_groups(cli)
+
+    result = cli_runner.invoke(
+        cli, ["subscriptions", "install", "--aws-region", "us-east-1"]
+    )
+    assert result.exit_code == 2
+    assert "Missing option '--function'" in result.stderr
+
+
+@mock_aws
+def test_subscriptions_uninstall_multiple_regions(aws_credentials, cli_runner):
+    """
+    Assert that 'newrelic-lambda subscriptions uninstall' processes every region
+    passed to --aws-region, each with its own session, and summarizes them in a table
+    """
+    register_groups(cli)
+
+    with patch(
+        "newrelic_lambda_cli.subscriptions.remove_log_subscription"
+    ) as mock_remove_log_subscription:
+        mock_remove_log_subscription.side_effect = (
+            lambda input, function, log_group_name: input.session.region_name
+            != "eu-west-1"
+        )
+        result = cli_runner.invoke(
+            cli,
+            [
+                "subscriptions",
+                "uninstall",
+                "--function",
+                "foobar",
+                "--aws-region",
+                "us-east-1,us-west-2",
+                "--aws-region",
+                "eu-west-1",
+            ],
+        )
+        assert result.exit_code == 1
+        assert sorted(
+            call.args[0].session.region_name
+            for call in mock_remove_log_subscription.call_args_list
+        ) == ["eu-west-1", "us-east-1", "us-west-2"]
+        lines = result.stdout.splitlines()
+        assert lines[0].split() == ["Region", "Functions", "Result", "Journal"]
+        assert [line.split()[:3] for line in lines[2:5]] == [
+            ["us-east-1", "1", "Complete"],
+            ["us-west-2", "1", "Complete"],
+            ["eu-west-1", "1", "Incomplete"],
+        ]
+        assert "Uninstall Incomplete" in result.stderr
+
+    result = cli_runner.invoke(
+        cli,
+        [
+            "subscriptions",
+            "uninstall",
+            "--function",
+            "foobar",
+            "--aws-region",
+            "us-east-1,mars-north-1",
+        ],
+    )
+    assert result.exit_code == 2
+    assert "mars-north-1 is not a region" in result.stderr
+
+    result = cli_runner.invoke(
+        cli,
+        ["subscriptions", "uninstall", "--aws-region", "all", "--resume", "foo"],
+    )
+    assert result.exit_code == 2
+
+
+@mock_aws
+def test_subscriptions_uninstall_multiple_accounts(aws_credentials, cli_runner):
+    """
+    Assert that 'newrelic-lambda subscriptions uninstall --account' assumes the role
+    from --role-arn-template in each account
+    """
+    register_groups(cli)
+
+    with patch(
+        "newrelic_lambda_cli.subscriptions.remove_log_subscription"
+    ) as mock_remove_log_subscription:
+        mock_remove_log_subscription.return_value = True
+        result = cli_runner.invoke(
+            cli,
+            [
+                "subscriptions",
+                "uninstall",
+                "--function",
+                "foobar",
+                "--aws-region",
+                "us-east-1",
+                "--role-arn-template",
+                "arn:aws:iam::{account_id}:role/Deployer",
+                "--account",
+                "111122223333,444455556666",
+                "--max-accounts",
+                "1",
+            ],
+        )
+        assert result.exit_code == 0, result.stderr
+        assert sorted(
+            call.args[0].session.role_arn
+            for call in mock_remove_log_subscription.call_args_list
+        ) == [
+            "arn:aws:iam::111122223333:role/Deployer",
+            "arn:aws:iam::444455556666:role/Deployer",
+        ]
+        lines = result.stdout.splitlines()
+        assert lines[0].split()[:2] == ["Account", "Region"]
+        assert [line.split()[:4] for line in lines[2:4]] == [
+            ["111122223333", "us-east-1", "1", "Complete"],
+            ["444455556666", "us-east-1", "1", "Complete"],
+        ]
+        assert "Uninstall Complete" in result.stdout
+
+
+@mock_aws
+def test_subscriptions_uninstall_json_output(aws_credentials, cli_runner):
+    """
+    Assert that 'newrelic-lambda subscriptions uninstall --output json' prints only
+    the results report to stdout
+    """
+    register_groups(cli)
+
+    with patch(
+        "newrelic_lambda_cli.subscriptions.remove_log_subscription"
+    ) as mock_remove_log_subscription:
+        mock_remove_log_subscription.side_effect = (
+            lambda input, function, log_group_name: function == "foobar"
+        )
+        result = cli_runner.invoke(
+            cli,
+            [
+                "subscriptions",
+                "uninstall",
+                "--function",
+                "foobar",
+                "--function",
+                "barbaz",
+                "--aws-region",
+                "us-east-1",
+                "--output",
+                "json",
+            ],
+        )
+        assert result.exit_code == 1
+        report = json.loads(result.stdout)
+        assert report["summary"]["functions"] == 2
+        assert report["summary"]["failed"] == 1
+        assert sorted(
+            (record["function"], record["status"], record["action"])
+            for record in report["results"]
+        ) == [
+            ("barbaz", "failed", "uninstall"),
+            ("foobar", "succeeded", "uninstall"),
+        ]
+        assert "Uninstall Incomplete" in result.stderr
+
+
+@mock_aws
+def test_subscriptions_install_stats(aws_credentials, cli_runner):
+    """
+    Assert that 'newrelic-lambda subscriptions install --stats' prints the API call
+    stats at exit
+    """
+    register_groups(cli)
+
+    def _create_log_subscription(input, function, log_group_name):
+        with stats.timed("newrelic:NerdGraph"):
+            return True
+
+    with patch(
+        "newrelic_lambda_cli.subscriptions.get_log_ingestion_arn"
+    ) as mock_get_log_ingestion_arn, patch(
+        "newrelic_lambda_cli.subscriptions.create_log_subscription"
+    ) as mock_create_log_subscription:
+        mock_get_log_ingestion_arn.return_value = (
+            "arn:aws:lambda:us-east-1:123456789012:function:newrelic-log-ingestion"
+        )
+        mock_create_log_subscription.side_effect = _create_log_subscription
+        result = cli_runner.invoke(
+            cli,
+            [
+                "subscriptions",
+                "install",
+                "--function",
+                "foobar",
+                "--aws-region",
+                "us-east-1",
+                "--stats",
+            ],
+        )
+        assert result.exit_code == 0, result.stderr
+        assert "newrelic:NerdGraph" in result.stderr
+        assert stats.stop() is None
+
+
+@mock_aws
+def test_subscriptions_install_resolves_destination_once(aws_credentials, cli_runner):
+    """
+    Assert that 'newrelic-lambda subscriptions install' looks up the log ingestion
+    function once and passes it to every function's subscription
+    """
+    register_groups(cli)
+    destination_arn = "arn:aws:lambda:us-east-1:123456789012:function:FooBar"
+
+    with patch(
+        "newrelic_lambda_cli.subscriptions.get_otel_log_ingestion_arn"
+    ) as mock_get_otel_log_ingestion_arn, patch(
+        "newrelic_lambda_cli.subscriptions.create_otel_log_subscription"
+    ) as mock_create_otel_log_subscription:
+        mock_get_otel_log_ingestion_arn.return_value = destination_arn
+        mock_create_otel_log_subscription.return_value = True
+        result = cli_runner.invoke(
+            cli,
+            [
+                "subscriptions",
+                "install",
+                "--otel",
+                "--function",
+                "foobar",
+                "--function",
+                "barbaz",
+                "--aws-region",
+                "us-east-1",
+            ],
+        )
+        assert result.exit_code == 0, result.stderr
+        mock_get_otel_log_ingestion_arn.assert_called_once()
+        assert mock_create_otel_log_subscription.call_count == 2
+        for call in mock_create_otel_log_subscription.call_args_list:
+            assert call.args[0].destination_arn == destination_arn
+
+
+@mock_aws
+def test_subscriptions_install_account_policy(aws_credentials, cli_runner):
+    """
+    Assert that 'newrelic-lambda subscriptions install --account-policy' installs a
+    single policy instead of a subscription filter per function
+    """
+    register_groups(cli)
+
+    result = cli_runner.invoke(
+        cli,
+        ["subscriptions", "install", "--account-policy", "--function", "foobar"],
+    )
+    assert result.exit_code != 0
+    assert "can't be used with --function" in result.stderr
+
+    with patch(
+        "newrelic_lambda_cli.subscriptions.get_log_ingestion_arn"
+    ) as mock_get_log_ingestion_arn, patch(
+        "newrelic_lambda_cli.subscriptions.install_account_policy"
+    ) as mock_install_account_policy, patch(
+        "newrelic_lambda_cli.subscriptions.create_log_subscription"
+    ) as mock_create_log_subscription:
+        mock_get_log_ingestion_arn.return_value = "FooBar"
+        mock_install_account_policy.return_value = True
+        result = cli_runner.invoke(
+            cli,
+            [
+                "subscriptions",
+                "install",
+                "--account-policy",
+                "--exclude",
+                "barbaz",
+                "--aws-region",
+                "us-east-1",
+            ],
+            input="n\n",
+        )
+        assert result.exit_code != 0
+        assert "EVERY log group in the account and region" in result.output
+        mock_install_account_policy.assert_not_called()
+
+        result = cli_runner.invoke(
+            cli,
+            [
+                "subscriptions",
+                "install",
+                "--account-policy",
+                "--otel",
+                "--aws-region",
+                "us-east-1",
+            ],
+        )
+        assert result.exit_code == 2
+        assert "Pass --filter-pattern" in result.stderr
+        mock_install_account_policy.assert_not_called()
+
+        result = cli_runner.invoke(
+            cli,
+            [
+                "subscriptions",
+                "install",
+                "--account-policy",
+                "--force",
+                "--exclude",
+                "barbaz",
+                "--aws-region",
+                "us-east-1",
+                "--output",
+                "json",
+            ],
+        )
+        assert result.exit_code == 0, result.stderr
+        mock_create_log_subscription.assert_not_called()
+        mock_install_account_policy.assert_called_once()
+        input = mock_install_account_policy.call_args.args[0]
+        assert input.destination_arn == "FooBar"
+        assert input.excludes == ("barbaz",)
+        report = json.loads(result.stdout)
+        assert [record["function"] for record in report["results"]] == [
+            "NewRelicLogStreaming"
+        ]
+
+
+@mock_aws
+def test_subscriptions_uninstall_account_policy(aws_credentials, cli_runner):
+    """
+    Assert that 'newrelic-lambda subscriptions uninstall --account-policy' removes the
+    policy without needing --function
+    """
+    register_groups(cli)
+
+    with patch(
+        "newrelic_lambda_cli.subscriptions.remove_account_policy"
+    ) as mock_remove_account_policy:
+        mock_remove_account_policy.return_value = True
+        result = cli_runner.invoke(
+            cli,
+            [
+                "subscriptions",
+                "uninstall",
+                "--account-policy",
+                "--otel",
+                "--aws-region",
+                "us-east-1",
+            ],
+        )
+        assert result.exit_code == 0, result.stderr
+        mock_remove_account_policy.assert_called_once()
+        assert mock_remove_account_policy.call_args.args[0].otel is True
+
+
+@mock_aws
+def test_subscriptions_status(aws_credentials, cli_runner):
+    """
+    Assert that 'newrelic-lambda subscriptions status' lists the account policies of
+    each region
+    """
+    register_groups(cli)
+
+    with patch(
+        "newrelic_lambda_cli.subscriptions.get_account_policies"
+    ) as mock_get_account_policies:
+        mock_get_account_policies.side_effect = lambda session: (
+            [
+                {
+                    "name": "NewRelicLogStreaming",
+                    "destination_arn": "FooBar",
+                    "filter_pattern": "REPORT",
+                    "selection_criteria": None,
+                    "last_updated": None,
+                }
+            ]
+            if session.region_name == "us-east-1"
+            else []
+        )
+        result = cli_runner.invoke(
+            cli,
+            ["subscriptions", "status", "--aws-region", "us-east-1,us-west-2"],
+        )
+        assert result.exit_code == 0, result.stderr
+        assert re.search(r"us-east-1\s+NewRelicLogStreaming\s+FooBar", result.stdout)
+        assert re.search(r"us-west-2\s+Not installed", result.stdout)
+
+
+@mock_aws
+def test_subscriptions_install_shared_log_group(aws_credentials, cli_runner):
+    """
+    Assert that 'newrelic-lambda subscriptions install' subscribes a log group shared
+    by several functions once
+    """
+    register_groups(cli)
+    log_groups = {
+        "foobar": "/shared/logs",
+        "barbaz": "/shared/logs",
+        "bazqux": "/aws/lambda/bazqux",
+    }
+
+    with patch(
+        "newrelic_lambda_cli.subscriptions.get_log_ingestion_arn"
+    ) as mock_get_log_ingestion_arn, patch(
+        "newrelic_lambda_cli.subscriptions.get_log_group_name"
+    ) as mock_get_log_group_name, patch(
+        "newrelic_lambda_cli.subscriptions.create_log_subscription"
+    ) as mock_create_log_subscription:
+        mock_get_log_ingestion_arn.return_value = "FooBar"
+        mock_get_log_group_name.side_effect = (
+            lambda session, function, config: log_groups[function]
+        )
+        mock_create_log_subscription.return_value = True
+        result = cli_runner.invoke(
+            cli,
+            [
+                "subscriptions",
+                "install",
+                "--function",
+                "foobar",
+                "--function",
+                "barbaz",
+                "--function",
+                "bazqux",
+                "--aws-region",
+                "us-east-1",
+                "--output",
+                "json",
+            ],
+        )
+        assert result.exit_code == 0, result.stderr
+        assert sorted(
+            call.args[2] for call in mock_create_log_subscription.call_args_list
+        ) == ["/aws/lambda/bazqux", "/shared/logs"]
+        assert "is shared with another function" in result.stderr
+        report = json.loads(result.stdout)
+        assert report["summary"]["succeeded"] == 3
+
+
+@mock_aws
+def test_subscriptions_install_missing_log_groups(aws_credentials, cli_runner):
+    """
+    Assert that 'newrelic-lambda subscriptions install --function all' lists the log
+    groups once and reports the functions without one instead of querying them
+    """
+    register_groups(cli)
+
+    with patch(
+        "newrelic_lambda_cli.subscriptions.get_log_ingestion_arn"
+    ) as mock_get_log_ingestion_arn, patch(
+        "newrelic_lambda_cli.subscriptions.list_log_groups"
+    ) as mock_list_log_groups, patch(
+        "newrelic_lambda_cli.cli.subscriptions.iter_aliased_functions"
+    ) as mock_iter_aliased_functions, patch(
+        "newrelic_lambda_cli.subscriptions.create_log_subscription"
+    ) as mock_create_log_subscription, patch(
+        "newrelic_lambda_cli.subscriptions.remove_log_subscription"
+    ) as mock_remove_log_subscription:
+        mock_get_log_ingestion_arn.return_value = "FooBar"
+        mock_list_log_groups.return_value = {"/aws/lambda/foobar"}
+        mock_iter_aliased_functions.side_effect = lambda input, configs: iter(
+            ["foobar", "barbaz"]
+        )
+        mock_create_log_subscription.return_value = True
+        mock_remove_log_subscription.return_value = True
+
+        result = cli_runner.invoke(
+            cli,
+            [
+                "subscriptions",
+                "install",
+                "--function",
+                "all",
+                "--aws-region",
+                "us-east-1",
+            ],
+        )
+        assert result.exit_code == 1
+        mock_list_log_groups.assert_called_once()
+        mock_create_log_subscription.assert_called_once_with(
+            ANY, "foobar", "/aws/lambda/foobar"
+        )
+        assert "Log group '/aws/lambda/barbaz' of 'barbaz' does not exist" in (
+            result.stderr
+        )
+
+        result = cli_runner.invoke(
+            cli,
+            [
+                "subscriptions",
+                "uninstall",
+                "--function",
+                "all",
+                "--aws-region",
+                "us-east-1",
+            ],
+        )
+        assert result.exit_code == 0, result.stderr
+        mock_remove_log_subscription.assert_called_once_with(
+            ANY, "foobar", "/aws/lambda/foobar"
+        )
+
+
+@mock_aws
+def test_subscriptions_migrate(aws_credentials, cli_runner):
+    """
+    Assert that 'newrelic-lambda subscriptions migrate' migrates each function in one
+    run and that --rollback restores the filters saved in its journal
+    """
+    register_groups(cli)
+
+    def _migrate(input, function, log_group_name, save):
+        save(
+            function,
+            log_group_name=log_group_name,
+            subscription_filter={"filterName": "NewRelicLogStreaming"},
+        )
+        return True
+
+    with patch(
+        "newrelic_lambda_cli.subscriptions.get_otel_log_ingestion_arn"
+    ) as mock_get_otel_log_ingestion_arn, patch(
+        "newrelic_lambda_cli.subscriptions.migrate_log_subscription"
+    ) as mock_migrate_log_subscription, patch(
+        "newrelic_lambda_cli.subscriptions.restore_log_subscription"
+    ) as mock_restore_log_subscription:
+        mock_get_otel_log_ingestion_arn.return_value = "Otel"
+        mock_migrate_log_subscription.side_effect = _migrate
+        mock_restore_log_subscription.return_value = True
+
+        result = cli_runner.invoke(
+            cli,
+            [
+                "subscriptions",
+                "migrate",
+                "--function",
+                "foobar",
+                "--function",
+                "barbaz",
+                "--aws-region",
+                "us-east-1",
+            ],
+        )
+        assert result.exit_code == 0, result.stderr
+        mock_get_otel_log_ingestion_arn.assert_called_once()
+        assert mock_migrate_log_subscription.call_count == 2
+        for call in mock_migrate_log_subscription.call_args_list:
+            assert call.args[0].destination_arn == "Otel"
+        journal = re.search(r"--rollback (\S+)", result.stderr).group(1)
+
+        result = cli_runner.invoke(
+            cli,
+            ["subscriptions", "migrate", "--rollback", journal, "--function", "foobar"],
+        )
+        assert result.exit_code != 0
+        assert "can't be used with --function" in result.stderr
+
+        result = cli_runner.invoke(
+            cli,
+            [
+                "subscriptions",
+                "migrate",
+                "--rollback",
+                journal,
+                "--aws-region",
+                "us-east-1",
+            ],
+        )
+        assert result.exit_code == 0, result.stderr
+        assert sorted(
+            (call.args[1], call.args[2]["log_group_name"])
+            for call in mock_restore_log_subscription.call_args_list
+        ) == [("barbaz", "/aws/lambda/barbaz"), ("foobar", "/aws/lambda/foobar")]
@@ -2,6 +2,9 @@ from click.testing import CliRunner
 import os
 import pytest
 
+from newrelic_lambda_cli import utils
+from newrelic_lambda_cli.layers import clear_index_cache
+from newrelic_lambda_cli.sessions import clear_client_pools
 from newrelic_lambda_cli.types import (
     INTEGRATION_INSTALL_KEYS,
     INTEGRATION_UNINSTALL_KEYS,
@@ -9,6 +12,8 @@ from newrelic_lambda_cli.types import (
     LAYER_INSTALL_KEYS,
     LAYER_UNINSTALL_KEYS,
     SUBSCRIPTION_INSTALL_KEYS,
+    SUBSCRIPTION_MIGRATE_KEYS,
+    SUBSCRIPTION_STATUS_KEYS,
     SUBSCRIPTION_UNINSTALL_KEYS,
     IntegrationInstall,
     IntegrationUninstall,
@@ -16,6 +21,8 @@ from newrelic_lambda_cli.types import (
     LayerInstall,
     LayerUninstall,
     SubscriptionInstall,
+    SubscriptionMigrate,
+    SubscriptionStatus,
     SubscriptionUninstall,
 )
 
@@ -43,6 +50,22 @@ def clear_aws_env(monkeypatch):
     monkeypatch.delenv("AWS_PROFILE", raising=False)
 
 
+@pytest.fixture(autouse=True)
+def clear_cached_client_pools():
+    clear_client_pools()
+    yield
+    clear_client_pools()
+
+
+@pytest.fixture(autouse=True)
+def isolated_cache(monkeypatch, tmp_path):
+    monkeypatch.setattr(utils, "CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(utils, "JOURNAL_DIR", str(tmp_path / "journals"))
+    clear_index_cache()
+    yield
+    clear_index_cache()
+
+
 @pytest.fixture(scope="module")
 def cli_runner():
     return CliRunner()
@@ -102,3 +125,17 @@ def subscription_uninstall(**kwargs):
     return SubscriptionUninstall(
         **{key: kwargs.get(key) for key in SUBSCRIPTION_UNINSTALL_KEYS}
     )
+
+
+def subscription_migrate(**kwargs):
+    assert all(key in SUBSCRIPTION_MIGRATE_KEYS for key in kwargs)
+    return SubscriptionMigrate(
+        **{key: kwargs.get(key) for key in SUBSCRIPTION_MIGRATE_KEYS}
+    )
+
+
+def subscription_status(**kwargs):
+    assert all(key in SUBSCRIPTION_STATUS_KEYS for key in kwargs)
+    return SubscriptionStatus(
+        **{key: kwargs.get(key) for key in SUBSCRIPTION_STATUS_KEYS}
+    )
@@ -0,0 +1,94 @@
+import threading
+import time
+
+import pytest
+from click import UsageError
+
+from newrelic_lambda_cli.accounts import get_role_arns, run_in_accounts
+from .conftest import subscription_install
+
+
+def test_get_role_arns(tmp_path):
+    assert get_role_arns(subscription_install()) == [None]
+
+    accounts_file = tmp_path / "accounts.txt"
+    accounts_file.write_text(
+        "# Production\n"
+        "111122223333\n"
+        "\n"
+        "arn:aws:iam::444455556666:role/Custom\n"
+        "111122223333\n"
+    )
+    input = subscription_install(
+        role_arn_template="arn:aws:iam::{account_id}:role/Deployer",
+        accounts=["777788889999, 111122223333"],
+        accounts_file=str(accounts_file),
+    )
+    assert get_role_arns(input) == [
+        "arn:aws:iam::777788889999:role/Deployer",
+        "arn:aws:iam::111122223333:role/Deployer",
+        "arn:aws:iam::444455556666:role/Custom",
+    ]
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {"role_arn_template": "arn:aws:iam::{account_id}:role/Deployer"},
+        {"accounts": ["111122223333"]},
+        {"accounts": ["foo"], "role_arn_template": "{account_id}"},
+        {"accounts": ["111122223333"], "role_arn_template": "{account}"},
+        {"accounts_file": "/does/not/exist"},
+    ],
+)
+def test_get_role_arns_invalid(kwargs):
+    with pytest.raises(UsageError):
+        get_role_arns(subscription_install(**kwargs))
+
+
+def test_run_in_accounts():
+    def _run(role_arn, region):
+        if role_arn and role_arn.endswith("Broken"):
+            raise RuntimeError("AccessDenied")
+        return (role_arn, region)
+
+    role_arns = [
+        "arn:aws:iam::111122223333:role/Deployer",
+        "arn:aws:iam::444455556666:role/Broken",
+    ]
+    targets, results = run_in_accounts(_run, role_arns, ["us-east-1", "us-west-2"], 1)
+    assert targets == [
+        ("111122223333", "us-east-1"),
+        ("111122223333", "us-west-2"),
+        ("444455556666", "us-east-1"),
+        ("444455556666", "us-west-2"),
+    ]
+    assert results[:2] == [
+        (role_arns[0], "us-east-1"),
+        (role_arns[0], "us-west-2"),
+    ]
+    assert all(isinstance(result, RuntimeError) for result in results[2:])
+
+    targets, results = run_in_accounts(_run, [None], [None], 1)
+    assert targets == [(None, None)]
+    assert results == [(None, None)]
+
+
+def test_run_in_accounts_max_regions():
+    lock = threading.Lock()
+    running = []
+    peak = []
+
+    def _run(role_arn, region):
+        with lock:
+            running.append(region)
+            peak.append(len(running))
+        time.sleep(0.01)
+        with lock:
+            running.remove(region)
+        return region
+
+    regions = ["us-east-1", "us-east-2", "us-west-1", "us-west-2"]
+    targets, results = run_in_accounts(_run, [None], regions, 1, max_regions=2)
+    assert results == regions
+    assert max(peak) == 2
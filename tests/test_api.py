@@ -1,6 +1,8 @@
-from unittest.mock import Mock
+from unittest.mock import ANY, Mock, patch
 
+from newrelic_lambda_cli import api
 from newrelic_lambda_cli.api import (
+    create_client,
     create_integration_account,
     enable_lambda_integration,
     NewRelicGQL,
@@ -186,3 +188,44 @@ def test_enable_lambda_integration():
     assert (
         lambda_enabled is True
     ), "Account is linked but didn't have the lambda integration enabled, so it should be configured"
+
+
+@patch("newrelic_lambda_cli.api.Client")
+def test_create_client_caches_schema(mock_client, monkeypatch):
+    url = "https://api.newrelic.com/graphql"
+    mock_client.return_value.introspection = {"__schema": {"types": []}}
+
+    create_client(url, "foobar")
+    mock_client.assert_called_once_with(transport=ANY, fetch_schema_from_transport=True)
+
+    # The schema is read from the cache until it expires
+    mock_client.reset_mock()
+    create_client(url, "foobar")
+    mock_client.assert_called_once_with(
+        transport=ANY, introspection={"__schema": {"types": []}}
+    )
+
+    # Other endpoints have their own schema
+    mock_client.reset_mock()
+    create_client("https://api.eu.newrelic.com/graphql", "foobar")
+    mock_client.assert_called_once_with(transport=ANY, fetch_schema_from_transport=True)
+
+    monkeypatch.setattr(api, "SCHEMA_CACHE_TTL", 0)
+    mock_client.reset_mock()
+    create_client(url, "foobar")
+    mock_client.assert_called_once_with(transport=ANY, fetch_schema_from_transport=True)
+
+
+@patch("newrelic_lambda_cli.api.Client")
+def test_create_client_without_schema(mock_client):
+    create_client("https://api.newrelic.com/graphql", "foobar", validate_schema=False)
+    mock_client.assert_called_once_with(
+        transport=ANY, fetch_schema_from_transport=False
+    )
+
+    # Falls back to not validating queries if the schema can't be fetched
+    mock_client.reset_mock()
+    mock_client.side_effect = [Exception("Unauthorized"), Mock()]
+    create_client("https://api.newrelic.com/graphql", "foobar")
+    assert mock_client.call_count == 2
+    mock_client.assert_called_with(transport=ANY, fetch_schema_from_transport=False)
@@ -0,0 +1,244 @@
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from newrelic_lambda_cli.concurrency import (
+    AdaptiveLimiter,
+    DEFAULT_API_RATES,
+    is_throttling_response,
+    parse_rate_limits,
+    RateLimiter,
+    run_all,
+    run_per_target,
+    SharedCalls,
+    TokenBucket,
+)
+
+
+def _throttled_response():
+    return (MagicMock(), {"Error": {"Code": "TooManyRequestsException"}})
+
+
+def test_is_throttling_response():
+    assert is_throttling_response(None) is False
+    assert is_throttling_response((MagicMock(), {})) is False
+    assert is_throttling_response((MagicMock(), {"Error": {"Code": "Foo"}})) is False
+    assert is_throttling_response(_throttled_response()) is True
+
+
+def test_fixed_limiter():
+    limiter = AdaptiveLimiter(4, adaptive=False)
+    assert limiter.limit == 4
+
+    limiter.on_needs_retry(response=_throttled_response())
+    assert limiter.run(lambda x: x * 2, 21) == 42
+    assert limiter.limit == 4
+    assert limiter.throttles == 1
+
+
+def test_adaptive_limiter_increases_without_throttling():
+    limiter = AdaptiveLimiter(8, initial_limit=2)
+    for _ in range(50):
+        limiter.acquire()
+        limiter.release(0.1)
+    assert limiter.limit == 8
+
+
+def test_adaptive_limiter_backs_off_on_throttling():
+    limiter = AdaptiveLimiter(16, initial_limit=16)
+    limiter.on_needs_retry(response=_throttled_response())
+    limiter.acquire()
+    limiter.release(0.0)
+    assert limiter.limit == 8
+
+    # Throttles from requests already in flight don't halve the limit again
+    limiter._latency = 60
+    limiter.on_needs_retry(response=_throttled_response())
+    limiter.acquire()
+    limiter.release(60)
+    assert limiter.limit == 8
+
+
+def test_adaptive_limiter_backs_off_on_latency():
+    limiter = AdaptiveLimiter(16, initial_limit=10, latency_tolerance=2.0)
+    limiter.acquire()
+    limiter.release(0.01)
+    limit = limiter.limit
+    for _ in range(10):
+        limiter.acquire()
+        limiter.release(1.0)
+    assert limiter.limit < limit
+
+
+def test_adaptive_limiter_bounds_in_flight():
+    limiter = AdaptiveLimiter(2, adaptive=False)
+    in_flight = []
+    peak = []
+    lock = threading.Lock()
+
+    def task():
+        with lock:
+            in_flight.append(1)
+            peak.append(len(in_flight))
+        time.sleep(0.01)
+        with lock:
+            in_flight.pop()
+
+    threads = [threading.Thread(target=limiter.run, args=(task,)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert max(peak) == 2
+
+
+def test_register():
+    mock_session = MagicMock()
+    limiter = AdaptiveLimiter(4)
+    limiter.register(mock_session)
+    mock_session.register_event_handler.assert_called_once_with(
+        "needs-retry", limiter.on_needs_retry
+    )
+
+
+def test_token_bucket():
+    bucket = TokenBucket(rate=50, burst=2)
+    start = time.monotonic()
+    for _ in range(7):
+        bucket.acquire()
+    # Two tokens are available immediately, the other five refill at 50 per second
+    assert time.monotonic() - start >= 0.09
+
+
+def test_rate_limiter():
+    limiter = RateLimiter({"lambda:GetFunction": 10, "logs:*": 5, "iam:*": None})
+    assert set(limiter._buckets) == {"lambda:GetFunction", "logs:*"}
+
+    with patch.object(limiter._buckets["logs:*"], "acquire") as mock_logs, patch.object(
+        limiter._buckets["lambda:GetFunction"], "acquire"
+    ) as mock_lambda:
+        limiter.on_before_send(
+            event_name="before-send.cloudwatch-logs.PutSubscriptionFilter"
+        )
+        limiter.on_before_send(event_name="before-send.lambda.GetFunction")
+        limiter.on_before_send(event_name="before-send.lambda.ListFunctions")
+        limiter.on_before_send(event_name="before-send.iam.AttachRolePolicy")
+
+        mock_logs.assert_called_once_with()
+        mock_lambda.assert_called_once_with()
+
+
+def test_parse_rate_limits():
+    rates = parse_rate_limits(
+        ["lambda:UpdateFunctionConfiguration=2.5", "logs:PutSubscriptionFilter=0"]
+    )
+    assert rates["lambda:UpdateFunctionConfiguration"] == 2.5
+    assert rates["logs:PutSubscriptionFilter"] == 0
+    assert rates["lambda:GetFunction"] == DEFAULT_API_RATES["lambda:GetFunction"]
+
+    with pytest.raises(ValueError):
+        parse_rate_limits(["UpdateFunctionConfiguration=1"])
+    with pytest.raises(ValueError):
+        parse_rate_limits(["lambda:GetFunction=fast"])
+
+
+def test_run_all():
+    calls = []
+    assert run_all(lambda item: calls.append(item) or True, range(20), 4)
+    assert sorted(calls) == list(range(20))
+
+    assert not run_all(lambda item: item != 3, range(10), 4)
+    assert run_all(lambda item: False, [], 4)
+
+    def _raise(item):
+        raise RuntimeError(item)
+
+    with pytest.raises(RuntimeError):
+        run_all(_raise, range(5), 2)
+
+
+def test_run_all_reads_items_lazily():
+    release = threading.Event()
+    read = []
+
+    def _items():
+        for item in range(100):
+            read.append(item)
+            yield item
+
+    def _call(item):
+        release.wait()
+        return True
+
+    thread = threading.Thread(target=lambda: run_all(_call, _items(), 4), daemon=True)
+    thread.start()
+    time.sleep(0.2)
+    # 4 in flight and one waiting for a free slot
+    assert len(read) <= 5
+    release.set()
+    thread.join(5)
+    assert len(read) == 100
+
+
+def test_run_per_target():
+    def _run(region):
+        if region == "eu-west-1":
+            raise RuntimeError(region)
+        return region.upper()
+
+    assert run_per_target(_run, ["us-east-1"]) == ["US-EAST-1"]
+
+    results = run_per_target(_run, ["us-east-1", "eu-west-1", "us-west-2"])
+    assert results[0] == "US-EAST-1"
+    assert isinstance(results[1], RuntimeError)
+    assert results[2] == "US-WEST-2"
+
+    with pytest.raises(RuntimeError):
+        run_per_target(_run, ["eu-west-1"])
+
+
+def test_shared_calls():
+    shared = SharedCalls()
+    calls = []
+    started = threading.Event()
+    release = threading.Event()
+
+    def _update(log_group):
+        calls.append(log_group)
+        started.set()
+        release.wait(5)
+        return log_group.upper()
+
+    results = []
+    threads = [
+        threading.Thread(
+            target=lambda: results.append(shared.run("/shared", _update, "/shared"))
+        )
+        for _ in range(3)
+    ]
+    threads[0].start()
+    started.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert calls == ["/shared"]
+    assert sorted(results) == [
+        ("/SHARED", False),
+        ("/SHARED", False),
+        ("/SHARED", True),
+    ]
+    assert shared.run("/other", _update, "/other") == ("/OTHER", True)
+
+    def _fail():
+        raise RuntimeError("failed")
+
+    with pytest.raises(RuntimeError):
+        shared.run("/failing", _fail)
+    with pytest.raises(RuntimeError):
+        shared.run("/failing", _fail)
@@ -1,9 +1,20 @@
 import boto3
+import botocore
+import click
+import pytest
 from unittest import mock
 from moto import mock_aws
 from unittest.mock import MagicMock
 
-from newrelic_lambda_cli.functions import get_aliased_functions, list_functions
+from newrelic_lambda_cli.functions import (
+    get_aliased_functions,
+    get_function_configuration,
+    iter_aliased_functions,
+    list_functions,
+    UpdateWaiter,
+    wait_until_ready,
+)
+from newrelic_lambda_cli.results import DEFERRED
 
 from .conftest import layer_install
 
@@ -44,20 +55,27 @@ def test_get_aliased_functions(mock_list_functions, aws_credentials):
         "aliased-func",
     ]
 
+    configs = {}
     mock_list_functions.return_value = [
-        {"FunctionName": "aliased-func"},
-        {"FunctionName": "ignored-func"},
+        {"FunctionName": "aliased-func", "Runtime": "python3.12"},
+        {"FunctionName": "ignored-func", "Runtime": "nodejs22.x"},
         {"FunctionName": "newrelic-log-ingestion"},
     ]
     assert get_aliased_functions(
         layer_install(
             session=session, functions=["foo", "bar", "all"], excludes=["ignored-func"]
-        )
+        ),
+        configs,
     ) == [
         "foo",
         "bar",
         "aliased-func",
     ]
+    assert configs == {
+        "aliased-func": {
+            "Configuration": {"FunctionName": "aliased-func", "Runtime": "python3.12"}
+        }
+    }
 
 
 @mock_aws
@@ -75,3 +93,142 @@ def test_list_functions(aws_credentials):
     assert list(list_functions(mock_session)) == [
         {"FunctionName": "foobar", "Layers": [], "x-new-relic-enabled": False}
     ]
+
+
+def test_get_function_configuration():
+    mock_session = MagicMock()
+    mock_client = mock_session.client.return_value
+    mock_client.get_function_configuration.return_value = {"FunctionName": "foobar"}
+
+    assert get_function_configuration(mock_session, "foobar") == {
+        "Configuration": {"FunctionName": "foobar"}
+    }
+    mock_client.get_function_configuration.assert_called_once_with(
+        FunctionName="foobar"
+    )
+    mock_client.get_function.assert_not_called()
+
+    mock_client.get_function_configuration.side_effect = (
+        botocore.exceptions.ClientError(
+            {"ResponseMetadata": {"HTTPStatusCode": 404}}, "GetFunctionConfiguration"
+        )
+    )
+    assert get_function_configuration(mock_session, "foobar") is None
+
+    mock_client.get_function_configuration.side_effect = (
+        botocore.exceptions.ClientError(
+            {"ResponseMetadata": {"HTTPStatusCode": 403}}, "GetFunctionConfiguration"
+        )
+    )
+    with pytest.raises(click.UsageError):
+        get_function_configuration(mock_session, "foobar")
+
+
+def test_wait_until_ready():
+    mock_session = MagicMock()
+    mock_client = mock_session.client.return_value
+    mock_client.get_function_configuration.side_effect = [
+        {"State": "Active", "LastUpdateStatus": "InProgress"},
+        {"State": "Active", "LastUpdateStatus": "Successful"},
+    ]
+    assert wait_until_ready(mock_session, "foobar", interval=0) is True
+    assert mock_client.get_function_configuration.call_count == 2
+
+    mock_client.get_function_configuration.side_effect = None
+    mock_client.get_function_configuration.return_value = {"State": "Pending"}
+    assert wait_until_ready(mock_session, "foobar", interval=0, timeout=0) is False
+
+
+def test_update_waiter():
+    mock_session = MagicMock()
+    mock_client = mock_session.client.return_value
+    statuses = {"foo": ["InProgress", "Successful"], "bar": ["Successful"]}
+    mock_client.get_function_configuration.side_effect = lambda FunctionName: {
+        "LastUpdateStatus": statuses[FunctionName].pop(0)
+    }
+    recorded = []
+    waiter = UpdateWaiter(
+        mock_session, interval=0, record=lambda *args: recorded.append(args)
+    )
+
+    calls = []
+    waiter.when_ready("foo", lambda: calls.append("foo") or True)
+    waiter.when_ready("bar", lambda: calls.append("bar") or False)
+    assert waiter.wait() is False
+    assert calls == ["bar", "foo"]
+    assert sorted(recorded) == [("bar", False), ("foo", True)]
+
+
+def test_update_waiter_timeout():
+    mock_session = MagicMock()
+    mock_client = mock_session.client.return_value
+    mock_client.get_function_configuration.return_value = {
+        "LastUpdateStatus": "InProgress"
+    }
+    waiter = UpdateWaiter(mock_session, interval=0, timeout=0)
+    func = MagicMock(return_value=True)
+    waiter.when_ready("foo", func)
+    assert waiter.wait() is False
+    func.assert_not_called()
+
+    assert UpdateWaiter(mock_session).wait() is True
+
+
+@mock.patch("newrelic_lambda_cli.functions.list_functions", autospec=True)
+def test_iter_aliased_functions(mock_list_functions, aws_credentials):
+    session = MagicMock()
+    listed = []
+
+    def _list_functions(session, alias):
+        for name in ("foo", "aliased-func", "excluded-func", "aliased-func"):
+            listed.append(name)
+            yield {"FunctionName": name}
+
+    mock_list_functions.side_effect = _list_functions
+    configs = {}
+    functions = iter_aliased_functions(
+        layer_install(
+            session=session,
+            functions=["foo", "all", "installed", "foo"],
+            excludes=["excluded-func"],
+        ),
+        configs,
+    )
+
+    assert next(functions) == "foo"
+    assert listed == []
+    assert next(functions) == "aliased-func"
+    assert listed == ["foo", "aliased-func"]
+    assert configs == {
+        "aliased-func": {"Configuration": {"FunctionName": "aliased-func"}}
+    }
+    assert list(functions) == []
+    mock_list_functions.assert_called_once_with(session, "all")
+
+
+def test_update_waiter_keeps_deadline():
+    mock_session = MagicMock()
+    mock_client = mock_session.client.return_value
+    mock_client.get_function_configuration.return_value = {
+        "LastUpdateStatus": "Successful"
+    }
+    recorded = []
+    waiter = UpdateWaiter(
+        mock_session,
+        interval=0.01,
+        timeout=0.05,
+        record=lambda *args: recorded.append(args),
+    )
+
+    # The function reports ready but the call keeps conflicting and waiting again
+    calls = []
+
+    def func():
+        calls.append("foo")
+        waiter.when_ready("foo", func)
+        return DEFERRED
+
+    waiter.when_ready("foo", func)
+    assert waiter.wait() is False
+    assert 0 < len(calls) < 10
+    assert recorded[-1] == ("foo", False)
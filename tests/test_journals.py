@@ -0,0 +1,158 @@
+import json
+
+import pytest
+from click import UsageError
+
+from newrelic_lambda_cli import utils
+from newrelic_lambda_cli.journals import create_journal, read_saved, resume_journal
+from newrelic_lambda_cli.results import DEFERRED, Results
+
+
+def test_create_journal():
+    journal = create_journal("layers install")
+    assert journal.path.startswith(utils.JOURNAL_DIR)
+    assert list(journal.track(iter(["foo", "bar"]))) == ["foo", "bar"]
+
+    journal.record("foo", True)
+    assert journal.run("bar", lambda: False) is False
+    with pytest.raises(RuntimeError):
+        journal.run("baz", _raise)
+
+    with open(journal.path) as f:
+        entries = [json.loads(line) for line in f]
+    assert entries[0] == {"command": "layers install"}
+    assert [(entry["function"], entry["status"]) for entry in entries[1:]] == [
+        ("foo", "pending"),
+        ("bar", "pending"),
+        ("foo", "succeeded"),
+        ("bar", "failed"),
+        ("baz", "failed"),
+    ]
+
+
+def _raise():
+    raise RuntimeError("expired token")
+
+
+def test_resume_journal():
+    journal = create_journal("subscriptions install")
+    list(journal.track(["foo", "bar", "baz", "qux", "quux"]))
+    journal.record("foo", True)
+    journal.record("bar", False)
+    journal.record("baz", False)
+    journal.record("baz", True)
+    with open(journal.path, "a") as f:
+        f.write('{"function": "qux", "sta')
+
+    resumed, functions = resume_journal(journal.path, "subscriptions install")
+    assert functions == ["bar", "qux", "quux"]
+
+    resumed.record("bar", True)
+    resumed.record("qux", True)
+    resumed.record("quux", True)
+    _, functions = resume_journal(journal.path, "subscriptions install")
+    assert functions == []
+
+    with pytest.raises(UsageError):
+        resume_journal(journal.path, "subscriptions uninstall")
+
+
+def test_resume_journal_invalid(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    path.write_text("")
+    with pytest.raises(UsageError):
+        resume_journal(str(path), "layers install")
+
+    path.write_text("not json\n")
+    with pytest.raises(UsageError):
+        resume_journal(str(path), "layers install")
+
+
+def test_resume_journal_region():
+    journal = create_journal("layers install", "us-east-1")
+    assert "us-east-1" in journal.path
+    list(journal.track(["foo"]))
+    assert journal.tracked == 1
+
+    _, functions = resume_journal(journal.path, "layers install", "us-east-1")
+    assert functions == ["foo"]
+    with pytest.raises(UsageError):
+        resume_journal(journal.path, "layers install", "eu-west-1")
+
+
+def test_resume_journal_account():
+    journal = create_journal("layers install", "us-east-1", "111122223333")
+    assert "111122223333-us-east-1" in journal.path
+
+    resume_journal(journal.path, "layers install", "us-east-1", "111122223333")
+    with pytest.raises(UsageError):
+        resume_journal(journal.path, "layers install", "us-east-1")
+    with pytest.raises(UsageError):
+        resume_journal(journal.path, "layers install", "us-east-1", "444455556666")
+
+
+def test_read_saved():
+    journal = create_journal("subscriptions migrate")
+    list(journal.track(["foo", "bar"]))
+    journal.save("foo", log_group_name="/aws/lambda/foo", subscription_filter={})
+    journal.record("foo", True)
+    journal.save("bar", log_group_name="/shared", subscription_filter={})
+    journal.save("bar", log_group_name="/aws/lambda/bar", subscription_filter={})
+    journal.record("bar", False)
+
+    assert read_saved(journal.path, "subscriptions migrate") == {
+        "foo": {"log_group_name": "/aws/lambda/foo", "subscription_filter": {}},
+        "bar": {"log_group_name": "/aws/lambda/bar", "subscription_filter": {}},
+    }
+    _, functions = resume_journal(journal.path, "subscriptions migrate")
+    assert functions == ["bar"]
+
+    with pytest.raises(UsageError):
+        read_saved(journal.path, "subscriptions install")
+
+
+def test_resume_journal_stages():
+    journal = create_journal("layers install")
+    list(journal.track(["foo"]))
+    journal.record("foo", True)
+    journal.start_stage("roles", {"role/Foo", "role/Bar"})
+
+    resumed, functions = resume_journal(journal.path, "layers install")
+    assert functions == []
+    assert resumed.stages == {"roles": ["role/Bar", "role/Foo"]}
+
+    resumed.finish_stage("roles", False)
+    resumed, _ = resume_journal(journal.path, "layers install")
+    assert resumed.stages == {"roles": ["role/Bar", "role/Foo"]}
+
+    resumed.start_stage("roles", {"role/Bar", "role/Foo", "role/Baz"})
+    resumed.finish_stage("roles", True)
+    resumed, _ = resume_journal(journal.path, "layers install")
+    assert resumed.stages == {}
+    assert read_saved(journal.path, "layers install") == {}
+
+
+def test_resume_journal_deferred():
+    journal = create_journal("layers install")
+    function_results = Results("install")
+    list(journal.track(["foo", "bar"]))
+    # foo's update was handed to an UpdateWaiter, the run stopped before it was made
+    assert journal.run("foo", function_results.run, "foo", lambda: DEFERRED) is DEFERRED
+    assert journal.run("bar", function_results.run, "bar", lambda: True)
+    assert [record["status"] for record in function_results.records] == [
+        "pending",
+        "succeeded",
+    ]
+
+    resumed, functions = resume_journal(journal.path, "layers install")
+    assert functions == ["foo"]
+
+    # The waiter records the outcome once the deferred call is made
+    resumed.record("foo", DEFERRED)
+    _, functions = resume_journal(journal.path, "layers install")
+    assert functions == ["foo"]
+    resumed.record("foo", True)
+    function_results.record("foo", True)
+    _, functions = resume_journal(journal.path, "layers install")
+    assert functions == []
+    assert function_results.records[0]["status"] == "succeeded"
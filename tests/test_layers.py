@@ -1,4 +1,7 @@
+import copy
+
 import boto3
+import botocore
 from click import UsageError
 from moto import mock_aws
 import pytest
@@ -10,11 +13,18 @@ from newrelic_lambda_cli.layers import (
     _detach_license_key_policy,
     _add_new_relic,
     _remove_new_relic,
+    apply_uninstall,
+    attach_license_key_policies,
+    clear_index_cache,
+    detach_license_key_policies,
     index,
     install,
     uninstall,
     layer_selection,
+    plan_install,
+    plan_uninstall,
 )
+from newrelic_lambda_cli.results import DEFERRED, Results
 from newrelic_lambda_cli.utils import get_arn_prefix
 
 from .conftest import layer_install, layer_uninstall
@@ -280,10 +290,10 @@ def test_install_apm(aws_credentials, mock_function_config):
     ) as mock_get_license_key_outputs:
         mock_client = mock_session.client.return_value
 
-        mock_client.get_function.reset_mock(return_value=True)
+        mock_client.get_function_configuration.reset_mock(return_value=True)
 
         config = mock_function_config("python3.12")
-        mock_client.get_function.return_value = config
+        mock_client.get_function_configuration.return_value = config["Configuration"]
 
         mock_get_license_key_outputs.return_value = ("license_arn", "12345", "policy")
 
@@ -300,9 +310,9 @@ def test_install_apm(aws_credentials, mock_function_config):
         except UsageError as e:
             print(f"UsageError: {e}")
 
-        mock_client.get_function.reset_mock()
+        mock_client.get_function_configuration.reset_mock()
         config = mock_function_config("python3.12")
-        mock_client.get_function.return_value = config
+        mock_client.get_function_configuration.return_value = config["Configuration"]
         mock_client.list_tags.return_value = {"Tags": expected_tags_after_tagging}
         assert (
             install(
@@ -311,7 +321,9 @@ def test_install_apm(aws_credentials, mock_function_config):
             is True
         )
 
-        mock_client.assert_has_calls([call.get_function(FunctionName="APMLambda")])
+        mock_client.assert_has_calls(
+            [call.get_function_configuration(FunctionName="APMLambda")]
+        )
         mock_client.assert_has_calls(
             [
                 call.update_function_configuration(
@@ -626,13 +638,13 @@ def test_install_failure(aws_credentials, mock_function_config):
     mock_session = MagicMock()
     mock_session.region_name = "us-east-1"
     mock_client = mock_session.client.return_value
-    mock_client.get_function.reset_mock(return_value=True)
+    mock_client.get_function_configuration.reset_mock(return_value=True)
     with patch(
         "newrelic_lambda_cli.layers._get_license_key_outputs"
     ) as mock_get_license_key_outputs:
         mock_get_license_key_outputs.return_value = ("license_arn", "12345", "policy")
         config = mock_function_config("python3.12")
-        mock_client.get_function.return_value = config
+        mock_client.get_function_configuration.return_value = config["Configuration"]
         with pytest.raises(UsageError):
             install(
                 layer_install(
@@ -653,10 +665,10 @@ def test_install(aws_credentials, mock_function_config):
         "newrelic_lambda_cli.layers._get_license_key_outputs"
     ) as mock_get_license_key_outputs:
         mock_client = mock_session.client.return_value
-        mock_client.get_function.reset_mock(return_value=True)
+        mock_client.get_function_configuration.reset_mock(return_value=True)
         mock_get_license_key_outputs.return_value = ("license_arn", "12345", "policy")
         config = mock_function_config("python3.12")
-        mock_client.get_function.return_value = config
+        mock_client.get_function_configuration.return_value = config["Configuration"]
         # with pytest.raises(UsageError):
         #     install(
         #         layer_install(nr_account_id=9876543, session=mock_session), "foobarbaz"
@@ -673,7 +685,7 @@ def test_install(aws_credentials, mock_function_config):
             )
 
         mock_client = mock_session.client.return_value
-        mock_client.get_function.return_value = None
+        mock_client.get_function_configuration.return_value = None
         assert (
             install(
                 layer_install(nr_account_id=12345, session=mock_session), "foobarbaz"
@@ -681,9 +693,9 @@ def test_install(aws_credentials, mock_function_config):
             is False
         )
 
-        mock_client.get_function.reset_mock(return_value=True)
+        mock_client.get_function_configuration.reset_mock(return_value=True)
         config = mock_function_config("not.a.runtime")
-        mock_client.get_function.return_value = config
+        mock_client.get_function_configuration.return_value = config["Configuration"]
         assert (
             install(
                 layer_install(nr_account_id=12345, session=mock_session), "foobarbaz"
@@ -691,9 +703,9 @@ def test_install(aws_credentials, mock_function_config):
             is False
         )
 
-        mock_client.get_function.reset_mock(return_value=True)
+        mock_client.get_function_configuration.reset_mock(return_value=True)
         config = mock_function_config("python3.12")
-        mock_client.get_function.return_value = config
+        mock_client.get_function_configuration.return_value = config["Configuration"]
         assert (
             install(
                 layer_install(nr_account_id=12345, session=mock_session), "foobarbaz"
@@ -701,7 +713,9 @@ def test_install(aws_credentials, mock_function_config):
             is True
         )
 
-        mock_client.assert_has_calls([call.get_function(FunctionName="foobarbaz")])
+        mock_client.assert_has_calls(
+            [call.get_function_configuration(FunctionName="foobarbaz")]
+        )
         mock_client.assert_has_calls(
             [
                 call.update_function_configuration(
@@ -729,17 +743,17 @@ def test_uninstall(aws_credentials, mock_function_config):
     ) as mock_get_license_key_outputs:
         mock_get_license_key_outputs.return_value = ("license_arn", "12345", "policy")
         mock_client = mock_session.client.return_value
-        mock_client.get_function.return_value = None
+        mock_client.get_function_configuration.return_value = None
         assert uninstall(layer_uninstall(session=mock_session), "foobarbaz") is False
 
-        mock_client.get_function.reset_mock(return_value=True)
+        mock_client.get_function_configuration.reset_mock(return_value=True)
         config = mock_function_config("not.a.runtime")
-        mock_client.get_function.return_value = config
+        mock_client.get_function_configuration.return_value = config["Configuration"]
         assert uninstall(layer_uninstall(session=mock_session), "foobarbaz") is True
 
-        mock_client.get_function.reset_mock(return_value=True)
+        mock_client.get_function_configuration.reset_mock(return_value=True)
         config = mock_function_config("python3.12")
-        mock_client.get_function.return_value = config
+        mock_client.get_function_configuration.return_value = config["Configuration"]
         assert uninstall(layer_uninstall(session=mock_session), "foobarbaz") is False
 
         config["Configuration"]["Handler"] = "newrelic_lambda_wrapper.handler"
@@ -757,7 +771,9 @@ def test_uninstall(aws_credentials, mock_function_config):
             mock_detach_license_key_policy.assert_called_once_with(
                 mock_session, "role_handler", "policy"
             )
-            mock_client.assert_has_calls([call.get_function(FunctionName="foobarbaz")])
+            mock_client.assert_has_calls(
+                [call.get_function_configuration(FunctionName="foobarbaz")]
+            )
             mock_client.assert_has_calls(
                 [
                     call.update_function_configuration(
@@ -788,7 +804,7 @@ def test_install_success_message_new_layer(aws_credentials, mock_function_config
 
         config = mock_function_config("python3.12")
         config["Configuration"]["Layers"] = []
-        mock_client.get_function.return_value = config
+        mock_client.get_function_configuration.return_value = config["Configuration"]
 
         new_layer_arn = (
             "arn:aws:lambda:us-east-1:451483290750:layer:NewRelicPython39:35"
@@ -1323,7 +1339,7 @@ def test_install_account_id_mismatch_requires_key(
         mock_client = mock_session.client.return_value
 
         config = mock_function_config("python3.12")
-        mock_client.get_function.return_value = config
+        mock_client.get_function_configuration.return_value = config["Configuration"]
 
         # Create a LayerInstall instance with explicitly None keys
         # Don't mock LayerInstall itself - just create an instance with the properties we need
@@ -1433,7 +1449,7 @@ def test_install_with_ingest_key_bypass_account_validation(
         mock_get_license_key_outputs.return_value = ("license_arn", "12345", "policy")
         mock_client = mock_session.client.return_value
         config = mock_function_config("python3.12")
-        mock_client.get_function.return_value = config
+        mock_client.get_function_configuration.return_value = config["Configuration"]
 
         # Make _add_new_relic return a successful result
         mock_add_new_relic.return_value = {
@@ -1499,7 +1515,7 @@ def test_install_sets_license_key_from_ingest_key(
         mock_client = mock_session.client.return_value
 
         config = mock_function_config("python3.12")
-        mock_client.get_function.return_value = config
+        mock_client.get_function_configuration.return_value = config["Configuration"]
 
         # The specific ingest key value we want to test
         test_ingest_key = "test-ingest-key-direct-pass"
@@ -1540,7 +1556,7 @@ def test_install_failure_explicit(aws_credentials, mock_function_config):
 
         mock_get_license_key_outputs.return_value = ("license_arn", "12345", "policy")
         config = mock_function_config("python3.12")
-        mock_client.get_function.return_value = config
+        mock_client.get_function_configuration.return_value = config["Configuration"]
 
         # Create a layer install with EXPLICITLY None values for both keys
         # This should guarantee the UsageError is raised for account mismatch
@@ -1586,7 +1602,7 @@ def test_install_account_id_mismatch_with_neither_key_type(
         mock_client = mock_session.client.return_value
 
         config = mock_function_config("python3.12")
-        mock_client.get_function.return_value = config
+        mock_client.get_function_configuration.return_value = config["Configuration"]
 
         # Create a basic install parameters object with mismatched account ID
         install_params = layer_install(
@@ -1625,7 +1641,7 @@ def test_install_account_mismatch_error_with_missing_keys(
         mock_client = mock_session.client.return_value
 
         config = mock_function_config("python3.12")
-        mock_client.get_function.return_value = config
+        mock_client.get_function_configuration.return_value = config["Configuration"]
 
         # Create a mock input with no key attributes
         input_obj = MagicMock()
@@ -2195,3 +2211,576 @@ def test_app_name_removed_on_uninstall(aws_credentials, mock_function_config):
     )
 
     assert "NEW_RELIC_APP_NAME" not in update_kwargs["Environment"]["Variables"]
+
+
+def _mock_layers_response(status_code=200, layers=None, headers=None):
+    response = MagicMock()
+    response.status_code = status_code
+    response.ok = status_code < 400
+    response.headers = headers or {}
+    response.json.return_value = {"Layers": layers or []}
+    return response
+
+
+def test_index_is_cached():
+    layers = [
+        {
+            "LatestMatchingVersion": {
+                "LayerVersionArn": "arn:aws:lambda:us-east-1:451483290750:layer:NewRelicPython312:1",
+                "CompatibleArchitectures": ["x86_64"],
+            }
+        },
+        {
+            "LatestMatchingVersion": {
+                "LayerVersionArn": "arn:aws:lambda:us-east-1:451483290750:layer:NewRelicPython312ARM64:1",
+                "CompatibleArchitectures": ["arm64"],
+            }
+        },
+    ]
+    with patch("newrelic_lambda_cli.layers.requests.get") as mock_get:
+        mock_get.return_value = _mock_layers_response(layers=layers)
+
+        assert index("us-east-1", "python3.12", "x86_64") == layers[:1]
+        assert index("us-east-1", "python3.12", "arm64") == layers[1:]
+        mock_get.assert_called_once()
+
+        # A new run is served from the on-disk cache
+        clear_index_cache()
+        assert index("us-east-1", "python3.12", "x86_64") == layers[:1]
+        mock_get.assert_called_once()
+
+
+def test_index_revalidates_stale_cache():
+    layers = [{"LatestMatchingVersion": {"LayerVersionArn": "layer-arn"}}]
+    with patch("newrelic_lambda_cli.layers.requests.get") as mock_get, patch(
+        "newrelic_lambda_cli.layers.LAYER_CACHE_TTL", 0
+    ):
+        mock_get.return_value = _mock_layers_response(
+            layers=layers, headers={"ETag": '"abc"'}
+        )
+        assert index("us-east-1", "python3.12", "x86_64") == layers
+
+        clear_index_cache()
+        mock_get.return_value = _mock_layers_response(status_code=304)
+        assert index("us-east-1", "python3.12", "x86_64") == layers
+        assert mock_get.call_args[1]["headers"] == {"If-None-Match": '"abc"'}
+        assert mock_get.call_count == 2
+
+
+def test_attach_license_key_policies():
+    mock_session = MagicMock()
+    with patch(
+        "newrelic_lambda_cli.layers._get_license_key_outputs"
+    ) as mock_get_license_key_outputs, patch(
+        "newrelic_lambda_cli.layers._attach_license_key_policy"
+    ) as mock_attach:
+        mock_get_license_key_outputs.return_value = ("license_arn", "12345", "policy")
+        mock_attach.return_value = True
+
+        assert (
+            attach_license_key_policies(
+                layer_install(session=mock_session),
+                ["role/Foo", "role/Bar", "role/Foo"],
+            )
+            is True
+        )
+        mock_attach.assert_has_calls(
+            [
+                call(mock_session, "role/Bar", "policy"),
+                call(mock_session, "role/Foo", "policy"),
+            ]
+        )
+        assert mock_attach.call_count == 2
+
+
+def test_detach_license_key_policies():
+    mock_session = MagicMock()
+    with patch(
+        "newrelic_lambda_cli.layers._get_license_key_outputs"
+    ) as mock_get_license_key_outputs, patch(
+        "newrelic_lambda_cli.layers._detach_license_key_policy"
+    ) as mock_detach, patch(
+        "newrelic_lambda_cli.layers.list_functions"
+    ) as mock_list_functions:
+        mock_get_license_key_outputs.return_value = ("license_arn", "12345", "policy")
+        mock_detach.return_value = True
+        mock_list_functions.return_value = [
+            {"FunctionName": "still-installed", "Role": "role/Shared"}
+        ]
+
+        assert (
+            detach_license_key_policies(
+                layer_uninstall(session=mock_session), ["role/Shared", "role/Unused"]
+            )
+            is True
+        )
+        mock_list_functions.assert_called_once_with(mock_session, "installed")
+        mock_detach.assert_called_once_with(mock_session, "role/Unused", "policy")
+
+
+def test_uninstall_collects_roles(aws_credentials, mock_function_config):
+    mock_session = MagicMock()
+    mock_session.region_name = "us-east-1"
+    mock_client = mock_session.client.return_value
+    config = mock_function_config("python3.12")
+    config["Configuration"]["Handler"] = "newrelic_lambda_wrapper.handler"
+    config["Configuration"]["Role"] = "role/Foo"
+    config["Configuration"]["Layers"] = [{"Arn": get_arn_prefix("us-east-1")}]
+    mock_client.get_function_configuration.return_value = config["Configuration"]
+
+    with patch("newrelic_lambda_cli.layers._detach_license_key_policy") as mock_detach:
+        roles = set()
+        assert (
+            uninstall(layer_uninstall(session=mock_session), "foobarbaz", roles) is True
+        )
+        assert roles == {"role/Foo"}
+        mock_detach.assert_not_called()
+
+
+@mock_aws
+def test_uninstall_uses_listed_config(aws_credentials, mock_function_config):
+    mock_session = MagicMock()
+    mock_session.region_name = "us-east-1"
+    mock_client = mock_session.client.return_value
+    config = mock_function_config("python3.12")
+    config["Configuration"]["Handler"] = "newrelic_lambda_wrapper.handler"
+    config["Configuration"]["Role"] = "role/Foo"
+    config["Configuration"]["Layers"] = [{"Arn": get_arn_prefix("us-east-1")}]
+    config["Configuration"]["RevisionId"] = "rev-1"
+
+    assert (
+        uninstall(layer_uninstall(session=mock_session), "foobarbaz", set(), config)
+        is True
+    )
+    mock_client.get_function_configuration.assert_not_called()
+    mock_client.get_function.assert_not_called()
+    assert (
+        mock_client.update_function_configuration.call_args.kwargs["RevisionId"]
+        == "rev-1"
+    )
+
+
+@mock_aws
+def test_uninstall_refetches_config_on_revision_conflict(
+    aws_credentials, mock_function_config
+):
+    mock_session = MagicMock()
+    mock_session.region_name = "us-east-1"
+    mock_client = mock_session.client.return_value
+    listed = mock_function_config("python3.12")
+    listed["Configuration"]["Handler"] = "newrelic_lambda_wrapper.handler"
+    listed["Configuration"]["Role"] = "role/Foo"
+    listed["Configuration"]["Layers"] = [{"Arn": get_arn_prefix("us-east-1")}]
+    listed["Configuration"]["RevisionId"] = "rev-1"
+    current = copy.deepcopy(listed)
+    current["Configuration"]["RevisionId"] = "rev-2"
+    mock_client.get_function_configuration.return_value = current["Configuration"]
+    mock_client.update_function_configuration.side_effect = [
+        botocore.exceptions.ClientError(
+            {"Error": {"Code": "PreconditionFailedException"}},
+            "UpdateFunctionConfiguration",
+        ),
+        {"FunctionArn": "arn"},
+    ]
+
+    assert (
+        uninstall(layer_uninstall(session=mock_session), "foobarbaz", set(), listed)
+        is True
+    )
+    mock_client.get_function_configuration.assert_called_once_with(
+        FunctionName="foobarbaz"
+    )
+    assert [
+        c.kwargs["RevisionId"]
+        for c in mock_client.update_function_configuration.call_args_list
+    ] == ["rev-1", "rev-2"]
+
+
+@mock_aws
+def test_plan_and_apply_uninstall(aws_credentials, mock_function_config):
+    mock_session = MagicMock()
+    mock_session.region_name = "us-east-1"
+    mock_client = mock_session.client.return_value
+    config = mock_function_config("python3.12")
+    config["Configuration"]["Handler"] = "newrelic_lambda_wrapper.handler"
+    config["Configuration"]["Environment"]["Variables"][
+        "NEW_RELIC_LAMBDA_HANDLER"
+    ] = "foobar.handler"
+    config["Configuration"]["Role"] = "role/Foo"
+    config["Configuration"]["Layers"] = [{"Arn": get_arn_prefix("us-east-1") + ":1"}]
+    config["Configuration"]["RevisionId"] = "rev-1"
+
+    change = plan_uninstall(layer_uninstall(session=mock_session), "foobarbaz", config)
+    mock_client.update_function_configuration.assert_not_called()
+    assert change["status"] == "update"
+    assert change["role"] == "role/Foo"
+    assert change["update"]["RevisionId"] == "rev-1"
+    assert change["changes"] == {
+        "layers": {"added": [], "removed": [get_arn_prefix("us-east-1") + ":1"]},
+        "handler": ["newrelic_lambda_wrapper.handler", "foobar.handler"],
+        "environment": {
+            "added": [],
+            "changed": [],
+            "removed": ["NEW_RELIC_LAMBDA_HANDLER"],
+        },
+    }
+
+    roles = set()
+    assert apply_uninstall(layer_uninstall(session=mock_session), change, roles)
+    mock_client.update_function_configuration.assert_called_once_with(
+        **change["update"]
+    )
+    assert roles == {"role/Foo"}
+
+    assert apply_uninstall(
+        layer_uninstall(session=mock_session),
+        {"function": "foobarbaz", "action": "uninstall", "status": "unchanged"},
+    )
+    assert not apply_uninstall(
+        layer_uninstall(session=mock_session),
+        {"function": "foobarbaz", "action": "uninstall", "status": "failed"},
+    )
+
+    mock_client.update_function_configuration.side_effect = (
+        botocore.exceptions.ClientError(
+            {"Error": {"Code": "PreconditionFailedException"}},
+            "UpdateFunctionConfiguration",
+        )
+    )
+    assert not apply_uninstall(layer_uninstall(session=mock_session), change)
+    mock_client.get_function_configuration.assert_not_called()
+
+
+@mock_aws
+def test_uninstall_skips_unchanged_function(aws_credentials, mock_function_config):
+    mock_session = MagicMock()
+    mock_session.region_name = "us-east-1"
+    mock_client = mock_session.client.return_value
+    config = mock_function_config("python3.12")
+    config["Configuration"]["Handler"] = "newrelic_lambda_wrapper.handler"
+    config["Configuration"]["Role"] = "role/Foo"
+
+    roles = set()
+    with patch("newrelic_lambda_cli.layers.success") as mock_success:
+        assert (
+            uninstall(layer_uninstall(session=mock_session), "foobarbaz", roles, config)
+            is True
+        )
+        mock_success.assert_called_once_with(
+            "No changes needed for the function: foobarbaz"
+        )
+    mock_client.update_function_configuration.assert_not_called()
+    assert roles == set()
+
+    change = plan_uninstall(layer_uninstall(session=mock_session), "foobarbaz", config)
+    assert change["status"] == "unchanged"
+    assert "update" not in change
+
+
+@mock_aws
+def test_uninstall_defers_busy_function(aws_credentials, mock_function_config):
+    mock_session = MagicMock()
+    mock_session.region_name = "us-east-1"
+    mock_client = mock_session.client.return_value
+    config = mock_function_config("python3.12")
+    config["Configuration"]["Handler"] = "newrelic_lambda_wrapper.handler"
+    config["Configuration"]["Role"] = "role/Foo"
+    config["Configuration"]["Layers"] = [{"Arn": get_arn_prefix("us-east-1") + ":1"}]
+    mock_client.get_function_configuration.return_value = {
+        "LastUpdateStatus": "Successful"
+    }
+    busy = botocore.exceptions.ClientError(
+        {"Error": {"Code": "ResourceConflictException"}},
+        "UpdateFunctionConfiguration",
+    )
+
+    mock_client.update_function_configuration.side_effect = [busy, {}]
+    waiter = MagicMock()
+    roles = set()
+    assert (
+        uninstall(
+            layer_uninstall(session=mock_session),
+            "foobarbaz",
+            roles,
+            copy.deepcopy(config),
+            waiter,
+        )
+        is DEFERRED
+    )
+    assert mock_client.update_function_configuration.call_count == 1
+    assert roles == set()
+    function_name, deferred = waiter.when_ready.call_args.args
+    assert function_name == "foobarbaz"
+    assert deferred() is True
+    assert mock_client.update_function_configuration.call_count == 2
+    assert roles == {"role/Foo"}
+
+    mock_client.update_function_configuration.reset_mock()
+    mock_client.update_function_configuration.side_effect = [busy, {}]
+    assert (
+        uninstall(
+            layer_uninstall(session=mock_session),
+            "foobarbaz",
+            set(),
+            copy.deepcopy(config),
+        )
+        is True
+    )
+    assert mock_client.update_function_configuration.call_count == 2
+    mock_client.get_function_configuration.assert_called_with(FunctionName="foobarbaz")
+
+
+@mock_aws
+def test_install_apm_tags_once_function_is_ready(aws_credentials, mock_function_config):
+    mock_session = MagicMock()
+    mock_session.region_name = "us-east-1"
+    mock_client = mock_session.client.return_value
+    config = mock_function_config("python3.12")
+    waiter = MagicMock()
+
+    with patch(
+        "newrelic_lambda_cli.layers._get_license_key_outputs"
+    ) as mock_get_license_key_outputs:
+        mock_get_license_key_outputs.return_value = ("license_arn", "12345", "policy")
+        assert (
+            install(
+                layer_install(
+                    session=mock_session,
+                    nr_account_id=12345,
+                    layer_arn=get_arn_prefix("us-east-1")
+                    + ":layer:NewRelicPython312:1",
+                    apm=True,
+                ),
+                "foobarbaz",
+                set(),
+                config,
+                waiter,
+            )
+            is DEFERRED
+        )
+
+    mock_client.update_function_configuration.assert_called_once()
+    mock_client.tag_resource.assert_not_called()
+    function_name, deferred = waiter.when_ready.call_args.args
+    assert function_name == "foobarbaz"
+    assert deferred() is True
+    mock_client.tag_resource.assert_called_once_with(
+        Resource=config["Configuration"]["FunctionArn"],
+        Tags={"NR.Apm.Lambda.Mode": "true"},
+    )
+
+
+@mock_aws
+def test_uninstall_records_results(aws_credentials, mock_function_config):
+    mock_session = MagicMock()
+    mock_session.region_name = "us-east-1"
+    mock_client = mock_session.client.return_value
+    config = mock_function_config("python3.12")
+    config["Configuration"]["Handler"] = "newrelic_lambda_wrapper.handler"
+    config["Configuration"]["Role"] = "role/Foo"
+    config["Configuration"]["Layers"] = [{"Arn": get_arn_prefix("us-east-1")}]
+    mock_client.update_function_configuration.side_effect = [
+        {"FunctionArn": "arn"},
+        botocore.exceptions.ClientError(
+            {"Error": {"Code": "AccessDeniedException"}},
+            "UpdateFunctionConfiguration",
+        ),
+    ]
+
+    function_results = Results("uninstall", "us-east-1")
+    input = layer_uninstall(session=mock_session)
+    for function in ("foo", "bar"):
+        function_results.run(
+            function, uninstall, input, function, set(), copy.deepcopy(config)
+        )
+    mock_client.get_function_configuration.side_effect = (
+        botocore.exceptions.ClientError(
+            {"ResponseMetadata": {"HTTPStatusCode": 404}}, "GetFunctionConfiguration"
+        )
+    )
+    function_results.run("qux", uninstall, input, "qux", set())
+
+    records = {record["function"]: record for record in function_results.records}
+    assert records["foo"]["status"] == "succeeded"
+    assert records["foo"]["old_layers"] == [get_arn_prefix("us-east-1")]
+    assert records["foo"]["new_layers"] == []
+    assert records["bar"]["status"] == "failed"
+    assert records["bar"]["error"] == "AccessDeniedException"
+    assert records["qux"]["status"] == "failed"
+    assert records["qux"]["error"] == "ResourceNotFoundException"
+
+
+@mock_aws
+def test_install_collects_roles_of_installed_functions(
+    aws_credentials, mock_function_config
+):
+    mock_session = MagicMock()
+    mock_session.region_name = "us-east-1"
+    mock_client = mock_session.client.return_value
+    config = mock_function_config("python3.12")
+    config["Configuration"]["Role"] = "role/Foo"
+    config["Configuration"]["Layers"] = [
+        {"Arn": get_arn_prefix("us-east-1") + ":layer:NewRelicPython312:1"}
+    ]
+
+    with patch(
+        "newrelic_lambda_cli.layers._get_license_key_outputs"
+    ) as mock_get_license_key_outputs, patch(
+        "newrelic_lambda_cli.layers._attach_license_key_policy"
+    ) as mock_attach:
+        mock_get_license_key_outputs.return_value = ("license_arn", "12345", "policy")
+        roles = set()
+        assert (
+            install(
+                layer_install(
+                    session=mock_session, nr_account_id=12345, enable_extension=True
+                ),
+                "foobarbaz",
+                roles,
+                config,
+            )
+            is True
+        )
+        mock_attach.assert_not_called()
+
+    mock_client.update_function_configuration.assert_not_called()
+    # The policy may not have been attached if an earlier run stopped before it
+    assert roles == {"role/Foo"}
+
+
+@mock_aws
+def test_uninstall_named_function_retries_on_revision_conflict(
+    aws_credentials, mock_function_config
+):
+    mock_session = MagicMock()
+    mock_session.region_name = "us-east-1"
+    mock_client = mock_session.client.return_value
+    config = mock_function_config("python3.12")
+    config["Configuration"]["Handler"] = "newrelic_lambda_wrapper.handler"
+    config["Configuration"]["Role"] = "role/Foo"
+    config["Configuration"]["Layers"] = [{"Arn": get_arn_prefix("us-east-1")}]
+    mock_client.get_function_configuration.side_effect = lambda **kwargs: copy.deepcopy(
+        config["Configuration"]
+    )
+    conflict = botocore.exceptions.ClientError(
+        {"Error": {"Code": "PreconditionFailedException"}},
+        "UpdateFunctionConfiguration",
+    )
+
+    mock_client.update_function_configuration.side_effect = [conflict, {}]
+    assert uninstall(layer_uninstall(session=mock_session), "foobarbaz", set())
+    assert mock_client.get_function_configuration.call_count == 2
+    assert mock_client.update_function_configuration.call_count == 2
+
+    # Only retried once
+    mock_client.update_function_configuration.reset_mock()
+    mock_client.update_function_configuration.side_effect = conflict
+    with patch("newrelic_lambda_cli.layers.failure") as mock_failure:
+        assert not uninstall(layer_uninstall(session=mock_session), "foobarbaz", set())
+        mock_failure.assert_called_once_with(
+            "Function 'foobarbaz' changed while it was being updated, try again"
+        )
+    assert mock_client.update_function_configuration.call_count == 2
+
+    mock_client.update_function_configuration.reset_mock()
+    with patch("newrelic_lambda_cli.layers.failure") as mock_failure:
+        assert not apply_uninstall(
+            layer_uninstall(session=mock_session, apply_plan="plan.json"),
+            plan_uninstall(layer_uninstall(session=mock_session), "foobarbaz"),
+        )
+        mock_failure.assert_called_once_with(
+            "Function 'foobarbaz' changed since the plan was made, plan again"
+        )
+    assert mock_client.update_function_configuration.call_count == 1
+
+
+@mock_aws
+def test_plan_install_is_read_only(aws_credentials, mock_function_config):
+    mock_session = MagicMock()
+    mock_session.region_name = "us-east-1"
+    mock_client = mock_session.client.return_value
+    config = mock_function_config("python3.12")
+    layer_arns = [
+        get_arn_prefix("us-east-1") + ":layer:NewRelicPython312:1",
+        get_arn_prefix("us-east-1") + ":layer:NewRelicLambdaExtension:1",
+    ]
+
+    with patch(
+        "newrelic_lambda_cli.layers._get_license_key_outputs"
+    ) as mock_get_license_key_outputs, patch(
+        "newrelic_lambda_cli.layers.index"
+    ) as mock_index, patch(
+        "newrelic_lambda_cli.layers.sys.stdout.isatty", return_value=True
+    ), patch(
+        "newrelic_lambda_cli.layers.click.prompt"
+    ) as mock_prompt, patch(
+        "newrelic_lambda_cli.layers.success"
+    ) as mock_success:
+        mock_get_license_key_outputs.return_value = ("license_arn", "12345", "policy")
+        mock_index.return_value = [
+            {"LatestMatchingVersion": {"LayerVersionArn": arn}} for arn in layer_arns
+        ]
+        change = plan_install(
+            layer_install(
+                session=mock_session,
+                nr_account_id=12345,
+                enable_extension=True,
+                send_function_logs=True,
+                app_name="foo",
+                plan=True,
+            ),
+            "foobarbaz",
+            config,
+        )
+        mock_prompt.assert_not_called()
+        assert not any("Successfully" in c.args[0] for c in mock_success.call_args_list)
+
+    mock_client.update_function_configuration.assert_not_called()
+    assert change["status"] == "update"
+    assert change["layer_arn"] == layer_arns[0]
+    assert change["update"]["Layers"][0] == layer_arns[0]
+
+
+@mock_aws
+def test_install_rerun_finishes_follow_up_writes(aws_credentials, mock_function_config):
+    mock_session = MagicMock()
+    mock_session.region_name = "us-east-1"
+    mock_client = mock_session.client.return_value
+    config = mock_function_config("python3.12")
+    config["Configuration"]["LoggingConfig"] = {"LogGroup": "/custom/foobarbaz"}
+    input = layer_install(
+        session=mock_session,
+        nr_account_id=12345,
+        layer_arn=get_arn_prefix("us-east-1") + ":layer:NewRelicPython312:1",
+        enable_extension=True,
+        enable_extension_function_logs=True,
+        apm=True,
+    )
+
+    with patch(
+        "newrelic_lambda_cli.layers._get_license_key_outputs"
+    ) as mock_get_license_key_outputs, patch(
+        "newrelic_lambda_cli.layers.subscriptions.remove_log_subscription"
+    ) as mock_remove_log_subscription:
+        mock_get_license_key_outputs.return_value = ("license_arn", "12345", "policy")
+        mock_remove_log_subscription.return_value = True
+
+        # An earlier run updated the function, then stopped before removing its log
+        # subscription and tagging it
+        update = plan_install(input, "foobarbaz", copy.deepcopy(config))["update"]
+        config["Configuration"]["Layers"] = [{"Arn": arn} for arn in update["Layers"]]
+        config["Configuration"]["Handler"] = update["Handler"]
+        config["Configuration"]["Environment"] = update["Environment"]
+
+        change = plan_install(input, "foobarbaz", copy.deepcopy(config))
+        assert change["status"] == "unchanged"
+        roles = set()
+        assert install(input, "foobarbaz", roles, config) is True
+
+        mock_remove_log_subscription.assert_called_once_with(
+            input, "foobarbaz", "/custom/foobarbaz"
+        )
+    mock_client.update_function_configuration.assert_not_called()
+    mock_client.tag_resource.assert_called_once_with(
+        Resource="foobarbaz", Tags={"NR.Apm.Lambda.Mode": "true"}
+    )
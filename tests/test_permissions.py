@@ -10,6 +10,8 @@ from newrelic_lambda_cli.permissions import (
     ensure_layer_uninstall_permissions,
     ensure_function_list_permissions,
     ensure_subscription_install_permissions,
+    ensure_subscription_migrate_permissions,
+    ensure_subscription_status_permissions,
     ensure_subscription_uninstall_permissions,
 )
 
@@ -19,6 +21,8 @@ from .conftest import (
     layer_install,
     layer_uninstall,
     subscription_install,
+    subscription_migrate,
+    subscription_status,
     subscription_uninstall,
 )
 
@@ -226,3 +230,50 @@ def test_ensure_subscription_uninstall_permissions():
             ),
         ],
     )
+
+
+def test_ensure_subscription_account_policy_permissions():
+    mock_session = MagicMock()
+    mock_session.client.return_value.simulate_principal_policy.return_value = {
+        "EvaluationResults": [
+            {"EvalActionName": "logs:PutAccountPolicy", "EvalDecision": "denied"},
+        ]
+    }
+
+    with raises(UsageError, match="logs:PutAccountPolicy"):
+        ensure_subscription_install_permissions(
+            subscription_install(session=mock_session, account_policy=True)
+        )
+    assert sorted(
+        mock_session.client.return_value.simulate_principal_policy.call_args.kwargs[
+            "ActionNames"
+        ]
+    ) == [
+        "lambda:GetFunction",
+        "lambda:GetFunctionConfiguration",
+        "logs:PutAccountPolicy",
+    ]
+
+    with raises(UsageError):
+        ensure_subscription_status_permissions(
+            subscription_status(session=mock_session)
+        )
+    assert sorted(
+        mock_session.client.return_value.simulate_principal_policy.call_args.kwargs[
+            "ActionNames"
+        ]
+    ) == ["logs:DescribeAccountPolicies"]
+
+
+def test_ensure_subscription_migrate_permissions():
+    mock_session = MagicMock()
+    mock_session.client.return_value.simulate_principal_policy.return_value = {
+        "EvaluationResults": [
+            {"EvalActionName": "logs:PutSubscriptionFilter", "EvalDecision": "denied"},
+        ]
+    }
+
+    with raises(UsageError, match="logs:PutSubscriptionFilter"):
+        ensure_subscription_migrate_permissions(
+            subscription_migrate(session=mock_session)
+        )
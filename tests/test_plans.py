@@ -0,0 +1,141 @@
+import json
+import os
+
+import pytest
+from click import UsageError
+
+from newrelic_lambda_cli.plans import (
+    changes_configuration,
+    diff_configuration,
+    format_plan,
+    load_plan,
+    save_plan,
+)
+
+
+def _configuration():
+    return {
+        "Layers": [{"Arn": "arn:aws:lambda:us-east-1:123:layer:Other:1"}],
+        "Handler": "app.handler",
+        "Environment": {"Variables": {"KEEP": "1", "CHANGE": "old", "DROP": "x"}},
+    }
+
+
+def test_diff_configuration():
+    diff = diff_configuration(
+        _configuration(),
+        {
+            "FunctionName": "foobar",
+            "Layers": [
+                "arn:aws:lambda:us-east-1:451483290750:layer:NewRelicPython312:40",
+                "arn:aws:lambda:us-east-1:123:layer:Other:1",
+            ],
+            "Handler": "newrelic_lambda_wrapper.handler",
+            "Environment": {
+                "Variables": {"KEEP": "1", "CHANGE": "new", "NEW_RELIC_ACCOUNT_ID": "1"}
+            },
+        },
+    )
+    assert diff == {
+        "layers": {
+            "added": [
+                "arn:aws:lambda:us-east-1:451483290750:layer:NewRelicPython312:40"
+            ],
+            "removed": [],
+        },
+        "handler": ["app.handler", "newrelic_lambda_wrapper.handler"],
+        "environment": {
+            "added": ["NEW_RELIC_ACCOUNT_ID"],
+            "changed": ["CHANGE"],
+            "removed": ["DROP"],
+        },
+    }
+
+    diff = diff_configuration(_configuration(), {"FunctionName": "foobar"})
+    assert diff["handler"] is None
+    assert diff["layers"] == {"added": [], "removed": []}
+    assert diff["environment"] == {"added": [], "changed": [], "removed": []}
+
+
+def test_changes_configuration():
+    configuration = _configuration()
+    update_kwargs = {
+        "FunctionName": "foobar",
+        "RevisionId": "rev-1",
+        "Layers": ["arn:aws:lambda:us-east-1:123:layer:Other:1"],
+        "Handler": "app.handler",
+        "Environment": {"Variables": {"KEEP": "1", "CHANGE": "old", "DROP": "x"}},
+    }
+    assert changes_configuration(configuration, update_kwargs) is False
+
+    update_kwargs["Environment"]["Variables"]["CHANGE"] = "new"
+    assert changes_configuration(configuration, update_kwargs) is True
+
+    assert (
+        changes_configuration(
+            {"Handler": "app.handler"},
+            {"FunctionName": "foobar", "Layers": [], "Environment": {"Variables": {}}},
+        )
+        is False
+    )
+    assert (
+        changes_configuration(
+            {"Layers": [{"Arn": "a"}, {"Arn": "b"}]},
+            {"FunctionName": "foobar", "Layers": ["b", "a"]},
+        )
+        is True
+    )
+
+
+def test_format_plan():
+    changes = [
+        {
+            "function": "foobar",
+            "status": "update",
+            "changes": {
+                "layers": {"added": ["new-layer"], "removed": ["old-layer"]},
+                "handler": ["app.handler", "newrelic_lambda_wrapper.handler"],
+                "environment": {
+                    "added": ["NEW_RELIC_LICENSE_KEY"],
+                    "changed": [],
+                    "removed": ["DROP"],
+                },
+            },
+        },
+        {"function": "barbaz", "status": "unchanged"},
+        {"function": "bazfoo", "status": "failed"},
+    ]
+    output = format_plan(changes)
+    assert "~ foobar" in output
+    assert "layer    + new-layer" in output
+    assert "layer    - old-layer" in output
+    assert "handler  app.handler -> newrelic_lambda_wrapper.handler" in output
+    assert "env      + NEW_RELIC_LICENSE_KEY" in output
+    assert "env      - DROP" in output
+    assert "barbaz (unchanged)" in output
+    assert "bazfoo (failed)" in output
+    assert output.endswith("Plan: 1 to update, 1 unchanged, 1 failed")
+
+
+def test_save_and_load_plan(tmp_path):
+    path = str(tmp_path / "plan.json")
+    changes = [{"function": "foobar", "status": "unchanged"}]
+    save_plan(path, "install", "us-east-1", changes)
+
+    assert os.stat(path).st_mode & 0o777 == 0o600
+    assert load_plan(path, "install", "us-east-1") == changes
+
+    with pytest.raises(UsageError):
+        load_plan(path, "uninstall", "us-east-1")
+    with pytest.raises(UsageError):
+        load_plan(path, "install", "eu-west-1")
+
+    with open(path, "w") as f:
+        json.dump({"version": 0}, f)
+    with pytest.raises(UsageError):
+        load_plan(path, "install", "us-east-1")
+
+    with open(path, "w") as f:
+        f.write("not json")
+    with pytest.raises(UsageError):
+        load_plan(path, "install", "us-east-1")
@@ -0,0 +1,114 @@
+import json
+import threading
+
+import botocore
+import pytest
+
+from newrelic_lambda_cli import results
+from newrelic_lambda_cli.results import (
+    collect,
+    count_api_call,
+    format_json,
+    format_table,
+    Results,
+)
+
+
+def _client_error(code):
+    return botocore.exceptions.ClientError(
+        {"Error": {"Code": code, "Message": "Oops"}}, "UpdateFunctionConfiguration"
+    )
+
+
+def test_results():
+    function_results = Results("install", "us-east-1")
+
+    def _install(function):
+        count_api_call()
+        count_api_call()
+        results.annotate(old_layers=["old"], new_layers=["new"], action="upgrade")
+        return True
+
+    def _fail(function):
+        count_api_call()
+        results.record_error(_client_error("AccessDeniedException"))
+        return False
+
+    assert function_results.run("foo", _install, "foo") is True
+    assert function_results.run("bar", _fail, "bar") is False
+    with pytest.raises(RuntimeError):
+        function_results.run("baz", _raise)
+
+    # Calls made outside of a run are not attributed to any function
+    count_api_call()
+    results.annotate(error="Nope")
+
+    records = {record["function"]: record for record in function_results.records}
+    assert records["foo"]["status"] == "succeeded"
+    assert records["foo"]["action"] == "upgrade"
+    assert records["foo"]["old_layers"] == ["old"]
+    assert records["foo"]["new_layers"] == ["new"]
+    assert records["foo"]["api_calls"] == 2
+    assert records["foo"]["region"] == "us-east-1"
+    assert records["bar"]["status"] == "failed"
+    assert records["bar"]["error"] == "AccessDeniedException"
+    assert records["bar"]["api_calls"] == 1
+    assert records["baz"]["status"] == "failed"
+    assert records["baz"]["error"] == "RuntimeError"
+    assert all(record["duration"] >= 0 for record in records.values())
+
+
+def _raise():
+    raise RuntimeError("expired token")
+
+
+def test_bind():
+    function_results = Results("install")
+    deferred = []
+
+    def _install():
+        deferred.append(results.bind(_tag))
+        return True
+
+    def _tag():
+        count_api_call()
+        results.record_error("UpdateTimeout")
+        return False
+
+    function_results.run("foo", _install)
+    assert function_results.records[0]["status"] == "succeeded"
+
+    # The deferred call runs on another thread but updates the same record
+    thread = threading.Thread(target=deferred[0])
+    thread.start()
+    thread.join()
+    record = function_results.records[0]
+    assert record["status"] == "failed"
+    assert record["error"] == "UpdateTimeout"
+    assert record["api_calls"] == 1
+
+    function_results.record("foo", True)
+    assert function_results.records[0]["status"] == "succeeded"
+    assert results.bind(_tag) is _tag
+
+
+def test_reports():
+    function_results = Results("uninstall", "us-east-1", "111122223333")
+    function_results.run("foo", lambda: True)
+    function_results.run("bar", lambda: False)
+    records = collect(
+        [{"records": function_results.records}, RuntimeError("AccessDenied")]
+    )
+    assert len(records) == 2
+
+    table = format_table(records)
+    assert table.startswith(
+        "Processed 2 functions: 1 succeeded, 1 failed, 0 AWS API calls"
+    )
+    assert "Failed functions:" in table
+    assert "Slowest functions:" in table
+
+    report = json.loads(format_json(records))
+    assert report["summary"]["failed"] == 1
+    assert [record["function"] for record in report["results"]] == ["foo", "bar"]
+    assert report["results"][0]["account"] == "111122223333"
@@ -0,0 +1,87 @@
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock, patch
+
+from moto import mock_aws
+
+from newrelic_lambda_cli.sessions import ClientPool, get_client_pool
+
+
+def test_client_pool_reuses_clients():
+    mock_session = MagicMock()
+    mock_session.client.side_effect = lambda service, config=None: MagicMock()
+    pool = ClientPool(mock_session, max_pool_connections=16)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        clients = list(executor.map(lambda _: pool.client("lambda"), range(50)))
+
+    assert all(client is clients[0] for client in clients)
+    assert pool.client("iam") is not clients[0]
+    assert mock_session.client.call_count == 2
+    config = mock_session.client.call_args_list[0][1]["config"]
+    assert config.max_pool_connections == 16
+
+
+def test_client_pool_resize():
+    mock_session = MagicMock()
+    mock_session.client.side_effect = lambda service, config=None: MagicMock()
+    pool = ClientPool(mock_session, max_pool_connections=4)
+
+    client = pool.client("lambda")
+    pool.resize(2)
+    assert pool.client("lambda") is client
+
+    pool.resize(8)
+    assert pool.max_pool_connections == 8
+    assert pool.client("lambda") is not client
+
+
+def test_client_pool_delegates_to_session():
+    mock_session = MagicMock()
+    mock_session.region_name = "us-east-1"
+    mock_session.profile_name = "default"
+    pool = ClientPool(mock_session)
+
+    assert pool.region_name == "us-east-1"
+    assert pool.profile_name == "default"
+    assert pool.get_available_regions is mock_session.get_available_regions
+
+
+@mock_aws
+def test_get_client_pool(aws_credentials):
+    with patch("newrelic_lambda_cli.sessions.boto3.Session") as mock_session:
+        pool = get_client_pool(None, "us-east-1", max_pool_connections=4)
+        assert get_client_pool(None, "us-east-1") is pool
+        assert get_client_pool(None, "us-east-1", max_pool_connections=10) is pool
+        assert pool.max_pool_connections == 10
+        assert get_client_pool(None, "us-west-2") is not pool
+        assert mock_session.call_count == 2
+
+
+def test_client_pool_register_event_handler():
+    mock_session = MagicMock()
+    mock_session.client.side_effect = lambda service, config=None: MagicMock()
+    pool = ClientPool(mock_session)
+    handler = MagicMock()
+
+    existing = pool.client("lambda")
+    pool.register_event_handler("needs-retry", handler)
+    created = pool.client("logs")
+
+    existing.meta.events.register.assert_called_once_with("needs-retry", handler)
+    created.meta.events.register.assert_called_once_with("needs-retry", handler)
+
+
+@mock_aws
+def test_get_client_pool_assumes_role(aws_credentials):
+    role_arn = "arn:aws:iam::111122223333:role/NewRelicLambdaDeployer"
+    pool = get_client_pool(region_name="us-east-1", role_arn=role_arn)
+    assert pool.role_arn == role_arn
+    assert pool.region_name == "us-east-1"
+    assert get_client_pool(region_name="us-east-1") is not pool
+
+    identity = pool.client("sts").get_caller_identity()
+    assert identity["Account"] == "111122223333"
+
+    # The assumed role credentials are shared by every region
+    other = get_client_pool(region_name="eu-west-1", role_arn=role_arn)
+    assert other.get_credentials() is pool.get_credentials()
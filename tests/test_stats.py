@@ -0,0 +1,92 @@
+import time
+
+import pytest
+
+from newrelic_lambda_cli import stats
+from newrelic_lambda_cli.stats import _percentile, format_stats, Stats
+
+
+@pytest.fixture
+def collecting():
+    yield stats.start()
+    stats.stop()
+
+
+def test_percentile():
+    latencies = [float(latency) for latency in range(1, 101)]
+    assert _percentile(latencies, 50) == 50.0
+    assert _percentile(latencies, 90) == 90.0
+    assert _percentile(latencies, 99) == 99.0
+    assert _percentile([1.0], 99) == 1.0
+    assert _percentile([], 50) == 0.0
+
+
+def test_summary():
+    collected = Stats()
+    for latency in (0.1, 0.2, 0.3):
+        collected.add("lambda:GetFunction", latency)
+    collected.add("logs:PutSubscriptionFilter", 1.0, retries=2, error=True)
+    collected.throttle("logs:PutSubscriptionFilter")
+
+    logs, get_function = collected.summary()
+    assert logs["operation"] == "logs:PutSubscriptionFilter"
+    assert (logs["calls"], logs["retries"], logs["throttles"], logs["errors"]) == (
+        1,
+        2,
+        1,
+        1,
+    )
+    assert get_function["calls"] == 3
+    assert get_function["p50"] == 0.2
+    assert get_function["max"] == 0.3
+
+    table = format_stats(collected)
+    assert "logs:PutSubscriptionFilter" in table
+    assert "Throttles" in table
+
+
+def test_handlers(collecting):
+    context = {}
+    stats.on_before_call(context=context)
+    stats.on_needs_retry(
+        event_name="needs-retry.cloudwatch-logs.PutSubscriptionFilter",
+        response=(None, {"Error": {"Code": "ThrottlingException"}}),
+    )
+    stats.on_after_call(
+        event_name="after-call.cloudwatch-logs.PutSubscriptionFilter",
+        parsed={"ResponseMetadata": {"RetryAttempts": 1}},
+        context=context,
+    )
+
+    context = {}
+    stats.on_before_call(context=context)
+    stats.on_after_call_error(
+        event_name="after-call-error.lambda.GetFunction", context=context
+    )
+
+    rows = {row["operation"]: row for row in collecting.summary()}
+    assert rows["logs:PutSubscriptionFilter"]["calls"] == 1
+    assert rows["logs:PutSubscriptionFilter"]["retries"] == 1
+    assert rows["logs:PutSubscriptionFilter"]["throttles"] == 1
+    assert rows["lambda:GetFunction"]["errors"] == 1
+
+
+def test_handlers_not_collecting():
+    context = {}
+    stats.on_before_call(context=context)
+    assert context == {}
+    stats.on_after_call(event_name="after-call.lambda.GetFunction", context=context)
+    assert stats.stop() is None
+
+
+def test_timed(collecting):
+    with stats.timed("newrelic:NerdGraph"):
+        time.sleep(0.01)
+    with pytest.raises(RuntimeError):
+        with stats.timed("newrelic:NerdGraph"):
+            raise RuntimeError()
+
+    (row,) = collecting.summary()
+    assert row["calls"] == 2
+    assert row["errors"] == 1
+    assert row["max"] >= 0.01
@@ -1,7 +1,21 @@
+import json
 from unittest.mock import MagicMock, patch
 
+import boto3
+import botocore
+import click
+import pytest
+from moto import mock_aws
+
 from newrelic_lambda_cli.subscriptions import (
     _get_log_group_name,
+    get_log_group_name,
+    get_account_policies,
+    install_account_policy,
+    list_log_groups,
+    migrate_log_subscription,
+    restore_log_subscription,
+    remove_account_policy,
     create_log_subscription,
     create_otel_log_subscription,
     remove_log_subscription,
@@ -10,7 +24,11 @@ from newrelic_lambda_cli.subscriptions import (
     _remove_subscription_filter,
 )
 
-from .conftest import subscription_install, subscription_uninstall
+from .conftest import (
+    subscription_install,
+    subscription_migrate,
+    subscription_uninstall,
+)
 
 
 def test__get_log_group_name():
@@ -20,6 +38,32 @@ def test__get_log_group_name():
     )
 
 
+def test_get_log_group_name():
+    mock_session = MagicMock()
+    assert (
+        get_log_group_name(
+            mock_session,
+            "FooBar",
+            {"Configuration": {"LoggingConfig": {"LogGroup": "/shared/logs"}}},
+        )
+        == "/shared/logs"
+    )
+    assert (
+        get_log_group_name(mock_session, "FooBar", {"Configuration": {}})
+        == "/aws/lambda/FooBar"
+    )
+    mock_session.client.assert_not_called()
+
+    mock_session.client.return_value.get_function_configuration.return_value = {
+        "FunctionName": "FooBar",
+        "LoggingConfig": {"LogFormat": "JSON", "LogGroup": "/shared/logs"},
+    }
+    assert get_log_group_name(mock_session, "FooBar") == "/shared/logs"
+    mock_session.client.return_value.get_function_configuration.assert_called_once_with(
+        FunctionName="FooBar"
+    )
+
+
 @patch("newrelic_lambda_cli.subscriptions._create_subscription_filter", autospec=True)
 @patch("newrelic_lambda_cli.subscriptions._get_subscription_filters", autospec=True)
 @patch("newrelic_lambda_cli.subscriptions._remove_subscription_filter", autospec=True)
@@ -60,16 +104,16 @@ def test_create_log_subscription(
     mock_get_subscription_filters.assert_not_called()
 
     assert create_log_subscription(subscription_install(), "FooBarBaz") is False
-    mock_get_subscription_filters.assert_called_once_with(None, "FooBarBaz")
+    mock_get_subscription_filters.assert_called_once_with(None, "/aws/lambda/FooBarBaz")
 
     assert create_log_subscription(subscription_install(), "FooBarBaz") is True
     mock_create_subscription_filter.assert_called_once_with(
-        None, "FooBarBaz", "FooBarBaz", None
+        None, "/aws/lambda/FooBarBaz", "FooBarBaz", None
     )
 
     assert create_log_subscription(subscription_install(), "FooBarBaz") is True
     mock_remove_subscription_filter.assert_called_once_with(
-        None, "FooBarBaz", "NewRelicLogStreaming"
+        None, "/aws/lambda/FooBarBaz", "NewRelicLogStreaming"
     )
 
 
@@ -127,16 +171,16 @@ def test_create_otel_log_subscription(
     mock_get_subscription_filters.assert_not_called()
 
     assert create_otel_log_subscription(subscription_install(), "FooBarBaz") is False
-    mock_get_subscription_filters.assert_called_once_with(None, "FooBarBaz")
+    mock_get_subscription_filters.assert_called_once_with(None, "/aws/lambda/FooBarBaz")
 
     assert create_otel_log_subscription(subscription_install(), "FooBarBaz") is True
     mock_create_subscription_filter.assert_called_once_with(
-        None, "FooBarBaz", "FooBarBaz", None, "NewRelicOtelLogStreaming"
+        None, "/aws/lambda/FooBarBaz", "FooBarBaz", None, "NewRelicOtelLogStreaming"
     )
 
     assert create_otel_log_subscription(subscription_install(), "FooBarBaz") is True
     mock_remove_subscription_filter.assert_called_once_with(
-        None, "FooBarBaz", "NewRelicOtelLogStreaming"
+        None, "/aws/lambda/FooBarBaz", "NewRelicOtelLogStreaming"
     )
 
 
@@ -152,12 +196,12 @@ def test_remove_log_subscription(
     mock_remove_subscription_filter.return_value = True
 
     assert remove_log_subscription(subscription_uninstall(), "FooBarBaz") is True
-    mock_get_subscription_filters.assert_called_once_with(None, "FooBarBaz")
+    mock_get_subscription_filters.assert_called_once_with(None, "/aws/lambda/FooBarBaz")
     mock_remove_subscription_filter.assert_not_called()
 
     assert remove_log_subscription(subscription_uninstall(), "FooBarBaz") is True
     mock_remove_subscription_filter.assert_called_once_with(
-        None, "FooBarBaz", "NewRelicLogStreaming"
+        None, "/aws/lambda/FooBarBaz", "NewRelicLogStreaming"
     )
 
 
@@ -173,12 +217,12 @@ def test_remove_otel_log_subscription(
     mock_remove_subscription_filter.return_value = True
 
     assert remove_otel_log_subscription(subscription_uninstall(), "FooBarBaz") is True
-    mock_get_subscription_filters.assert_called_once_with(None, "FooBarBaz")
+    mock_get_subscription_filters.assert_called_once_with(None, "/aws/lambda/FooBarBaz")
     mock_remove_subscription_filter.assert_not_called()
 
     assert remove_otel_log_subscription(subscription_uninstall(), "FooBarBaz") is True
     mock_remove_subscription_filter.assert_called_once_with(
-        None, "FooBarBaz", "NewRelicOtelLogStreaming"
+        None, "/aws/lambda/FooBarBaz", "NewRelicOtelLogStreaming"
     )
 
 
@@ -198,3 +242,336 @@ def test__remove_subscription_filter(aws_credentials):
         _remove_subscription_filter(mock_session, "foobar", "NewRelicLogIngestion")
         is True
     )
+
+
+@patch("newrelic_lambda_cli.subscriptions._create_subscription_filter", autospec=True)
+@patch("newrelic_lambda_cli.subscriptions._get_subscription_filters", autospec=True)
+@patch("newrelic_lambda_cli.subscriptions.get_newrelic_log_ingestion_function")
+@patch("newrelic_lambda_cli.subscriptions.get_function", autospec=True)
+def test_create_log_subscription_with_destination(
+    mock_get_function,
+    mock_get_newrelic_log_ingestion_function,
+    mock_get_subscription_filters,
+    mock_create_subscription_filter,
+):
+    mock_get_subscription_filters.return_value = []
+    mock_create_subscription_filter.return_value = True
+
+    input = subscription_install(destination_arn="FooBarBaz", filter_pattern="")
+    assert create_log_subscription(input, "FooBar") is True
+    mock_create_subscription_filter.assert_called_once_with(
+        None, "/aws/lambda/FooBar", "FooBarBaz", ""
+    )
+    mock_get_function.assert_not_called()
+    mock_get_newrelic_log_ingestion_function.assert_not_called()
+
+
+def test_install_account_policy():
+    mock_session = MagicMock()
+    mock_session.client.return_value.get_function_configuration.side_effect = (
+        lambda FunctionName: {
+            "FunctionName": FunctionName,
+            "LoggingConfig": {
+                "LogGroup": ("/shared/FooBar" if FunctionName == "FooBar" else None)
+            },
+        }
+    )
+    input = subscription_install(
+        session=mock_session,
+        destination_arn="arn:aws:lambda:us-east-1:123456789012:function:Ingest",
+        excludes=("FooBar",),
+        filter_pattern="REPORT",
+        otel=False,
+    )
+    assert install_account_policy(input) is True
+    mock_session.client.return_value.put_account_policy.assert_called_once_with(
+        policyName="NewRelicLogStreaming",
+        policyDocument=json.dumps(
+            {
+                "DestinationArn": (
+                    "arn:aws:lambda:us-east-1:123456789012:function:Ingest"
+                ),
+                "FilterPattern": "REPORT",
+            }
+        ),
+        policyType="SUBSCRIPTION_FILTER_POLICY",
+        scope="ALL",
+        selectionCriteria='LogGroupName NOT IN ["/aws/lambda/Ingest", '
+        '"/shared/FooBar"]',
+    )
+
+    mock_session.client.return_value.put_account_policy.side_effect = (
+        botocore.exceptions.ClientError(
+            {"Error": {"Code": "LimitExceededException"}}, "PutAccountPolicy"
+        )
+    )
+    assert install_account_policy(input) is False
+
+    input = input._replace(excludes=["function-%d" % i for i in range(50)])
+    with pytest.raises(click.UsageError):
+        install_account_policy(input)
+
+
+@patch("newrelic_lambda_cli.subscriptions.get_otel_log_ingestion_arn")
+def test_install_account_policy_otel(mock_get_otel_log_ingestion_arn):
+    mock_session = MagicMock()
+    mock_session.client.return_value.get_function_configuration.return_value = {}
+    mock_get_otel_log_ingestion_arn.return_value = None
+    input = subscription_install(session=mock_session, excludes=(), otel=True)
+    assert install_account_policy(input) is False
+    mock_session.client.return_value.put_account_policy.assert_not_called()
+
+    mock_get_otel_log_ingestion_arn.return_value = (
+        "arn:aws:lambda:us-east-1:123456789012:function:OtelIngest"
+    )
+    assert install_account_policy(input) is True
+    mock_session.client.return_value.put_account_policy.assert_called_once()
+    assert (
+        mock_session.client.return_value.put_account_policy.call_args.kwargs[
+            "policyName"
+        ]
+        == "NewRelicOtelLogStreaming"
+    )
+
+
+def test_remove_account_policy():
+    mock_session = MagicMock()
+    input = subscription_uninstall(session=mock_session, otel=False)
+    assert remove_account_policy(input) is True
+    mock_session.client.return_value.delete_account_policy.assert_called_once_with(
+        policyName="NewRelicLogStreaming", policyType="SUBSCRIPTION_FILTER_POLICY"
+    )
+
+    mock_session.client.return_value.delete_account_policy.side_effect = (
+        botocore.exceptions.ClientError(
+            {"Error": {"Code": "ResourceNotFoundException"}}, "DeleteAccountPolicy"
+        )
+    )
+    assert remove_account_policy(input) is True
+
+    mock_session.client.return_value.delete_account_policy.side_effect = (
+        botocore.exceptions.ClientError(
+            {"Error": {"Code": "AccessDeniedException"}}, "DeleteAccountPolicy"
+        )
+    )
+    assert remove_account_policy(input) is False
+
+
+def test_get_account_policies():
+    mock_session = MagicMock()
+    mock_session.client.return_value.describe_account_policies.return_value = {
+        "accountPolicies": [
+            {
+                "policyName": "NewRelicLogStreaming",
+                "policyDocument": json.dumps(
+                    {"DestinationArn": "FooBar", "FilterPattern": "REPORT"}
+                ),
+                "selectionCriteria": 'LogGroupName NOT IN ["/aws/lambda/FooBar"]',
+                "lastUpdatedTime": 1700000000000,
+            },
+            {"policyName": "SomeoneElses", "policyDocument": "{}"},
+        ]
+    }
+    assert get_account_policies(mock_session) == [
+        {
+            "name": "NewRelicLogStreaming",
+            "destination_arn": "FooBar",
+            "filter_pattern": "REPORT",
+            "selection_criteria": 'LogGroupName NOT IN ["/aws/lambda/FooBar"]',
+            "last_updated": 1700000000000,
+        }
+    ]
+
+
+@mock_aws
+def test_list_log_groups(aws_credentials):
+    session = boto3.Session(region_name="us-east-1")
+    logs = session.client("logs")
+    for i in range(60):
+        logs.create_log_group(logGroupName="/aws/lambda/function-%d" % i)
+    logs.create_log_group(logGroupName="/custom/logs")
+
+    log_groups = list_log_groups(session)
+    assert len(log_groups) == 60
+    assert "/aws/lambda/function-59" in log_groups
+    assert "/custom/logs" not in log_groups
+
+
+def _filter(name, pattern="", destination="FooBar"):
+    return {"filterName": name, "filterPattern": pattern, "destinationArn": destination}
+
+
+@patch("newrelic_lambda_cli.subscriptions._create_subscription_filter", autospec=True)
+@patch("newrelic_lambda_cli.subscriptions._get_subscription_filters", autospec=True)
+@patch("newrelic_lambda_cli.subscriptions._remove_subscription_filter", autospec=True)
+def test_migrate_log_subscription(
+    mock_remove_subscription_filter,
+    mock_get_subscription_filters,
+    mock_create_subscription_filter,
+):
+    input = subscription_migrate(destination_arn="Otel", filter_pattern="")
+    classic = _filter("NewRelicLogStreaming", "REPORT")
+    mock_create_subscription_filter.return_value = True
+    mock_remove_subscription_filter.return_value = True
+    save = MagicMock()
+
+    mock_get_subscription_filters.return_value = [classic]
+    assert migrate_log_subscription(input, "FooBarBaz", save=save) is True
+    save.assert_called_once_with(
+        "FooBarBaz", log_group_name="/aws/lambda/FooBarBaz", subscription_filter=classic
+    )
+    mock_get_subscription_filters.assert_called_once_with(None, "/aws/lambda/FooBarBaz")
+    # The otel filter is added before the classic one is removed
+    assert mock_create_subscription_filter.call_args_list[0].args == (
+        None,
+        "/aws/lambda/FooBarBaz",
+        "Otel",
+        "",
+        "NewRelicOtelLogStreaming",
+    )
+    mock_remove_subscription_filter.assert_called_once_with(
+        None, "/aws/lambda/FooBarBaz", "NewRelicLogStreaming"
+    )
+
+    save.reset_mock()
+    mock_create_subscription_filter.reset_mock()
+    mock_remove_subscription_filter.reset_mock()
+    mock_get_subscription_filters.return_value = [_filter("NewRelicOtelLogStreaming")]
+    assert migrate_log_subscription(input, "FooBarBaz", save=save) is True
+    save.assert_not_called()
+    mock_create_subscription_filter.assert_not_called()
+    mock_remove_subscription_filter.assert_not_called()
+
+    mock_get_subscription_filters.return_value = None
+    assert migrate_log_subscription(input, "FooBarBaz", save=save) is False
+
+
+@patch("newrelic_lambda_cli.subscriptions._create_subscription_filter", autospec=True)
+@patch("newrelic_lambda_cli.subscriptions._get_subscription_filters", autospec=True)
+@patch("newrelic_lambda_cli.subscriptions._remove_subscription_filter", autospec=True)
+def test_migrate_log_subscription_full_log_group(
+    mock_remove_subscription_filter,
+    mock_get_subscription_filters,
+    mock_create_subscription_filter,
+):
+    input = subscription_migrate(destination_arn="Otel", filter_pattern="")
+    classic = _filter("NewRelicLogStreaming", "REPORT")
+    mock_get_subscription_filters.return_value = [_filter("Other"), classic]
+    mock_remove_subscription_filter.return_value = True
+
+    # The classic filter is removed first, and restored if the otel one fails
+    mock_create_subscription_filter.side_effect = (False, True)
+    assert migrate_log_subscription(input, "FooBarBaz", "/shared") is False
+    mock_remove_subscription_filter.assert_called_once_with(
+        None, "/shared", "NewRelicLogStreaming"
+    )
+    assert mock_create_subscription_filter.call_args_list[1].args == (
+        None,
+        "/shared",
+        "FooBar",
+        "REPORT",
+        "NewRelicLogStreaming",
+    )
+
+    mock_create_subscription_filter.reset_mock()
+    mock_create_subscription_filter.side_effect = None
+    mock_create_subscription_filter.return_value = True
+    assert migrate_log_subscription(input, "FooBarBaz", "/shared") is True
+    mock_create_subscription_filter.assert_called_once_with(
+        None, "/shared", "Otel", "", "NewRelicOtelLogStreaming"
+    )
+
+
+@patch("newrelic_lambda_cli.subscriptions._create_subscription_filter", autospec=True)
+@patch("newrelic_lambda_cli.subscriptions._get_subscription_filters", autospec=True)
+@patch("newrelic_lambda_cli.subscriptions._remove_subscription_filter", autospec=True)
+def test_restore_log_subscription(
+    mock_remove_subscription_filter,
+    mock_get_subscription_filters,
+    mock_create_subscription_filter,
+):
+    classic = _filter("NewRelicLogStreaming", "REPORT")
+    saved = {"log_group_name": "/shared", "subscription_filter": classic}
+    mock_create_subscription_filter.return_value = True
+    mock_remove_subscription_filter.return_value = True
+
+    mock_get_subscription_filters.return_value = [
+        _filter("NewRelicOtelLogStreaming", destination="Otel")
+    ]
+    assert restore_log_subscription(subscription_migrate(), "FooBar", saved) is True
+    mock_get_subscription_filters.assert_called_once_with(None, "/shared")
+    mock_create_subscription_filter.assert_called_once_with(
+        None, "/shared", "FooBar", "REPORT", "NewRelicLogStreaming"
+    )
+    mock_remove_subscription_filter.assert_called_once_with(
+        None, "/shared", "NewRelicOtelLogStreaming"
+    )
+
+    mock_create_subscription_filter.reset_mock()
+    mock_get_subscription_filters.return_value = [classic]
+    assert restore_log_subscription(subscription_migrate(), "FooBar", saved) is True
+    mock_create_subscription_filter.assert_not_called()
+
+
+@patch("newrelic_lambda_cli.subscriptions._create_subscription_filter", autospec=True)
+@patch("newrelic_lambda_cli.subscriptions._get_subscription_filters", autospec=True)
+@patch("newrelic_lambda_cli.subscriptions._remove_subscription_filter", autospec=True)
+def test_restore_log_subscription_interrupted_swap(
+    mock_remove_subscription_filter,
+    mock_get_subscription_filters,
+    mock_create_subscription_filter,
+):
+    classic = _filter("NewRelicLogStreaming", "REPORT")
+    saved = {"log_group_name": "/shared", "subscription_filter": classic}
+    mock_create_subscription_filter.return_value = True
+
+    # The migration of a full log group removed the classic filter, then stopped
+    # before the otel filter was created
+    mock_get_subscription_filters.return_value = [_filter("Other")]
+    assert restore_log_subscription(subscription_migrate(), "FooBar", saved) is True
+    mock_create_subscription_filter.assert_called_once_with(
+        None, "/shared", "FooBar", "REPORT", "NewRelicLogStreaming"
+    )
+    mock_remove_subscription_filter.assert_not_called()
+
+    mock_create_subscription_filter.return_value = False
+    assert restore_log_subscription(subscription_migrate(), "FooBar", saved) is False
+
+
+def test_install_account_policy_warns_of_function_subscriptions(capsys):
+    mock_session = MagicMock()
+    mock_client = mock_session.client.return_value
+    mock_client.get_function_configuration.return_value = {"LoggingConfig": {}}
+    mock_client.get_paginator.return_value.paginate.return_value = [
+        {
+            "logGroups": [
+                {"logGroupName": "/aws/lambda/Foo"},
+                {"logGroupName": "/aws/lambda/Bar"},
+                {"logGroupName": "/aws/lambda/Baz"},
+                {"logGroupName": "/aws/lambda/Ingest"},
+            ]
+        }
+    ]
+    filters = {
+        "/aws/lambda/Foo": [{"filterName": "NewRelicLogStreaming"}],
+        "/aws/lambda/Bar": [{"filterName": "NewRelicOtelLogStreaming"}],
+        "/aws/lambda/Baz": [{"filterName": "SomethingElse"}],
+    }
+    mock_client.describe_subscription_filters.side_effect = lambda logGroupName: {
+        "subscriptionFilters": filters[logGroupName]
+    }
+    input = subscription_install(
+        session=mock_session,
+        destination_arn="arn:aws:lambda:us-east-1:123456789012:function:Ingest",
+        excludes=(),
+        filter_pattern="",
+        otel=False,
+    )
+    assert install_account_policy(input) is True
+    assert "2 Lambda log groups" in capsys.readouterr().out
+    # The log ingestion function's log group is excluded from the policy
+    assert len(mock_client.describe_subscription_filters.call_args_list) == 3
+
+    filters.update({"/aws/lambda/Foo": [], "/aws/lambda/Bar": []})
+    assert install_account_policy(input) is True
+    assert "Lambda log groups" not in capsys.readouterr().out
@@ -1,15 +1,23 @@
 import pytest
 
+from unittest.mock import patch
+
 from botocore.exceptions import BotoCoreError, NoCredentialsError, NoRegionError
 from click.exceptions import BadParameter, UsageError
 
+from newrelic_lambda_cli import utils
 from newrelic_lambda_cli.utils import (
+    all_lambda_regions,
     error,
+    get_arn_prefix,
+    get_region,
     is_valid_handler,
     parse_arn,
+    read_cache,
     validate_aws_profile,
     catch_boto_errors,
     supports_lambda_extension,
+    write_cache,
 )
 
 
@@ -106,3 +114,37 @@ def test_supports_lambda_extension():
     assert not any(
         supports_lambda_extension(runtime) for runtime in ("python2.7", "python3.6")
     )
+
+
+def test_read_write_cache():
+    assert read_cache("foo/bar.json") is None
+    assert write_cache("foo/bar.json", {"foo": "bar"}) is True
+    assert read_cache("foo/bar.json") == {"foo": "bar"}
+
+
+def test_get_arn_prefix():
+    with patch("newrelic_lambda_cli.utils.boto3.session.Session") as mock_session:
+        mock_session.return_value.region_name = "eu-west-1"
+
+        assert get_region("us-east-1") == "us-east-1"
+        assert get_arn_prefix("us-east-1") == "arn:aws:lambda:us-east-1:451483290750"
+        assert get_arn_prefix("us-east-1") == "arn:aws:lambda:us-east-1:451483290750"
+        mock_session.assert_not_called()
+
+
+def test_all_lambda_regions(monkeypatch):
+    monkeypatch.setattr(utils, "__cached_lambda_regions", None)
+    with patch("newrelic_lambda_cli.utils.boto3.Session") as mock_session:
+        mock_session.return_value.get_available_regions.return_value = [
+            "eu-west-1",
+            "us-east-1",
+        ]
+        assert all_lambda_regions() == ["eu-west-1", "us-east-1"]
+        assert all_lambda_regions() == ["eu-west-1", "us-east-1"]
+        mock_session.assert_called_once_with()
+
+    # A new process reads the regions from the cache on disk
+    monkeypatch.setattr(utils, "__cached_lambda_regions", None)
+    with patch("newrelic_lambda_cli.utils.boto3.Session") as mock_session:
+        assert all_lambda_regions() == ["eu-west-1", "us-east-1"]
+        mock_session.assert_not_called()